@@ -1,27 +1,29 @@
 # auto_model_retrainer.py
 
 import logging
-from train_lstm_model import train_lstm_model
-from train_xgb import train_xgb_model
-from weights_optimizer import optimize_weights
+from training_orchestrator import train_models, format_results
+from weights_optimizer import update_weights
 from notifier import send_telegram_message
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# ✅ تحسين الأوزان في هذه العملية بينما تتدرب النماذج في عمليات منفصلة
+def _optimize_weights():
+    try:
+        logging.info("🔁 تحسين الأوزان بناءً على الأداء...")
+        update_weights()
+    except Exception as e:
+        logging.error(f"❌ [Auto Retrainer] فشل تحسين الأوزان: {e}")
+
 # ✅ تدريب جميع النماذج تلقائيًا
 def retrain_all_models():
     try:
         send_telegram_message("🧠 بدء إعادة تدريب نماذج التداول...")
-        logging.info("🔁 بدء تدريب نموذج LSTM...")
-        train_lstm_model()
-
-        logging.info("🔁 بدء تدريب نموذج XGBoost...")
-        train_xgb_model()
+        logging.info("🔁 بدء تدريب LSTM و XGBoost بالتوازي...")
 
-        logging.info("🔁 تحسين الأوزان بناءً على الأداء...")
-        optimize_weights()
+        results = train_models(on_waiting=_optimize_weights)
 
-        send_telegram_message("✅ تم الانتهاء من إعادة تدريب النماذج وتحسين الأوزان.")
+        send_telegram_message("✅ تم الانتهاء من إعادة تدريب النماذج وتحسين الأوزان.\n" + format_results(results))
         logging.info("🎯 تم إعادة تدريب كل النماذج بنجاح.")
 
     except Exception as e:
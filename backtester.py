@@ -0,0 +1,250 @@
+# backtester.py
+
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from kline_cache import INTERVAL_SECONDS
+from candle_archive import load_history
+from technical_analysis import compute_indicators, technical_vote_series
+from train_xgb import add_features, FEATURE_COLS, get_xgb_artifacts
+from predict_lstm_signal import LOOK_BACK, INTERVALS as LSTM_INTERVALS
+from model_registry import get_model
+from reinforcement_learning import ReinforcementLearningTrader
+from decision_engine import smart_decision_vectorized, load_weights
+from risk_management import BASE_QTY, calculate_position_size, compute_exit_levels
+from database import log_backtest_trades, flush_pending_writes
+from config import CONFIDENCE_THRESHOLD, BACKTEST_MAX_HOLD_BARS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+STRATEGY_NAME = "smart_decision"
+EXIT_CHUNK_SIZE = 20000
+
+
+def _align(available_at, values, target_times, missing=None):
+    """
+    ربط قيم سلسلة بتوقيت إتاحتها بأقرب قيمة سابقة لكل توقيت هدف (as-of) بدون نظر للمستقبل
+    """
+    values = np.asarray(values)
+    positions = np.searchsorted(np.asarray(available_at), np.asarray(target_times), side="right") - 1
+    aligned = values[np.clip(positions, 0, None)] if len(values) else np.full(len(positions), missing, dtype=object)
+    if len(values):
+        aligned = aligned.astype(object if values.dtype == object else float)
+        aligned[positions < 0] = missing
+    return aligned
+
+
+# ✅ إشارة LSTM لكل النوافذ التاريخية في تمريرة واحدة
+def lstm_signal_series(symbol, days, decision_times):
+    artifacts = get_model("lstm")
+    closes = [load_history(symbol, interval, days)[["close"]].rename(columns={"close": f"close_{interval}"})
+              for interval in LSTM_INTERVALS]
+    merged = closes[0].join(closes[1:], how="outer")
+    merged["avg_close"] = merged.mean(axis=1)
+    merged.dropna(inplace=True)
+
+    if artifacts is None or len(merged) < LOOK_BACK:
+        return np.full(len(decision_times), None, dtype=object)
+    model, scaler = artifacts
+
+    scaled = scaler.transform(merged[["avg_close"]].values)[:, 0]
+    windows = sliding_window_view(scaled, LOOK_BACK)
+    predictions = model.predict(windows[..., None], batch_size=1024, verbose=0)[:, 0]
+
+    # الصف يكتمل فقط عند إغلاق أطول فريم فيه
+    longest = pd.Timedelta(seconds=max(INTERVAL_SECONDS[i] for i in LSTM_INTERVALS))
+    available_at = merged.index[LOOK_BACK - 1:] + longest
+    return _align(available_at, np.where(predictions > 0.5, "BUY", "SELL").astype(object), decision_times)
+
+
+# ✅ إشارة XGBoost وتذبذب الساعة لكل الشموع دفعة واحدة
+def hourly_series(symbol, days, decision_times):
+    hourly = load_history(symbol, "1h", days)
+    available_at = hourly.index + pd.Timedelta(hours=1)
+
+    # نفس measure_volatility: انحراف العوائد لآخر 20 ساعة
+    volatility = hourly["close"].pct_change().rolling(20).std().round(4).to_numpy()
+    volatility = _align(available_at, volatility, decision_times, np.nan)
+
+    artifacts = get_xgb_artifacts()
+    features = add_features(hourly.copy())
+    if artifacts is None or features.empty:
+        return np.full(len(decision_times), None, dtype=object), volatility
+    model, scaler = artifacts
+
+    predictions = model.predict(scaler.transform(features[FEATURE_COLS]))
+    xgb_signal = _align(features.index + pd.Timedelta(hours=1),
+                        np.where(predictions == 1, "BUY", "SELL").astype(object), decision_times)
+    return xgb_signal, volatility
+
+
+# ✅ نفس قواعد analyze_liquidity على نافذة متحركة من 100 شمعة
+def liquidity_series(df, window=100):
+    price_std = df["close"].pct_change().rolling(window - 1).std().to_numpy()
+    volume_std = df["volume"].pct_change().rolling(window - 1).std().to_numpy()
+    liquidity = np.select([(price_std > 0.04) & (volume_std > 0.6), volume_std > 0.3], [0.5, 1.5], default=1.0)
+    liquidity[np.isnan(volume_std)] = np.nan
+    return liquidity
+
+
+def find_exits(high, low, close, entries, is_buy, stop_loss, take_profit, max_hold):
+    """
+    أول شمعة بعد الدخول يلمس فيها السعر الوقف أو الهدف (الوقف أولًا عند لمس الاثنين في نفس الشمعة)،
+    أو الإغلاق بعد max_hold شمعة. يعيد (exit_bar, exit_price, reason).
+    """
+    n = len(close)
+    padded_high = np.concatenate([high[1:], np.full(max_hold, np.nan)])
+    padded_low = np.concatenate([low[1:], np.full(max_hold, np.nan)])
+    window_high = sliding_window_view(padded_high, max_hold)
+    window_low = sliding_window_view(padded_low, max_hold)
+
+    exit_bar = np.empty(len(entries), dtype=np.int64)
+    exit_price = np.empty(len(entries))
+    reason = np.empty(len(entries), dtype=object)
+
+    for start in range(0, len(entries), EXIT_CHUNK_SIZE):
+        part = slice(start, start + EXIT_CHUNK_SIZE)
+        idx = entries[part]
+        buy = is_buy[part][:, None]
+        sl = stop_loss[part][:, None]
+        tp = take_profit[part][:, None]
+        wh, wl = window_high[idx], window_low[idx]
+
+        sl_hit = np.where(buy, wl <= sl, wh >= sl)
+        tp_hit = np.where(buy, wh >= tp, wl <= tp)
+        hit = sl_hit | tp_hit
+        any_hit = hit.any(axis=1)
+        first = hit.argmax(axis=1)
+        sl_first = sl_hit[np.arange(len(idx)), first] & any_hit
+
+        timeout_offset = np.minimum(max_hold - 1, n - 2 - idx)
+        offset = np.where(any_hit, first, timeout_offset)
+        exit_bar[part] = idx + 1 + offset
+        exit_price[part] = np.where(any_hit, np.where(sl_first, sl[:, 0], tp[:, 0]), close[idx + 1 + offset])
+        reason[part] = np.where(any_hit, np.where(sl_first, "Stop Loss", "Take Profit"), "Timeout")
+
+    return exit_bar, exit_price, reason
+
+
+def _select_non_overlapping(entries, exit_bar):
+    # صفقة واحدة مفتوحة لكل رمز: الدخول التالي بعد إغلاق السابقة (حلقة على الصفقات لا على الشموع)
+    chosen = []
+    next_free = 0
+    while True:
+        pos = np.searchsorted(entries, next_free, side="left")
+        if pos >= len(entries):
+            break
+        chosen.append(pos)
+        next_free = exit_bar[pos] + 1
+    return np.array(chosen, dtype=np.int64)
+
+
+# ✅ باك تست رمز واحد
+def backtest_symbol(symbol, interval="5m", days=365, weights=None, max_hold=BACKTEST_MAX_HOLD_BARS):
+    df = load_history(symbol, interval, days)
+    if df.empty or len(df) < 100:
+        logging.warning(f"⚠️ [Backtest] بيانات غير كافية لـ {symbol}.")
+        return pd.DataFrame()
+
+    # القرار يُتخذ عند إغلاق كل شمعة
+    decision_times = df.index + pd.Timedelta(seconds=INTERVAL_SECONDS[interval])
+    close = df["close"].to_numpy()
+
+    technical_signal = technical_vote_series(compute_indicators(df))
+    lstm_signal = lstm_signal_series(symbol, days, decision_times)
+    xgb_signal, volatility = hourly_series(symbol, days, decision_times)
+    liquidity_score = liquidity_series(df)
+
+    # لا توجد مشاعر تاريخية: RL يُقيَّم على مشاعر محايدة، والمشاعر نفسها لا تصوّت
+    rl_decision = ReinforcementLearningTrader().predict_rl_decisions(technical_signal, np.zeros(len(df)))
+
+    decisions, confidence = smart_decision_vectorized({
+        "lstm_signal": lstm_signal,
+        "xgb_signal": xgb_signal,
+        "technical_signal": technical_signal,
+        "sentiment_score": np.full(len(df), np.nan),
+        "liquidity_score": liquidity_score,
+        "rl_decision": rl_decision
+    }, weights)
+
+    tradable = (confidence >= CONFIDENCE_THRESHOLD) & (decisions != "HOLD") & ~np.isnan(volatility.astype(float))
+    tradable[-1] = False
+    entries = np.flatnonzero(tradable)
+    if len(entries) == 0:
+        return pd.DataFrame()
+
+    is_buy = decisions[entries] == "BUY"
+    entry_volatility = volatility[entries].astype(float)
+    entry_liquidity = np.nan_to_num(liquidity_score[entries], nan=1.0)
+    stop_loss, take_profit = compute_exit_levels(close[entries], is_buy, entry_volatility, confidence[entries], 0.0)
+    quantity = calculate_position_size(BASE_QTY, confidence[entries], 0.0, entry_liquidity)
+
+    exit_bar, exit_price, reason = find_exits(
+        df["high"].to_numpy(), df["low"].to_numpy(), close, entries, is_buy, stop_loss, take_profit, max_hold
+    )
+    chosen = _select_non_overlapping(entries, exit_bar)
+
+    entry_price = close[entries[chosen]]
+    pnl = np.where(is_buy[chosen], exit_price[chosen] - entry_price, entry_price - exit_price[chosen]) * quantity[chosen]
+
+    return pd.DataFrame({
+        "timestamp": decision_times[entries[chosen]],
+        "symbol": symbol,
+        "strategy": STRATEGY_NAME,
+        "signal": decisions[entries[chosen]],
+        "entry_price": entry_price,
+        "exit_price": exit_price[chosen],
+        "quantity": quantity[chosen],
+        "pnl": pnl,
+        "exit_reason": reason[chosen],
+        "exit_time": decision_times[exit_bar[chosen]]
+    })
+
+
+# ✅ باك تست عدة رموز وكتابة النتائج في backtest_trades
+def run_backtest(symbols, test_name, interval="5m", days=365, write_to_db=True):
+    started_at = time.monotonic()
+    weights = load_weights()
+    frames = []
+    for symbol in symbols:
+        trades = backtest_symbol(symbol, interval, days, weights)
+        if not trades.empty:
+            frames.append(trades)
+
+    if not frames:
+        logging.warning("⚠️ [Backtest] لم تنتج أي صفقات.")
+        return pd.DataFrame()
+
+    trades = pd.concat(frames, ignore_index=True)
+    trades["test_name"] = test_name
+
+    logging.info(
+        f"🧪 [Backtest] {test_name}: {len(trades)} صفقة | الربح: {trades['pnl'].sum():.2f} | "
+        f"نسبة النجاح: {(trades['pnl'] > 0).mean() * 100:.1f}% | المدة: {time.monotonic() - started_at:.1f} ثانية"
+    )
+
+    if write_to_db:
+        log_backtest_trades(trades.to_dict("records"))
+        flush_pending_writes()
+        logging.info("✅ [Backtest] تم حفظ الصفقات في backtest_trades.")
+
+    return trades
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="باك تست سريع لمنظومة الإشارات على الشموع التاريخية")
+    parser.add_argument("--symbols", nargs="+", default=["BTCUSDT"])
+    parser.add_argument("--interval", default="5m")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--test-name", required=True)
+    parser.add_argument("--no-db", action="store_true", help="عدم الكتابة في قاعدة البيانات")
+    args = parser.parse_args(argv)
+
+    run_backtest(args.symbols, args.test_name, args.interval, args.days, write_to_db=not args.no_db)
+
+
+if __name__ == "__main__":
+    main()
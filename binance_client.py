@@ -0,0 +1,26 @@
+# binance_client.py
+
+import os
+import logging
+import threading
+from config import BINANCE_REQUEST_TIMEOUT
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# ✅ عميل Binance واحد مشترك لكل الوحدات، يُنشأ عند أول طلب فعلي:
+# استيراد python-binance وإنشاء Client (يتصل بالمنصة) لا يحدثان عند استيراد أي وحدة
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            from binance.client import Client
+            _client = Client(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"),
+                             requests_params={"timeout": BINANCE_REQUEST_TIMEOUT})
+            logging.info("🔌 [Binance] تم إنشاء عميل Binance المشترك.")
+        return _client
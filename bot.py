@@ -1,7 +1,7 @@
 import time
 from datetime import datetime
 from decision_engine import smart_decision
-from sentiment_analysis import analyze_sentiment
+from news_store import get_sentiment_index
 from liquidity_analysis import analyze_liquidity
 from technical_analysis import get_technical_signal
 from reinforcement_learning import get_rl_decision
@@ -10,30 +10,59 @@ from risk_management import apply_risk_management
 from notifier import send_telegram_message
 from utils import log_bot_decision, get_xgb_signal
 from database import log_bot_decision_to_db
-from config import DEFAULT_SYMBOL, CONFIDENCE_THRESHOLD
+from kline_cache import get_klines
+from signal_pool import run_with_deadlines
+from config import DEFAULT_SYMBOL, CONFIDENCE_THRESHOLD, TICK_BUDGET_SECONDS, SIGNAL_TIMEOUTS
 
-def run_bot_once(symbol=DEFAULT_SYMBOL):
+# ✅ حساب كل الإشارات بالتوازي ضمن الميزانية الزمنية للدورة
+# precomputed: إشارات محسوبة مسبقًا (مثل توقعات النماذج المجمّعة في وضع المسح) فلا يُعاد حسابها
+def collect_signals(symbol, started_at, precomputed=None):
+    precomputed = precomputed or {}
+    tasks = {
+        "lstm_signal": lambda: get_lstm_signal(symbol),
+        "xgb_signal": lambda: get_xgb_signal(symbol),
+        "technical_signal": lambda: get_technical_signal(symbol),
+        "sentiment_score": lambda: get_sentiment_index(symbol),
+        "liquidity_score": lambda: analyze_liquidity(get_klines(symbol, "5m", limit=100))
+    }
+    results, missing = run_with_deadlines(
+        {name: task for name, task in tasks.items() if name not in precomputed},
+        SIGNAL_TIMEOUTS, TICK_BUDGET_SECONDS - (time.monotonic() - started_at)
+    )
+    results.update(precomputed)
+    # إشارة محسوبة مسبقًا بلا قيمة (بيانات أو نموذج غير متاح في التوقع المجمّع) مفقودة مثل تجاوز المهلة
+    missing = [name for name, value in precomputed.items() if value is None] + missing
+
+    # RL يعتمد على الإشارة الفنية والمشاعر فيُحسب بعد وصولهما
+    rl_results, rl_missing = run_with_deadlines({
+        "rl_decision": lambda: get_rl_decision(results.get("technical_signal"), results.get("sentiment_score"))
+    }, SIGNAL_TIMEOUTS, TICK_BUDGET_SECONDS - (time.monotonic() - started_at))
+    results.update(rl_results)
+
+    signals = {name: results.get(name) for name in [
+        "lstm_signal", "xgb_signal", "technical_signal",
+        "sentiment_score", "liquidity_score", "rl_decision"
+    ]}
+    return signals, missing + rl_missing
+
+def run_bot_once(symbol=DEFAULT_SYMBOL, precomputed=None):
     try:
         # ⏱️ التوقيت
         timestamp = datetime.utcnow().isoformat()
+        started_at = time.monotonic()
 
-        # 1️⃣ تحليل السوق
-        lstm_signal = get_lstm_signal(symbol)
-        xgb_signal = get_xgb_signal(symbol)
-        technical_signal = get_technical_signal(symbol)
-        sentiment_score = analyze_sentiment(symbol)
-        liquidity_score = analyze_liquidity(symbol)
-        rl_decision = get_rl_decision(technical_signal, sentiment_score)
+        # 1️⃣ تحليل السوق (بالتوازي)
+        signals, missing_signals = collect_signals(symbol, started_at, precomputed)
+        lstm_signal = signals["lstm_signal"]
+        xgb_signal = signals["xgb_signal"]
+        technical_signal = signals["technical_signal"]
+        sentiment_score = signals["sentiment_score"]
+        liquidity_score = signals["liquidity_score"]
+        rl_decision = signals["rl_decision"]
 
-        # 2️⃣ اتخاذ القرار الذكي (مع GPT)
-        decision_data = smart_decision({
-            "lstm_signal": lstm_signal,
-            "xgb_signal": xgb_signal,
-            "technical_signal": technical_signal,
-            "sentiment_score": sentiment_score,
-            "liquidity_score": liquidity_score,
-            "rl_decision": rl_decision
-        })
+        # 2️⃣ اتخاذ القرار الذكي (مع GPT ضمن ما تبقى من الميزانية)
+        remaining = max(TICK_BUDGET_SECONDS - (time.monotonic() - started_at), 0)
+        decision_data = smart_decision(signals, gpt_timeout=min(SIGNAL_TIMEOUTS["gpt"], remaining))
 
         final_decision = decision_data["decision"]
         confidence_score = decision_data["confidence"]
@@ -44,7 +73,9 @@ def run_bot_once(symbol=DEFAULT_SYMBOL):
         executed = False
         if confidence_score >= CONFIDENCE_THRESHOLD:
             # 4️⃣ إدارة المخاطر وتنفيذ الصفقة
-            trade_params = apply_risk_management(symbol, final_decision, confidence_score, sentiment_score, liquidity_score)
+            trade_params = apply_risk_management(symbol, final_decision, confidence_score,
+                                                 sentiment_score or 0.0,
+                                                 liquidity_score if liquidity_score is not None else 1.0)
             if trade_params:
                 executed = True
                 send_telegram_message(f"""
@@ -59,10 +90,11 @@ def run_bot_once(symbol=DEFAULT_SYMBOL):
         else:
             send_telegram_message(f"""
 ⚠️ *صفقة لم تُنفذ بسبب ضعف الثقة*
+▪️ الزوج: {symbol}
 ▪️ القرار: {final_decision}
 ▪️ الثقة: {confidence_score * 100:.1f}%
 ▪️ الحد الأدنى: {CONFIDENCE_THRESHOLD * 100:.1f}%
-""")
+""", coalesce_key="low_confidence")
 
         # 5️⃣ تسجيل القرار الكامل
         log_data = {
@@ -78,6 +110,7 @@ def run_bot_once(symbol=DEFAULT_SYMBOL):
             "confidence_score": confidence_score,
             "gpt_decision": gpt_decision,
             "gpt_confidence": gpt_confidence,
+            "missing_signals": ",".join(missing_signals),
             "executed": executed
         }
         log_bot_decision(log_data)
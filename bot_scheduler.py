@@ -3,22 +3,46 @@
 import logging
 from apscheduler.schedulers.blocking import BlockingScheduler
 from bot import run_bot_once
+from market_scanner import run_scan_once
 from auto_model_retrainer import retrain_all_models
 from evaluate_bot_decisions import evaluate_bot_decisions
+from weights_optimizer import update_weights
+from news_store import poll_news
+from candle_archive import sync_all as sync_candle_archive
 import os
+from config import SCAN_MODE, WEIGHTS_OPTIMIZATION_MINUTES, NEWS_POLL_SECONDS, CANDLE_SYNC_MINUTES
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# ✅ تحسين الأوزان كمهمة مجدولة: الخطأ يُسجَّل كسطر واحد بدل تتبع كامل كل دورة
+def optimize_weights_job():
+    try:
+        update_weights()
+    except Exception as e:
+        logging.error(f"❌ [Scheduler] فشل تحسين الأوزان: {e}")
+
 # ✅ جدولة تنفيذ البوت كل دقيقة
 def schedule_bot_run():
     scheduler = BlockingScheduler()
 
-    # 🧠 كل دقيقة: تشغيل البوت
-    scheduler.add_job(run_bot_once, 'interval', minutes=1, id='run_bot', name='تشغيل البوت')
+    # 🧠 كل دقيقة: تشغيل البوت (على رمز واحد أو على قائمة الرموز كاملة في وضع المسح)
+    if SCAN_MODE:
+        scheduler.add_job(run_scan_once, 'interval', minutes=1, id='run_bot', name='مسح الرموز')
+    else:
+        scheduler.add_job(run_bot_once, 'interval', minutes=1, id='run_bot', name='تشغيل البوت')
+
+    # 📰 جلب الأخبار الجديدة وتحديث مؤشر المشاعر خارج دورة البوت
+    scheduler.add_job(poll_news, 'interval', seconds=NEWS_POLL_SECONDS, id='poll_news', name='جلب الأخبار')
+
+    # 🗄️ مزامنة أرشيف الشموع حتى لا ينتظر التدريب والباك تست تحميل التاريخ
+    scheduler.add_job(sync_candle_archive, 'interval', minutes=CANDLE_SYNC_MINUTES, id='sync_candles', name='مزامنة أرشيف الشموع')
 
     # 📈 كل ساعة: تحليل قرارات البوت وتحديث الدقة
     scheduler.add_job(evaluate_bot_decisions, 'interval', hours=1, id='evaluate_bot', name='تقييم قرارات البوت')
 
+    # ⚖️ تحسين الأوزان على الصفقات الجديدة فقط (تحميل تزايدي)
+    scheduler.add_job(optimize_weights_job, 'interval', minutes=WEIGHTS_OPTIMIZATION_MINUTES, id='optimize_weights', name='تحسين الأوزان')
+
     # 🤖 كل 6 ساعات: إعادة تدريب النماذج وتحسين الأوزان
     scheduler.add_job(retrain_all_models, 'interval', hours=6, id='retrain_models', name='تدريب النماذج')
 
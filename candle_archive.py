@@ -0,0 +1,182 @@
+# candle_archive.py
+
+import os
+import glob
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kline_cache import download_klines, KLINE_COLUMNS, INTERVAL_SECONDS, MAX_REQUEST_LIMIT
+from config import CANDLE_ARCHIVE_DIR, CANDLE_ARCHIVE_INTERVALS, CANDLE_ARCHIVE_DAYS, SUPPORTED_SYMBOLS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# أرشيف محلي للشموع المغلقة: CANDLE_ARCHIVE_DIR/<symbol>/<interval>/<YYYY-MM-DD>.parquet
+# ملف لكل يوم بنفس أعمدة get_klines، والقراءة عبر memory map بدون طلبات شبكة.
+DAY_MS = 86_400_000
+# عدد الشموع المؤكد غيابها من Binance (توقف المنصة مثلًا) يُحفظ في بيانات الملف حتى لا يُعاد طلبها
+GAPS_METADATA_KEY = b"confirmed_gaps"
+
+
+def _interval_ms(interval):
+    seconds = INTERVAL_SECONDS[interval]
+    if DAY_MS % (seconds * 1000):
+        raise ValueError(f"الفريم {interval} لا يقسم اليوم ولا يمكن أرشفته يوميًا")
+    return seconds * 1000
+
+
+def _interval_dir(symbol, interval):
+    return os.path.join(CANDLE_ARCHIVE_DIR, symbol, interval)
+
+
+def _day_path(symbol, interval, day_start):
+    day = pd.Timestamp(day_start, unit="ms").date().isoformat()
+    return os.path.join(_interval_dir(symbol, interval), f"{day}.parquet")
+
+
+def _is_complete(path, expected):
+    if not os.path.exists(path):
+        return False
+    metadata = pq.read_metadata(path)
+    gaps = int((metadata.metadata or {}).get(GAPS_METADATA_KEY, 0))
+    return metadata.num_rows + gaps >= expected
+
+
+def _write_day(path, df, confirmed_gaps):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), GAPS_METADATA_KEY: str(confirmed_gaps).encode()})
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def _open_times(index):
+    return index.as_unit("ms").asi8
+
+
+def _empty_day():
+    return pd.DataFrame(columns=KLINE_COLUMNS[1:-1], dtype=float,
+                        index=pd.DatetimeIndex([], name="timestamp").as_unit("ms"))
+
+
+def _missing_runs(missing, step):
+    # تقسيم أوقات الفتح الناقصة إلى فترات متصلة: [(أول شمعة، آخر شمعة)]
+    breaks = np.flatnonzero(np.diff(missing) != step) + 1
+    return [(int(run[0]), int(run[-1])) for run in np.split(missing, breaks)]
+
+
+def _download_range(symbol, interval, first_open, last_open, step):
+    frames = []
+    start_time = first_open
+    while start_time <= last_open:
+        df = download_klines(symbol, interval, MAX_REQUEST_LIMIT, start_time=start_time, end_time=last_open)
+        if df.empty:
+            break
+        frames.append(df)
+        start_time = int(_open_times(df.index)[-1]) + step
+    return frames
+
+
+# ✅ مزامنة تزايدية: الأيام المكتملة تُتخطى من بيانات الملف فقط، والفجوات تُملأ بطلبات على قدرها
+def sync(symbol, interval, days=CANDLE_ARCHIVE_DAYS):
+    step = _interval_ms(interval)
+    now_ms = int(time.time() * 1000)
+    last_open = now_ms // step * step - step  # آخر شمعة مغلقة
+    first_open = (now_ms - days * DAY_MS) // step * step
+    added = 0
+
+    for day_start in range(first_open // DAY_MS * DAY_MS, last_open + 1, DAY_MS):
+        grid = np.arange(max(day_start, first_open), min(day_start + DAY_MS, last_open + step), step, dtype=np.int64)
+        path = _day_path(symbol, interval, day_start)
+        if _is_complete(path, len(grid)):
+            continue
+
+        existing = pd.read_parquet(path) if os.path.exists(path) else _empty_day()
+        missing = np.setdiff1d(grid, _open_times(existing.index))
+        day_closed = day_start + DAY_MS <= last_open + step
+
+        downloaded = []
+        for run_first, run_last in _missing_runs(missing, step):
+            downloaded.extend(_download_range(symbol, interval, run_first, run_last, step))
+
+        if not downloaded:
+            # لا جديد: الفجوات في يوم منتهٍ تُسجَّل كمؤكدة
+            if day_closed:
+                _write_day(path, existing, len(missing))
+            continue
+
+        merged = pd.concat([existing] + [df.set_axis(df.index.as_unit("ms")) for df in downloaded])
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        merged = merged[(merged.index >= pd.Timestamp(day_start, unit="ms")) &
+                        (merged.index <= pd.Timestamp(last_open, unit="ms"))]
+        still_missing = len(np.setdiff1d(grid, _open_times(merged.index)))
+        _write_day(path, merged, still_missing if day_closed else 0)
+        added += len(merged) - len(existing)
+
+    if added:
+        logging.info(f"🗄️ [Candle Archive] {symbol} {interval}: أُضيفت {added} شمعة.")
+    return added
+
+
+# ✅ مزامنة كل الرموز والفريمات المؤرشفة (للجدولة)
+def sync_all(symbols=None, intervals=None, days=CANDLE_ARCHIVE_DAYS):
+    for symbol in symbols or SUPPORTED_SYMBOLS:
+        for interval in intervals or CANDLE_ARCHIVE_INTERVALS:
+            try:
+                sync(symbol, interval, days)
+            except Exception as e:
+                logging.error(f"❌ [Candle Archive] فشل مزامنة {symbol} {interval}: {e}")
+
+
+# ✅ قراءة الشموع بين start و end (نفس شكل get_klines)، وملفات الأيام خارج النطاق لا تُفتح
+def load_candles(symbol, interval, start=None, end=None, columns=None):
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    first_day = start.date().isoformat() if start is not None else ""
+    last_day = end.date().isoformat() if end is not None else "9999"
+
+    files = [path for path in sorted(glob.glob(os.path.join(_interval_dir(symbol, interval), "*.parquet")))
+             if first_day <= os.path.basename(path)[:10] <= last_day]
+    if not files:
+        return pd.DataFrame()
+
+    # عمود timestamp يُقرأ دائمًا لأنه فهرس الإطار
+    read_columns = None if columns is None else list(columns) + ["timestamp"]
+    table = pa.concat_tables([pq.read_table(path, columns=read_columns, memory_map=True) for path in files])
+    df = table.to_pandas()
+    if start is not None:
+        df = df[df.index >= start]
+    if end is not None:
+        df = df[df.index <= end]
+    return df
+
+
+# ✅ آخر days يوم من الأرشيف، مع مزامنة أولية إن كان الأرشيف فارغًا لهذا الرمز والفريم
+def load_history(symbol, interval, days, columns=None):
+    start = pd.Timestamp.utcnow().tz_localize(None) - pd.Timedelta(days=days)
+    df = load_candles(symbol, interval, start=start, columns=columns)
+    if df.empty:
+        logging.info(f"🗄️ [Candle Archive] لا يوجد أرشيف لـ {symbol} {interval}، جاري التحميل...")
+        sync(symbol, interval, days)
+        df = load_candles(symbol, interval, start=start, columns=columns)
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="مزامنة أرشيف الشموع المحلي وملء الفجوات")
+    parser.add_argument("--symbols", nargs="+", default=SUPPORTED_SYMBOLS)
+    parser.add_argument("--intervals", nargs="+", default=CANDLE_ARCHIVE_INTERVALS)
+    parser.add_argument("--days", type=int, default=CANDLE_ARCHIVE_DAYS)
+    args = parser.parse_args(argv)
+
+    started_at = time.monotonic()
+    sync_all(args.symbols, args.intervals, args.days)
+    logging.info(f"✅ [Candle Archive] اكتملت المزامنة خلال {time.monotonic() - started_at:.1f} ثانية.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,171 @@
 # config.py
 
+import os
+
 # العملة الافتراضية للتداول
 DEFAULT_SYMBOL = "BTCUSDT"
 
 # الحد الأدنى المطلوب للثقة لتنفيذ الصفقة
 CONFIDENCE_THRESHOLD = 0.6
 
+# أقل مدة (بالثواني) بين مزامنتين لمخزن الشموع المشترك لنفس الرمز والفريم
+KLINE_REFRESH_SECONDS = 5
+
+# أقل مدة (بالثواني) بين فحصين لتغيّر ملفات النماذج لإعادة تحميلها تلقائيًا
+MODEL_RELOAD_CHECK_SECONDS = 2
+
+# مجلد النسخ المرقّاة من النماذج (مجلد لكل نموذج فيه نسخة لكل ترقية وملف مؤشر current)، وعدد النسخ المحتفظ بها
+MODEL_VERSIONS_DIR = "models/versions"
+MODEL_KEEP_VERSIONS = 3
+
+# الميزانية الزمنية الكلية (بالثواني) لدورة البوت الواحدة، ومهلة كل إشارة على حدة
+TICK_BUDGET_SECONDS = 40
+DEFAULT_SIGNAL_TIMEOUT = 15
+SIGNAL_TIMEOUTS = {
+    "lstm_signal": 15,
+    "xgb_signal": 15,
+    "technical_signal": 10,
+    "sentiment_score": 20,
+    "liquidity_score": 10,
+    "rl_decision": 5,
+    "gpt": 20
+}
+
+# عدد العمال في مجمع حساب الإشارات المتوازي
+SIGNAL_WORKERS = 16
+
+# عدد العمال العالقين (مهام تجاوزت مهلتها وما زالت تعمل) الذي يُستبدل عنده المجمع بمجمع جديد،
+# ومهلة طلبات Binance (بالثواني) حتى لا يبقى عامل عالقًا على طلب شبكة بلا نهاية
+SIGNAL_STUCK_WORKERS_LIMIT = 8
+BINANCE_REQUEST_TIMEOUT = 10
+
+# وضع المسح: تقييم قائمة الرموز كاملة في كل دورة بدل DEFAULT_SYMBOL فقط
+SCAN_MODE = False
+SUPPORTED_SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
+
+# الحد الأقصى لعدد الرموز التي تُعالج عمليات الشبكة الخاصة بها في نفس الوقت
+SCAN_CONCURRENCY = 4
+
+# بث الأسعار اللحظي لمراقبة الصفقات (يمكن توجيهه إلى خادم إعادة تشغيل محلي عبر BINANCE_STREAM_URL)
+STREAM_BASE_URL = os.getenv("BINANCE_STREAM_URL", "wss://fstream.binance.com")
+STREAM_PRICE_SOURCE = "bookTicker"  # أو "markPrice"
+STREAM_RECONNECT_SECONDS = 3
+MONITOR_INTERVAL = "5m"
+
+# عدد الشموع التاريخية لتهيئة المؤشرات الفنية التزايدية
+INDICATOR_SEED_CANDLES = 500
+
+# الباك تست: أقصى مدة احتفاظ بالصفقة (بعدد الشموع) قبل إغلاقها على سعر الإغلاق
+BACKTEST_MAX_HOLD_BARS = 288
+
+# تحسين أوزان القرار دوريًا على الصفقات الجديدة (بالدقائق)
+WEIGHTS_OPTIMIZATION_MINUTES = 10
+
+# ذاكرة توصيات GPT: مدة الصلاحية، ملف الحفظ، ودقة تقريب درجات المشاعر والسيولة في مفتاح الذاكرة
+GPT_CACHE_TTL_SECONDS = 300
+GPT_CACHE_FILE = "gpt_cache.json"
+GPT_SCORE_STEP = 0.1
+# مهلة طلب OpenAI الواحد (بالثواني)، وهي أيضًا أقصى انتظار لطلب توصية جارٍ بنفس المفتاح
+GPT_REQUEST_TIMEOUT = 20
+
+# تحليل مشاعر الأخبار: عدد عمليات TextBlob/VADER، حجم ذاكرة النتائج، وعدد الأخبار في طلب GPT واحد
+SENTIMENT_PROCESS_WORKERS = 2
+SENTIMENT_MEMO_SIZE = 5000
+GPT_NEWS_BATCH_SIZE = 20
+
+# نموذج مشاعر الأخبار المصدَّر لـ NumPy: الملف، دقة جدول الإدخال (float32 / float16 / int8)، وعدد الأخبار في كل تمريرة
+NEWS_NUMPY_MODEL_PATH = "news_model.npz"
+NEWS_MODEL_PRECISION = "float32"
+NEWS_BATCH_SIZE = 4096
+
+# مخزن الأخبار: استعلام NewsAPI لكل رمز، وتيرة الجلب، ونصف عمر وزن الخبر في مؤشر المشاعر
+NEWS_QUERIES = {
+    "BTCUSDT": "bitcoin",
+    "ETHUSDT": "ethereum",
+    "BNBUSDT": "binance coin"
+}
+NEWS_STORE_FILE = "news_store.jsonl"
+NEWS_POLL_SECONDS = 120
+NEWS_PAGE_SIZE = 50
+NEWS_HALF_LIFE_MINUTES = 180
+NEWS_PRIOR_WEIGHT = 1.0   # وزن المشاعر المحايدة: يسحب المؤشر نحو 0 عند قلة الأخبار
+NEWS_RETENTION_DAYS = 7
+
+# التعلم المعزز: عدد شرائح المشاعر في كل اتجاه (حجم الحالة = 3 * (2 * الشرائح + 1) + 1)
+RL_SENTIMENT_BUCKETS = 10
+
+# محاكي التعلم المعزز: عدد البيئات المتوازية، الحلقات، طول الحلقة (شموع)، أفق المكافأة، ونسبة بيانات التقييم
+RL_SIM_ENVS = 256
+RL_SIM_EPISODES = 200
+RL_SIM_EPISODE_LENGTH = 288
+RL_SIM_HORIZON = 12
+RL_SIM_EVAL_FRACTION = 0.2
+RL_SWEEP_WORKERS = os.cpu_count() or 1
+
+# إشعارات Telegram: عنوان الواجهة (يمكن توجيهه لـ telegram_stub_server.py)، حجم الطابور، المحاولات،
+# حدود الإرسال (رسالة كل ثانية لكل محادثة و 30 رسالة في الثانية إجمالًا)، ومدة تجميع التنبيهات المتشابهة
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_QUEUE_SIZE = 1000
+TELEGRAM_MAX_RETRIES = 4
+TELEGRAM_REQUEST_TIMEOUT = 10
+TELEGRAM_CHAT_INTERVAL_SECONDS = 1.0
+TELEGRAM_GLOBAL_PER_SECOND = 30
+TELEGRAM_COALESCE_SECONDS = 15
+
+# قاعدة البيانات: مجمع اتصالات مشترك وكاتب خلفي يجمع الصفوف ويكتبها دفعة واحدة
+DB_POOL_MIN_CONNECTIONS = 1
+DB_POOL_MAX_CONNECTIONS = 8
+DB_FLUSH_BATCH_SIZE = 500      # كتابة فورية عند تجمّع هذا العدد من الصفوف
+DB_FLUSH_INTERVAL_SECONDS = 2  # أو بعد هذه المدة أيهما أسبق
+
+# سجل القرارات (Parquet مقسّم حسب اليوم): يُكتب مقطع جديد كل 500 قرار أو 5 دقائق أيهما أسبق
+JOURNAL_DIR = "decision_journal"
+JOURNAL_FLUSH_ROWS = 500
+JOURNAL_FLUSH_SECONDS = 300
+# الملفات التي استبدلها الدمج اليومي تبقى هذه المدة قبل حذفها حتى تكمل القراءات الجارية (في أي عملية)
+JOURNAL_COMPACTION_GRACE_SECONDS = 600
+
+# أرشيف الشموع المحلي (Parquet لكل يوم): الفريمات المؤرشفة، مدة التاريخ بالأيام، وفترة المزامنة
+CANDLE_ARCHIVE_DIR = "candle_archive"
+CANDLE_ARCHIVE_INTERVALS = ["5m", "15m", "1h", "4h"]
+CANDLE_ARCHIVE_DAYS = 365
+CANDLE_SYNC_MINUTES = 30
+
+# أيام التاريخ التي يتدرب عليها LSTM و XGBoost من الأرشيف
+TRAINING_HISTORY_DAYS = 365
+
+# منسق التدريب: عدد العمليات المتوازية، خيوط الحساب لكل عملية، أولويتها (nice)،
+# مجلد الملفات المرحلية، وملف مقاييس آخر تدريب لكل نموذج
+TRAINING_WORKERS = 2
+TRAINING_THREADS_PER_JOB = max(1, (os.cpu_count() or 2) // 2)
+TRAINING_NICE = 10
+TRAINING_STAGING_DIR = "models/staging"
+MODEL_METRICS_FILE = "models/metrics.json"
+
+# ضبط معاملات XGBoost عند كل تدريب: عدد تجارب البحث العشوائي، الطيات الزمنية، الحد الأقصى للأشجار،
+# صبر التوقف المبكر، ونسبة آخر البيانات (زمنيًا) المحجوزة لاختبار النموذج النهائي
+XGB_TUNING_ENABLED = True
+XGB_TUNING_TRIALS = 24
+XGB_CV_FOLDS = 4
+XGB_MAX_ROUNDS = 500
+XGB_EARLY_STOPPING_ROUNDS = 30
+XGB_TEST_FRACTION = 0.2
+# أقصى فرق مسموح (بوحدات ulp لـ float32) بين احتمال المقيّم المجمّع و XGBoost؛ انقلاب تصنيف ضمنه ضجيج تقريب
+XGB_PROBA_ULP_TOLERANCE = 4
+
+# استدلال LSTM المتدفق: إعادة حساب الحالة من آخر نافذة كاملة بعد هذا العدد من الخطوات
+LSTM_RESYNC_STEPS = 24
+
+# فحص زمن البدء (startup_check.py): أقصى زمن لاستيراد البوت في مفسر جديد،
+# والمكتبات الثقيلة التي يجب ألا تُحمَّل عند الاستيراد (تُستورد عند أول استخدام فقط)
+STARTUP_IMPORT_BUDGET_SECONDS = 1.5
+STARTUP_FORBIDDEN_MODULES = [
+    "tensorflow", "keras", "torch", "transformers", "openai", "textblob", "nltk",
+    "vaderSentiment", "xgboost", "sklearn", "binance", "h5py"
+]
+
 # إعدادات مستقبلية ممكن إضافتها:
 # MAX_TRADE_AMOUNT = 100
 # ENABLE_TRADE_EXECUTION = True
 # TELEGRAM_NOTIFICATIONS_ENABLED = True
 # TRAINING_AFTER_TRADES = 10
-# SUPPORTED_SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
@@ -1,19 +1,57 @@
 # database.py
 
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import execute_values
 import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from config import DB_POOL_MIN_CONNECTIONS, DB_POOL_MAX_CONNECTIONS, DB_FLUSH_BATCH_SIZE, DB_FLUSH_INTERVAL_SECONDS
 
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# ✅ مجمع اتصالات مشترك يُنشأ عند أول استخدام
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool يرفع خطأ عند نفاد الاتصالات، فننتظر دورنا بدلًا من ذلك
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX_CONNECTIONS)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                DB_POOL_MIN_CONNECTIONS,
+                DB_POOL_MAX_CONNECTIONS,
+                dbname=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                host=os.getenv("DB_HOST", "localhost"),
+                port=os.getenv("DB_PORT", 5432)
+            )
+        return _pool
+
+
+# ✅ استعارة اتصال من المجمع: commit عند النجاح و rollback عند الخطأ ثم إعادته للمجمع
+@contextmanager
 def get_connection():
-    return psycopg2.connect(
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", 5432)
-    )
+    with _pool_slots:
+        pool = _get_pool()
+        conn = pool.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
 
 # ✅ إنشاء الجداول
 def create_tables():
@@ -25,8 +63,8 @@ def create_tables():
                     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     symbol TEXT,
                     decision TEXT,
-                    lstm_signal FLOAT,
-                    xgb_signal INT,
+                    lstm_signal TEXT,
+                    xgb_signal TEXT,
                     technical_signal TEXT,
                     sentiment_score FLOAT,
                     liquidity_score FLOAT,
@@ -37,6 +75,13 @@ def create_tables():
                 );
             """)
 
+            # إشارات LSTM و XGBoost تُسجَّل كـ BUY/SELL (مثل سجل القرارات)، فالجداول القديمة تُحوَّل أعمدتها لنص
+            cur.execute("""
+                ALTER TABLE bot_decisions
+                    ALTER COLUMN lstm_signal TYPE TEXT USING lstm_signal::TEXT,
+                    ALTER COLUMN xgb_signal TYPE TEXT USING xgb_signal::TEXT;
+            """)
+
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS closed_trades (
                     id SERIAL PRIMARY KEY,
@@ -77,89 +122,140 @@ def create_tables():
                 );
             """)
 
+            # تقييم القرارات يقرأ الصفقات المغلقة بنطاق زمني
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_closed_trades_timestamp ON closed_trades (timestamp);")
+
             conn.commit()
             print("✅ [Database] تم إنشاء جميع الجداول بنجاح.")
 
+# ✅ أعمدة كل جدول يكتب فيه الكاتب الخلفي (timestamp يُسجَّل وقت الحدث لا وقت الكتابة)
+TABLE_COLUMNS = {
+    "bot_decisions": [
+        "timestamp", "symbol", "decision", "lstm_signal", "xgb_signal", "technical_signal",
+        "sentiment_score", "liquidity_score", "rl_decision", "confidence_score", "executed", "decision_result"
+    ],
+    "closed_trades": ["timestamp", "symbol", "entry_price", "exit_price", "quantity", "pnl", "duration_minutes"],
+    "performance_metrics": ["timestamp", "total_trades", "total_profit", "total_loss", "win_rate", "report_type"],
+    "backtest_trades": [
+        "timestamp", "symbol", "strategy", "signal", "entry_price", "exit_price", "quantity", "pnl", "test_name"
+    ]
+}
+
+
+class WriteBehindLogger:
+    """
+    طابور صفوف يكتبها خيط خلفي في قاعدة البيانات بإدخال متعدد الصفوف لكل جدول،
+    عند تجمّع batch_size صف أو مرور interval ثانية. flush() ينتظر كتابة كل ما سبقه.
+    """
+
+    def __init__(self, batch_size=DB_FLUSH_BATCH_SIZE, interval=DB_FLUSH_INTERVAL_SECONDS):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def put(self, table, row):
+        self._ensure_started()
+        self._queue.put((table, row))
+
+    def flush(self, timeout=None):
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("__flush__", done))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    table, row = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if table == "__flush__":
+                    waiters.append(row)
+                    break
+                batch.append((table, row))
+
+            if batch:
+                self._write(batch)
+            for done in waiters:
+                done.set()
+
+    def _write(self, batch):
+        by_table = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+
+        for table, rows in by_table.items():
+            try:
+                self._insert(table, rows)
+            except Exception as e:
+                # صف واحد معيب لا يجب أن يُسقط الدفعة كلها: إعادة المحاولة صفًا صفًا
+                logging.warning(f"⚠️ [Database] فشل إدخال دفعة من {len(rows)} صف في {table}: {e}")
+                for row in rows:
+                    try:
+                        self._insert(table, [row])
+                    except Exception as row_error:
+                        logging.error(f"❌ [Database] فشل تسجيل صف في {table}: {row_error}")
+
+    def _insert(self, table, rows):
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, f"INSERT INTO {table} ({', '.join(TABLE_COLUMNS[table])}) VALUES %s", rows, page_size=1000)
+
+
+_writer = WriteBehindLogger()
+
+
+def _queue_row(table, data, timestamp=None):
+    row = dict(data, timestamp=timestamp or datetime.now())
+    _writer.put(table, tuple(row.get(column) for column in TABLE_COLUMNS[table]))
+
+
+# ✅ انتظار كتابة كل الصفوف المعلّقة (يُستدعى تلقائيًا عند إغلاق البرنامج)
+def flush_pending_writes(timeout=None):
+    return _writer.flush(timeout)
+
+
+atexit.register(flush_pending_writes, 30)
+
 # ✅ تسجيل قرار البوت
 def log_bot_decision_to_db(data: dict):
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO bot_decisions (
-                    symbol, decision, lstm_signal, xgb_signal, technical_signal,
-                    sentiment_score, liquidity_score, rl_decision,
-                    confidence_score, executed, decision_result
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                data.get("symbol"),
-                data.get("decision"),
-                data.get("lstm_signal"),
-                data.get("xgb_signal"),
-                data.get("technical_signal"),
-                data.get("sentiment_score"),
-                data.get("liquidity_score"),
-                data.get("rl_decision"),
-                data.get("confidence_score"),
-                data.get("executed"),
-                data.get("decision_result", None)
-            ))
-            conn.commit()
+    _queue_row("bot_decisions", data)
 
 # ✅ تسجيل الصفقة المغلقة
 def log_closed_trade_to_db(data: dict):
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO closed_trades (
-                    symbol, entry_price, exit_price, quantity, pnl, duration_minutes
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                data.get("symbol"),
-                data.get("entry_price"),
-                data.get("exit_price"),
-                data.get("quantity"),
-                data.get("pnl"),
-                data.get("duration_minutes")
-            ))
-            conn.commit()
+    _queue_row("closed_trades", data)
 
 # ✅ تحديث أداء التداول
 def update_performance_metrics(total_trades, total_profit, total_loss, win_rate, report_type):
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO performance_metrics (
-                    total_trades, total_profit, total_loss, win_rate, report_type
-                ) VALUES (%s, %s, %s, %s, %s)
-            """, (
-                total_trades,
-                total_profit,
-                total_loss,
-                win_rate,
-                report_type
-            ))
-            conn.commit()
+    _queue_row("performance_metrics", {
+        "total_trades": total_trades,
+        "total_profit": total_profit,
+        "total_loss": total_loss,
+        "win_rate": win_rate,
+        "report_type": report_type
+    })
 
 # ✅ تسجيل صفقة من نتائج باك تست
 def log_backtest_trade(data: dict):
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO backtest_trades (
-                    symbol, strategy, signal, entry_price,
-                    exit_price, quantity, pnl, test_name
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                data.get("symbol"),
-                data.get("strategy"),
-                data.get("signal"),
-                data.get("entry_price"),
-                data.get("exit_price"),
-                data.get("quantity"),
-                data.get("pnl"),
-                data.get("test_name")
-            ))
-            conn.commit()
+    _queue_row("backtest_trades", data, data.get("timestamp"))
+
+# ✅ تسجيل صفقات باك تست دفعة واحدة
+def log_backtest_trades(rows: list):
+    for data in rows:
+        _queue_row("backtest_trades", data, data.get("timestamp"))
 
 if __name__ == "__main__":
     create_tables()
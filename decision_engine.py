@@ -1,7 +1,9 @@
 import json
 import os
 import logging
+import numpy as np
 from gpt_utils import get_gpt_trade_recommendation
+from signal_pool import run_with_deadlines
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -30,14 +32,19 @@ def load_weights():
     return DEFAULT_WEIGHTS
 
 # ✅ الدالة الرئيسية لاتخاذ القرار الذكي
-def smart_decision(signals, weights=None):
+# الإشارات المفقودة (None) لا تصوّت، فتُحسب الثقة فقط على الإشارات التي وصلت
+def smart_decision(signals, weights=None, gpt_timeout=None):
     try:
         if weights is None:
             weights = load_weights()
 
         decision_scores = {"BUY": 0.0, "SELL": 0.0, "HOLD": 0.0}
+        missing_signals = []
 
-        def apply_vote(signal_value, weight, buy_value="BUY", sell_value="SELL"):
+        def apply_vote(name, signal_value, weight, buy_value="BUY", sell_value="SELL"):
+            if signals.get(name) is None:
+                missing_signals.append(name)
+                return
             if signal_value == buy_value:
                 decision_scores["BUY"] += weight
             elif signal_value == sell_value:
@@ -45,20 +52,32 @@ def smart_decision(signals, weights=None):
             else:
                 decision_scores["HOLD"] += weight * 0.5
 
+        sentiment_score = signals.get("sentiment_score")
+        liquidity_score = signals.get("liquidity_score")
+
         # ✅ تطبيق الإشارات الأساسية
-        apply_vote(signals.get("lstm_signal"), weights.get("lstm_weight", 1))
-        apply_vote(signals.get("xgb_signal"), weights.get("xgb_weight", 1))
-        apply_vote(signals.get("technical_signal"), weights.get("technical_weight", 1))
-        apply_vote("BUY" if signals.get("sentiment_score", 0) > 0 else "SELL", weights.get("sentiment_weight", 1))
-        apply_vote("BUY" if signals.get("liquidity_score", 1) > 1 else "SELL", weights.get("liquidity_weight", 1))
-        apply_vote(signals.get("rl_decision"), weights.get("rl_weight", 1))
-
-        # ✅ توصية GPT (اختياري)
+        apply_vote("lstm_signal", signals.get("lstm_signal"), weights.get("lstm_weight", 1))
+        apply_vote("xgb_signal", signals.get("xgb_signal"), weights.get("xgb_weight", 1))
+        apply_vote("technical_signal", signals.get("technical_signal"), weights.get("technical_weight", 1))
+        apply_vote("sentiment_score", "BUY" if (sentiment_score or 0) > 0 else "SELL", weights.get("sentiment_weight", 1))
+        apply_vote("liquidity_score", "BUY" if (liquidity_score or 1) > 1 else "SELL", weights.get("liquidity_weight", 1))
+        apply_vote("rl_decision", signals.get("rl_decision"), weights.get("rl_weight", 1))
+
+        # ✅ توصية GPT (اختياري) مع مهلة عند تحديدها
         gpt_decision = None
         gpt_confidence = 0.0
         if weights.get("use_gpt", True):
             try:
-                gpt_result = get_gpt_trade_recommendation(signals)
+                if gpt_timeout is None:
+                    gpt_result = get_gpt_trade_recommendation(signals)
+                else:
+                    results, _ = run_with_deadlines(
+                        {"gpt": lambda: get_gpt_trade_recommendation(signals, timeout=gpt_timeout)},
+                        {"gpt": gpt_timeout}
+                    )
+                    gpt_result = results.get("gpt")
+                if gpt_result is None:
+                    raise TimeoutError("انتهت مهلة GPT")
                 gpt_decision = gpt_result["decision"]
                 gpt_confidence = gpt_result["confidence"]
                 if gpt_decision in decision_scores:
@@ -76,7 +95,8 @@ def smart_decision(signals, weights=None):
             "confidence": confidence_score,
             "scores": decision_scores,
             "gpt_decision": gpt_decision,
-            "gpt_confidence": gpt_confidence
+            "gpt_confidence": gpt_confidence,
+            "missing_signals": missing_signals
         }
 
     except Exception as e:
@@ -86,5 +106,46 @@ def smart_decision(signals, weights=None):
             "confidence": 0,
             "scores": {"BUY": 0, "SELL": 0, "HOLD": 1},
             "gpt_decision": None,
-            "gpt_confidence": 0
+            "gpt_confidence": 0,
+            "missing_signals": []
         }
+
+# ✅ نفس تصويت smart_decision على مصفوفات كاملة (بدون GPT) للباك تست
+def smart_decision_vectorized(signals, weights=None):
+    """
+    signals: مصفوفات بنفس الطول؛ الإشارات النصية كـ object (None = مفقودة)
+    و sentiment_score / liquidity_score كأرقام (NaN = مفقودة).
+    يعيد (decisions, confidence) بنفس ترتيب الصفوف.
+    """
+    if weights is None:
+        weights = load_weights()
+
+    n = len(next(iter(signals.values())))
+    scores = np.zeros((3, n))  # BUY, SELL, HOLD
+
+    def apply_vote(values, weight, present):
+        is_buy = (values == "BUY") & present
+        is_sell = (values == "SELL") & present
+        scores[0] += weight * is_buy
+        scores[1] += weight * is_sell
+        scores[2] += weight * 0.5 * (present & ~is_buy & ~is_sell)
+
+    for name, weight_key in [("lstm_signal", "lstm_weight"), ("xgb_signal", "xgb_weight"),
+                             ("technical_signal", "technical_weight"), ("rl_decision", "rl_weight")]:
+        values = signals.get(name)
+        if values is not None:
+            values = np.asarray(values, dtype=object)
+            apply_vote(values, weights.get(weight_key, 1), values != None)  # noqa: E711
+
+    for name, weight_key, neutral in [("sentiment_score", "sentiment_weight", 0), ("liquidity_score", "liquidity_weight", 1)]:
+        values = signals.get(name)
+        if values is not None:
+            values = np.asarray(values, dtype=float)
+            apply_vote(np.where(values > neutral, "BUY", "SELL"), weights.get(weight_key, 1), ~np.isnan(values))
+
+    final = scores.argmax(axis=0)
+    total = scores.sum(axis=0)
+    chosen = scores[final, np.arange(n)]
+    confidence = np.round(np.divide(chosen, total, out=np.zeros(n), where=total > 0), 3)
+    decisions = np.array(["BUY", "SELL", "HOLD"], dtype=object)[final]
+    return decisions, confidence
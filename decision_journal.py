@@ -0,0 +1,302 @@
+# decision_journal.py
+
+import os
+import glob
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from config import JOURNAL_DIR, JOURNAL_FLUSH_ROWS, JOURNAL_FLUSH_SECONDS, JOURNAL_COMPACTION_GRACE_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# سجل قرارات البوت كملفات Parquet مقسّمة حسب اليوم: JOURNAL_DIR/date=YYYY-MM-DD/part-*.parquet
+# القراءة تختار الأعمدة المطلوبة فقط وتتخطى الأيام والرموز خارج الفلتر بدون قراءة محتواها.
+#
+# دمج يوم منتهٍ آمن للقراءة من أي عملية: يُكتب compact-<id>.parquet ثم علامة compact-<id>.json
+# (بتبديل ذري) تسرد الملفات التي استبدلها. العلامة هي لحظة التبديل: قبلها يرى القارئ المقاطع فقط، وبعدها
+# ملف الدمج فقط، ولا يرى الاثنين معًا. المقاطع المستبدلة تُحذف بعد JOURNAL_COMPACTION_GRACE_SECONDS.
+LEGACY_CSV_FILE = "bot_decisions.csv"
+# قفل دمج اليوم بين العمليات (يُعتبر متروكًا بعد هذه المدة)
+COMPACTION_LOCK_FILE = ".compacting"
+COMPACTION_LOCK_STALE_SECONDS = 3600
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us")),
+    ("symbol", pa.string()),
+    ("decision", pa.string()),
+    ("lstm_signal", pa.string()),
+    ("xgb_signal", pa.string()),
+    ("technical_signal", pa.string()),
+    ("sentiment_score", pa.float64()),
+    ("liquidity_score", pa.float64()),
+    ("rl_decision", pa.string()),
+    ("confidence_score", pa.float64()),
+    ("executed", pa.bool_()),
+    ("gpt_decision", pa.string()),
+    ("gpt_confidence", pa.float64()),
+    ("missing_signals", pa.string())
+])
+
+
+def _to_float(value):
+    try:
+        return None if value is None or value == "" else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value):
+    return None if value is None or (isinstance(value, float) and value != value) else str(value)
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return None if value is None else bool(value)
+
+
+def _read_markers(directory):
+    markers = {}
+    for path in glob.glob(os.path.join(directory, "compact-*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                markers[os.path.basename(path)[:-len(".json")]] = json.load(f)
+        except (OSError, ValueError):
+            continue  # علامة حُذفت للتو: تجاهلها يعني المقاطع بدون ملف دمجها، وهو عرض متسق
+    return markers
+
+
+# ✅ الملفات الحية ليوم: مقاطع لم تستبدلها علامة دمج، وملفات دمج لها علامة ولم تُستبدل بدورها
+def live_day_files(directory):
+    # العلامات تُقرأ قبل سرد الملفات: وجود علامة يعني أن ملف دمجها كُتب قبلها فيظهر في السرد
+    markers = _read_markers(directory)
+    replaced = {name for marker in markers.values() for name in marker["replaces"]}
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    live = []
+    for name in sorted(names):
+        if not name.endswith(".parquet") or name in replaced:
+            continue
+        if name.startswith("part-") or (name.startswith("compact-") and name[:-len(".parquet")] in markers):
+            live.append(os.path.join(directory, name))
+    return live
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _normalize(data):
+    timestamp = data.get("timestamp")
+    timestamp = pd.Timestamp(timestamp).to_pydatetime() if timestamp else datetime.utcnow()
+    row = {"timestamp": timestamp.replace(tzinfo=None)}
+    for field in SCHEMA:
+        if field.name == "timestamp":
+            continue
+        value = data.get(field.name)
+        if pa.types.is_floating(field.type):
+            row[field.name] = _to_float(value)
+        elif pa.types.is_boolean(field.type):
+            row[field.name] = _to_bool(value)
+        else:
+            row[field.name] = _to_text(value)
+    return row
+
+
+class DecisionJournal:
+    """
+    كاتب مخزّن مؤقتًا: الصفوف تتجمع في الذاكرة وتُكتب كملف Parquet جديد (مقطع) عند بلوغ
+    JOURNAL_FLUSH_ROWS صف أو مرور JOURNAL_FLUSH_SECONDS، ومقاطع الأيام المنتهية تُدمج في ملف واحد.
+    """
+
+    def __init__(self, path=JOURNAL_DIR):
+        self.path = path
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.first_buffered_at = None
+        self.migrated = False
+
+    def append(self, data):
+        with self.lock:
+            self._migrate_legacy_csv()
+            if not self.buffer:
+                self.first_buffered_at = time.monotonic()
+            self.buffer.append(_normalize(data))
+            due = len(self.buffer) >= JOURNAL_FLUSH_ROWS or time.monotonic() - self.first_buffered_at >= JOURNAL_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        rows, self.buffer = self.buffer, []
+        if rows:
+            self._write_segments(rows)
+            self._compact_closed_days()
+
+    def _write_segments(self, rows):
+        by_date = {}
+        for row in rows:
+            by_date.setdefault(row["timestamp"].date().isoformat(), []).append(row)
+
+        for date, date_rows in by_date.items():
+            directory = os.path.join(self.path, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            # ترتيب حسب الرمز ثم الوقت حتى تكون إحصاءات مجموعات الصفوف مفيدة للفلترة
+            table = pa.Table.from_pylist(sorted(date_rows, key=lambda r: (r["symbol"] or "", r["timestamp"])), schema=SCHEMA)
+            self._write_atomic(table, os.path.join(directory, f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"))
+
+    def _write_atomic(self, table, target):
+        tmp_path = target + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, target)
+
+    def _compact_closed_days(self):
+        today = f"date={datetime.utcnow().date().isoformat()}"
+        for directory in glob.glob(os.path.join(self.path, "date=*")):
+            if os.path.basename(directory) >= today:
+                continue
+            self._remove_replaced(directory)
+            if len(live_day_files(directory)) >= 2 and self._lock_day(directory):
+                try:
+                    self._compact_day(directory)
+                finally:
+                    _remove(os.path.join(directory, COMPACTION_LOCK_FILE))
+
+    def _lock_day(self, directory):
+        # عمليتان تدمجان نفس اليوم معًا تنتجان ملفي دمج لنفس المقاطع، فالدمج حصري عبر ملف قفل
+        lock_path = os.path.join(directory, COMPACTION_LOCK_FILE)
+        try:
+            if time.time() - os.path.getmtime(lock_path) > COMPACTION_LOCK_STALE_SECONDS:
+                _remove(lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _compact_day(self, directory):
+        files = live_day_files(directory)
+        if len(files) < 2:
+            return
+        table = pa.concat_tables([pq.read_table(path, schema=SCHEMA) for path in files])
+        table = table.sort_by([("symbol", "ascending"), ("timestamp", "ascending")])
+        name = f"compact-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        self._write_atomic(table, os.path.join(directory, name + ".parquet"))
+
+        marker_path = os.path.join(directory, name + ".json")
+        with open(marker_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"replaces": [os.path.basename(path) for path in files], "committed_at": time.time()}, f)
+        os.replace(marker_path + ".tmp", marker_path)
+
+    # ✅ حذف ما استبدله الدمج بعد مهلة السماح، ثم العلامات التي لم يعد لها ما تشير إليه
+    def _remove_replaced(self, directory):
+        markers = _read_markers(directory)
+        now = time.time()
+        for marker in markers.values():
+            if now - marker.get("committed_at", now) >= JOURNAL_COMPACTION_GRACE_SECONDS:
+                for name in marker["replaces"]:
+                    _remove(os.path.join(directory, name))
+        for name, marker in markers.items():
+            # علامة ملف دمج حُذف (استبدله دمج أحدث) ولم يبق شيء مما استبدلته
+            leftovers = [name + ".parquet"] + marker["replaces"]
+            if not any(os.path.exists(os.path.join(directory, leftover)) for leftover in leftovers):
+                _remove(os.path.join(directory, name + ".json"))
+
+    # ✅ استيراد bot_decisions.csv القديم مرة واحدة عند بدء السجل الجديد
+    def _migrate_legacy_csv(self):
+        if self.migrated:
+            return
+        self.migrated = True
+        if os.path.exists(self.path) or not os.path.exists(LEGACY_CSV_FILE):
+            return
+        try:
+            legacy = pd.read_csv(LEGACY_CSV_FILE, dtype=str, keep_default_na=False)
+            rows = [_normalize(record) for record in legacy.to_dict("records")]
+            if rows:
+                self._write_segments(rows)
+            logging.info(f"✅ [Journal] تم استيراد {len(rows)} قرار من {LEGACY_CSV_FILE}.")
+        except Exception as e:
+            logging.warning(f"⚠️ [Journal] فشل استيراد {LEGACY_CSV_FILE}: {e}")
+
+    # السرد تحت قفل السجل؛ والقراءة بعده آمنة لأن الدمج لا يحذف ملفًا قبل مهلة السماح
+    def files(self):
+        with self.lock:
+            self._migrate_legacy_csv()
+            self._flush_locked()
+            return [path for directory in sorted(glob.glob(os.path.join(self.path, "date=*")))
+                    for path in live_day_files(directory)]
+
+
+def _build_filter(start=None, end=None, symbols=None, executed=None):
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start).to_pydatetime()
+        conditions.append(ds.field("timestamp") >= pa.scalar(start, pa.timestamp("us")))
+    if end is not None:
+        end = pd.Timestamp(end).to_pydatetime()
+        conditions.append(ds.field("timestamp") <= pa.scalar(end, pa.timestamp("us")))
+    if symbols is not None:
+        conditions.append(ds.field("symbol").isin(list(symbols)))
+    if executed is not None:
+        conditions.append(ds.field("executed") == executed)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _open_dataset(start=None, end=None):
+    # تخطي ملفات الأيام خارج النطاق بالاعتماد على اسم المجلد فقط
+    start_day = pd.Timestamp(start).date().isoformat() if start is not None else ""
+    end_day = pd.Timestamp(end).date().isoformat() if end is not None else "9999"
+    files = [path for path in _journal.files()
+             if start_day <= os.path.basename(os.path.dirname(path)).split("=", 1)[1] <= end_day]
+    return ds.dataset(files, format="parquet", schema=SCHEMA) if files else None
+
+
+_journal = DecisionJournal()
+atexit.register(_journal.flush)
+
+
+# ✅ إضافة قرار للسجل (يُكتب على القرص دفعة واحدة لاحقًا)
+def append_decision(data: dict):
+    _journal.append(data)
+
+
+def flush_journal():
+    _journal.flush()
+
+
+# ✅ قراءة القرارات: columns لاختيار الأعمدة، و start/end/symbols/executed للفلترة
+def read_decisions(columns=None, start=None, end=None, symbols=None, executed=None):
+    dataset = _open_dataset(start, end)
+    if dataset is None:
+        return pd.DataFrame(columns=columns or SCHEMA.names)
+    table = dataset.to_table(columns=columns, filter=_build_filter(start, end, symbols, executed))
+    return table.to_pandas()
+
+
+def count_decisions(start=None, end=None, symbols=None, executed=None):
+    dataset = _open_dataset(start, end)
+    if dataset is None:
+        return 0
+    return dataset.count_rows(filter=_build_filter(start, end, symbols, executed))
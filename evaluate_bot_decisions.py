@@ -1,66 +1,76 @@
 # evaluate_bot_decisions.py
 
-import psycopg2
 import pandas as pd
 import logging
-from dotenv import load_dotenv
-import os
 from datetime import timedelta
+from psycopg2.extras import execute_values
+from database import get_connection
 
-load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_connection():
-    return psycopg2.connect(
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=os.getenv("DB_PORT", 5432)
+# القرار يُربط بأقرب صفقة منفذة بعده مباشرة خلال هذه المدة
+MATCH_WINDOW = timedelta(minutes=10)
+# هامش إضافي لوصول الصفوف من الكاتب الخلفي قبل اعتبار القرار نهائيًا
+SETTLE_DELAY = timedelta(minutes=1)
+
+# ✅ القرارات المنفذة التي لم تُقيَّم بعد: كل ما بعد آخر قرار مُقيَّم (العلامة المائية هي أكبر id له نتيجة)
+def load_pending_decisions(conn):
+    decisions = pd.read_sql("""
+        SELECT id, timestamp, symbol FROM bot_decisions
+        WHERE executed = true
+          AND id > (SELECT COALESCE(MAX(id), 0) FROM bot_decisions WHERE decision_result IS NOT NULL)
+        ORDER BY id
+    """, conn)
+    decisions["timestamp"] = pd.to_datetime(decisions["timestamp"])
+
+    # لا نقيّم قرارًا قبل انتهاء نافذته، ونتوقف عند أول قرار غير جاهز حتى لا تتجاوزه العلامة المائية
+    ready = decisions["timestamp"] <= pd.Timestamp.now() - MATCH_WINDOW - SETTLE_DELAY
+    return decisions[ready.cummin()]
+
+def load_trades_between(conn, start, end):
+    trades = pd.read_sql("""
+        SELECT timestamp, symbol, pnl FROM closed_trades
+        WHERE timestamp >= %s AND timestamp <= %s
+    """, conn, params=(start.to_pydatetime(), end.to_pydatetime()))
+    trades["timestamp"] = pd.to_datetime(trades["timestamp"])
+    return trades
+
+# ✅ ربط القرارات بالصفقات دفعة واحدة (merge_asof للأمام لكل رمز)
+def label_decisions(decisions, trades):
+    matched = pd.merge_asof(
+        decisions.sort_values("timestamp"),
+        trades.sort_values("timestamp"),
+        on="timestamp",
+        by="symbol",
+        direction="forward",
+        tolerance=MATCH_WINDOW
     )
+    matched["decision_result"] = "NA"
+    matched.loc[matched["pnl"] > 0, "decision_result"] = "WIN"
+    matched.loc[matched["pnl"] <= 0, "decision_result"] = "LOSS"
+    return matched[["id", "decision_result"]]
 
 def evaluate_bot_decisions():
     try:
         with get_connection() as conn:
-            decisions = pd.read_sql("SELECT * FROM bot_decisions WHERE executed = true", conn)
-            trades = pd.read_sql("SELECT * FROM closed_trades", conn)
-
-            if decisions.empty or trades.empty:
-                logging.warning("⚠️ لا توجد بيانات كافية للتقييم.")
+            decisions = load_pending_decisions(conn)
+            if decisions.empty:
+                logging.info("ℹ️ لا توجد قرارات جديدة للتقييم.")
                 return
 
-            decisions["timestamp"] = pd.to_datetime(decisions["timestamp"])
-            trades["timestamp"] = pd.to_datetime(trades["timestamp"])
+            trades = load_trades_between(conn, decisions["timestamp"].min(), decisions["timestamp"].max() + MATCH_WINDOW)
+            labels = label_decisions(decisions, trades)
 
-            # ربط كل قرار بأقرب صفقة منفذة بعده مباشرة (خلال 10 دقائق)
-            updated = 0
+            # تحديث جماعي واحد بدل UPDATE لكل صف
             with conn.cursor() as cur:
-                for _, row in decisions.iterrows():
-                    decision_time = row["timestamp"]
-                    symbol = row["symbol"]
-
-                    match = trades[
-                        (trades["symbol"] == symbol) &
-                        (trades["timestamp"] >= decision_time) &
-                        (trades["timestamp"] <= decision_time + timedelta(minutes=10))
-                    ]
-
-                    if not match.empty:
-                        trade = match.iloc[0]
-                        result = "WIN" if trade["pnl"] > 0 else "LOSS"
-                    else:
-                        result = "NA"
-
-                    cur.execute("""
-                        UPDATE bot_decisions
-                        SET decision_result = %s
-                        WHERE id = %s
-                    """, (result, row["id"]))
-                    updated += 1
-
-                conn.commit()
+                execute_values(cur, """
+                    UPDATE bot_decisions AS d
+                    SET decision_result = v.decision_result
+                    FROM (VALUES %s) AS v(id, decision_result)
+                    WHERE d.id = v.id
+                """, list(zip(labels["id"].tolist(), labels["decision_result"].tolist())), page_size=1000)
 
-            logging.info(f"✅ تم تقييم {updated} قرار وربطه بنتائج الصفقات.")
+            logging.info(f"✅ تم تقييم {len(labels)} قرار وربطه بنتائج الصفقات.")
 
     except Exception as e:
         logging.error(f"❌ [Evaluation Error] فشل في تحليل دقة القرارات: {e}")
@@ -1,9 +1,27 @@
-import openai
 import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import Future
 from dotenv import load_dotenv
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from config import GPT_CACHE_TTL_SECONDS, GPT_CACHE_FILE, GPT_SCORE_STEP, GPT_NEWS_BATCH_SIZE, GPT_REQUEST_TIMEOUT
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# ✅ مكتبة openai تُستورد عند أول طلب فقط: استيرادها وحده يكلف أكثر من ثانية في كل تشغيل جديد
+_openai = None
+_openai_lock = threading.Lock()
+
+def _get_openai():
+    global _openai
+    with _openai_lock:
+        if _openai is None:
+            import openai
+            openai.api_key = os.getenv("OPENAI_API_KEY")
+            _openai = openai
+        return _openai
 
 # ✅ دالة تحليل المشاعر بالأخبار باستخدام GPT
 def analyze_sentiment_gpt(news_text):
@@ -15,10 +33,11 @@ def analyze_sentiment_gpt(news_text):
 أجب فقط برقم عشري بين -1 و +1 بدون شرح.
 """
     try:
-        response = openai.ChatCompletion.create(
+        response = _get_openai().ChatCompletion.create(
             model="gpt-4",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3,
+            request_timeout=GPT_REQUEST_TIMEOUT,
         )
         score = float(response.choices[0].message.content.strip())
         return round(score, 3)
@@ -26,26 +45,71 @@ def analyze_sentiment_gpt(news_text):
         print(f"❌ [GPT Sentiment Error] {e}")
         return 0.0
 
-# ✅ دالة توصية تداول ذكية باستخدام GPT
-def get_gpt_trade_recommendation(signals):
-    """
-    signals = {
-        "lstm_signal": "BUY",
-        "xgb_signal": "BUY",
-        "technical_signal": "BUY",
-        "sentiment_score": 0.7,
-        "liquidity_score": 1.2,
-        "rl_decision": "BUY"
-    }
-    """
+# ✅ تحليل مشاعر عدة أخبار في طلب واحد (GPT_NEWS_BATCH_SIZE خبر لكل طلب)
+# الأخبار التي لم يُجب عنها تبقى None (فشل لا درجة محايدة) حتى يُعاد تحليلها لاحقًا
+def _parse_numbered_scores(content, count):
+    scores = [None] * count
+    for line in content.splitlines():
+        match = re.match(r"^\s*(\d+)\s*[:.)\-]\s*([-+]?\d*\.?\d+)", line)
+        if match and 1 <= int(match.group(1)) <= count:
+            scores[int(match.group(1)) - 1] = round(max(-1.0, min(1.0, float(match.group(2)))), 3)
+    return scores
+
+def analyze_news_batch_with_gpt(news_texts):
+    scores = []
+    for start in range(0, len(news_texts), GPT_NEWS_BATCH_SIZE):
+        group = news_texts[start:start + GPT_NEWS_BATCH_SIZE]
+        numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(group, 1))
+        prompt = f"""
+قم بتحليل المشاعر في كل خبر من الأخبار التالية المتعلقة بالبيتكوين، وقيّم كل خبر بين -1 (سلبي) و +1 (إيجابي):
+
+{numbered}
+
+أجب بسطر واحد لكل خبر بالتنسيق: <رقم الخبر>: <رقم عشري بين -1 و +1> بدون شرح.
+"""
+        try:
+            response = _get_openai().ChatCompletion.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                request_timeout=GPT_REQUEST_TIMEOUT,
+            )
+            scores.extend(_parse_numbered_scores(response.choices[0].message.content, len(group)))
+        except Exception as e:
+            print(f"❌ [GPT Sentiment Error] {e}")
+            scores.extend([None] * len(group))
+    return scores
+
+def analyze_news_with_gpt(news_text):
+    return analyze_news_batch_with_gpt([news_text])[0]
+
+# ✅ مفتاح التوصية: الإشارات كما هي والدرجات مقرّبة لأقرب GPT_SCORE_STEP
+# إشارات بنفس المفتاح ترسل نفس السؤال حرفيًا، فتكفي إجابة واحدة لها
+def _quantize(value):
+    if value is None:
+        return None
+    return round(round(float(value) / GPT_SCORE_STEP) * GPT_SCORE_STEP, 3)
+
+def recommendation_key(signals):
+    return (
+        signals.get("lstm_signal"),
+        signals.get("xgb_signal"),
+        signals.get("technical_signal"),
+        _quantize(signals.get("sentiment_score")),
+        _quantize(signals.get("liquidity_score")),
+        signals.get("rl_decision")
+    )
+
+def _request_trade_recommendation(key):
+    lstm_signal, xgb_signal, technical_signal, sentiment_score, liquidity_score, rl_decision = key
     prompt = f"""
 أنت محلل تداول ذكي. لديك الإشارات التالية:
-- LSTM: {signals.get("lstm_signal")}
-- XGBoost: {signals.get("xgb_signal")}
-- التحليل الفني: {signals.get("technical_signal")}
-- مؤشر المشاعر: {signals.get("sentiment_score")}
-- مؤشر السيولة: {signals.get("liquidity_score")}
-- تعلم التعزيز: {signals.get("rl_decision")}
+- LSTM: {lstm_signal}
+- XGBoost: {xgb_signal}
+- التحليل الفني: {technical_signal}
+- مؤشر المشاعر: {sentiment_score}
+- مؤشر السيولة: {liquidity_score}
+- تعلم التعزيز: {rl_decision}
 
 بناءً على هذه الإشارات، ما هي التوصية الأفضل؟
 - BUY (شراء)
@@ -58,37 +122,122 @@ Confidence: <رقم بين 0 و 1>
 Reason: <شرح منطقي>
 """
 
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-        )
+    response = _get_openai().ChatCompletion.create(
+        model="gpt-4",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        request_timeout=GPT_REQUEST_TIMEOUT,
+    )
+
+    content = response.choices[0].message.content.strip()
+    lines = content.splitlines()
+    decision = ""
+    confidence = 0.0
+    reason = ""
 
-        content = response.choices[0].message.content.strip()
-        lines = content.splitlines()
-        decision = ""
-        confidence = 0.0
-        reason = ""
-
-        for line in lines:
-            if "Decision:" in line:
-                decision = line.split("Decision:")[1].strip().upper()
-            elif "Confidence:" in line:
-                confidence = float(line.split("Confidence:")[1].strip())
-            elif "Reason:" in line:
-                reason = line.split("Reason:")[1].strip()
-
-        return {
-            "decision": decision,
-            "confidence": round(confidence, 3),
-            "reason": reason
-        }
+    for line in lines:
+        if "Decision:" in line:
+            decision = line.split("Decision:")[1].strip().upper()
+        elif "Confidence:" in line:
+            confidence = float(line.split("Confidence:")[1].strip())
+        elif "Reason:" in line:
+            reason = line.split("Reason:")[1].strip()
+
+    return {
+        "decision": decision,
+        "confidence": round(confidence, 3),
+        "reason": reason
+    }
+
+# ✅ ذاكرة التوصيات: key -> {"result", "expires_at"} مع حفظها في GPT_CACHE_FILE لتبقى بعد إعادة التشغيل
+_cache = None
+_inflight = {}
+_cache_lock = threading.Lock()
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        try:
+            with open(GPT_CACHE_FILE, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    _cache[tuple(entry["key"])] = {"result": entry["result"], "expires_at": entry["expires_at"]}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ [GPT Cache] تجاهل ملف الذاكرة التالف: {e}")
+    return _cache
+
+def _save_cache():
+    now = time.time()
+    entries = [{"key": list(key), **entry} for key, entry in _cache.items() if entry["expires_at"] > now]
+    tmp_path = GPT_CACHE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False)
+    os.replace(tmp_path, GPT_CACHE_FILE)
+
+def clear_gpt_cache():
+    global _cache
+    with _cache_lock:
+        _cache = {}
+        if os.path.exists(GPT_CACHE_FILE):
+            os.remove(GPT_CACHE_FILE)
+
+# ✅ دالة توصية تداول ذكية باستخدام GPT
+def get_gpt_trade_recommendation(signals, timeout=None):
+    """
+    signals = {
+        "lstm_signal": "BUY",
+        "xgb_signal": "BUY",
+        "technical_signal": "BUY",
+        "sentiment_score": 0.7,
+        "liquidity_score": 1.2,
+        "rl_decision": "BUY"
+    }
+    التوصية تُحفظ لمدة GPT_CACHE_TTL_SECONDS، والطلبات المتزامنة بنفس المفتاح تنتظر طلبًا واحدًا
+    لمدة timeout على الأكثر (GPT_REQUEST_TIMEOUT افتراضيًا)، ثم تعود بتوصية HOLD دون انتظار الطلب العالق.
+    """
+    key = recommendation_key(signals)
+
+    with _cache_lock:
+        cache = _load_cache()
+        entry = cache.get(key)
+        if entry is not None and entry["expires_at"] > time.time():
+            return dict(entry["result"])
+
+        pending = _inflight.get(key)
+        owner = pending is None
+        if owner:
+            pending = _inflight[key] = Future()
+
+    result = {
+        "decision": "HOLD",
+        "confidence": 0.0,
+        "reason": "حدث خطأ أثناء تحليل GPT."
+    }
+    if not owner:
+        try:
+            return dict(pending.result(timeout=GPT_REQUEST_TIMEOUT if timeout is None else timeout))
+        except FutureTimeoutError:
+            print("⏱️ [GPT Trade Recommendation] انتهت مهلة انتظار طلب جارٍ بنفس المفتاح.")
+            return dict(result, reason="انتهت مهلة انتظار GPT.")
+
+    try:
+        result = _request_trade_recommendation(key)
+        with _cache_lock:
+            _cache[key] = {"result": result, "expires_at": time.time() + GPT_CACHE_TTL_SECONDS}
+            try:
+                _save_cache()
+            except Exception as e:
+                print(f"⚠️ [GPT Cache] فشل حفظ الذاكرة: {e}")
 
     except Exception as e:
+        # الأخطاء لا تُخزّن حتى يُعاد المحاولة في الدورة التالية
         print(f"❌ [GPT Trade Recommendation Error] {e}")
-        return {
-            "decision": "HOLD",
-            "confidence": 0.0,
-            "reason": "حدث خطأ أثناء تحليل GPT."
-        }
+
+    finally:
+        with _cache_lock:
+            del _inflight[key]
+        pending.set_result(result)
+
+    return dict(result)
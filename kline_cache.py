@@ -0,0 +1,154 @@
+# kline_cache.py
+
+import time
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from binance_client import get_client
+from config import KLINE_REFRESH_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+KLINE_COLUMNS = [
+    "timestamp", "open", "high", "low", "close", "volume",
+    "close_time", "quote_asset_volume", "number_of_trades",
+    "taker_buy_base", "taker_buy_quote", "ignore"
+]
+
+# الحد الأقصى لعدد الشموع في طلب واحد على Binance Futures
+MAX_REQUEST_LIMIT = 1500
+
+INTERVAL_SECONDS = {
+    "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "8h": 28800,
+    "12h": 43200, "1d": 86400, "3d": 259200, "1w": 604800
+}
+
+# ✅ مخزن الشموع المشترك لكل العمليات: (symbol, interval) -> {"df", "synced_at", "capacity"}
+_store = {}
+_store_lock = threading.Lock()
+_key_locks = {}
+
+
+def _lock_for(key):
+    with _store_lock:
+        if key not in _key_locks:
+            _key_locks[key] = threading.Lock()
+        return _key_locks[key]
+
+
+def candles_for_days(interval, days):
+    """
+    عدد الشموع التي تغطي عدد الأيام المطلوب لفريم زمني معيّن
+    """
+    return int(days * 86400 // INTERVAL_SECONDS[interval])
+
+
+def _to_frame(klines):
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    df.set_index("timestamp", inplace=True)
+    df = df.drop(columns=["ignore"]).astype(float)
+    return df
+
+
+def download_klines(symbol, interval, limit, start_time=None, end_time=None):
+    params = {"symbol": symbol, "interval": interval, "limit": min(limit, MAX_REQUEST_LIMIT)}
+    if start_time is not None:
+        params["startTime"] = int(start_time)
+    if end_time is not None:
+        params["endTime"] = int(end_time)
+    return _to_frame(get_client().futures_klines(**params))
+
+
+def _open_time_ms(ts):
+    return int(ts.value // 1_000_000)
+
+
+# ✅ تحميل التاريخ كاملاً (مع التقسيم إلى صفحات للطلبات الكبيرة)
+def _backfill(symbol, interval, limit):
+    frames = []
+    remaining = limit
+    end_time = None
+    while remaining > 0:
+        page = min(remaining, MAX_REQUEST_LIMIT)
+        df = download_klines(symbol, interval, page, end_time=end_time)
+        if df.empty:
+            break
+        frames.insert(0, df)
+        remaining -= len(df)
+        if len(df) < page:
+            break
+        end_time = _open_time_ms(df.index[0]) - 1
+
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames)
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+
+# ✅ جلب الشموع الأحدث فقط بدءًا من آخر شمعة مخزنة
+def _sync_forward(symbol, interval, df):
+    last_open = _open_time_ms(df.index[-1])
+    now_ms = time.time() * 1000
+    # الشمعة الأخيرة ما زالت مفتوحة ولم تُغلق بعد: نعيد جلبها فقط لتحديث سعرها
+    start_time = last_open if df["close_time"].iloc[-1] >= now_ms else df["close_time"].iloc[-1] + 1
+
+    new_frames = []
+    while True:
+        new = download_klines(symbol, interval, MAX_REQUEST_LIMIT, start_time=start_time)
+        if new.empty:
+            break
+        new_frames.append(new)
+        if len(new) < MAX_REQUEST_LIMIT:
+            break
+        start_time = new["close_time"].iloc[-1] + 1
+
+    if not new_frames:
+        return df
+    new = pd.concat(new_frames)
+    merged = pd.concat([df[df.index < new.index[0]], new])
+    return merged[~merged.index.duplicated(keep="last")]
+
+
+# ✅ الدالة الرئيسية: إرجاع آخر limit شمعة من المخزن مع مزامنة تزايدية
+def get_klines(symbol, interval, limit=100):
+    key = (symbol, interval)
+    with _lock_for(key):
+        entry = _store.get(key)
+        try:
+            if entry is None or len(entry["df"]) < limit:
+                df = _backfill(symbol, interval, limit)
+                entry = {"df": df, "synced_at": time.time(), "capacity": limit}
+                _store[key] = entry
+            elif time.time() - entry["synced_at"] >= KLINE_REFRESH_SECONDS:
+                entry["df"] = _sync_forward(symbol, interval, entry["df"])
+                entry["synced_at"] = time.time()
+
+            entry["capacity"] = max(entry["capacity"], limit)
+            if len(entry["df"]) > entry["capacity"]:
+                entry["df"] = entry["df"].iloc[-entry["capacity"]:]
+
+        except Exception as e:
+            logging.error(f"❌ [Kline Cache] فشل تحديث الشموع {symbol} {interval}: {e}")
+            if entry is None:
+                return pd.DataFrame()
+
+        return entry["df"].iloc[-limit:].copy()
+
+
+# ✅ إرجاع عمود واحد كمصفوفة NumPy (بدون نسخ DataFrame كامل)
+def get_kline_array(symbol, interval, limit=100, column="close"):
+    df = get_klines(symbol, interval, limit)
+    if df.empty:
+        return np.empty(0)
+    return df[column].to_numpy()
+
+
+# ✅ مسح المخزن (كامل أو لرمز معيّن)
+def clear_cache(symbol=None):
+    with _store_lock:
+        for key in list(_store):
+            if symbol is None or key[0] == symbol:
+                del _store[key]
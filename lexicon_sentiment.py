@@ -0,0 +1,38 @@
+# lexicon_sentiment.py
+# تحليل المشاعر المعجمي (TextBlob + VADER) في وحدة خفيفة لا تستورد TensorFlow،
+# حتى تبدأ عمليات مجمع المعالجة بسرعة. المكتبتان تُستوردان عند أول تحليل فقط
+# (TextBlob يستورد nltk)، فالعملية الرئيسية لا تدفع ثمنهما إن تم التحليل في المجمع.
+
+import logging
+import threading
+
+_vader_analyzer = None
+_vader_lock = threading.Lock()
+
+def _get_vader():
+    global _vader_analyzer
+    with _vader_lock:
+        if _vader_analyzer is None:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            _vader_analyzer = SentimentIntensityAnalyzer()
+        return _vader_analyzer
+
+def analyze_sentiment_textblob(text: str) -> float:
+    try:
+        from textblob import TextBlob
+        blob = TextBlob(text)
+        return blob.sentiment.polarity
+    except Exception as e:
+        logging.error(f"❌ [TextBlob] فشل تحليل المشاعر: {e}")
+        return None
+
+def analyze_sentiment_vader(text: str) -> float:
+    try:
+        return _get_vader().polarity_scores(text)['compound']
+    except Exception as e:
+        logging.error(f"❌ [VADER] فشل تحليل المشاعر: {e}")
+        return None
+
+# ✅ تُنفّذ داخل عملية منفصلة: (TextBlob, VADER) لكل نص
+def score_texts(texts):
+    return [(analyze_sentiment_textblob(text), analyze_sentiment_vader(text)) for text in texts]
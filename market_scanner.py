@@ -0,0 +1,69 @@
+# market_scanner.py
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bot import run_bot_once
+from kline_cache import get_klines
+from predict_lstm_signal import predict_lstm_signals_batch, lstm_result_to_signal, INTERVALS as LSTM_INTERVALS
+from train_xgb import predict_xgb_signals_batch
+from utils import xgb_prediction_to_signal
+from config import SUPPORTED_SYMBOLS, SCAN_CONCURRENCY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# الفريمات التي تحتاجها كل الإشارات (LSTM + XGB على الساعة + الفني والسيولة على 5 دقائق)
+SCAN_INTERVALS = sorted(set(LSTM_INTERVALS) | {"1h", "5m"})
+
+# ✅ مجمع منفصل عن مجمع الإشارات حتى لا تنتظر مهام الرموز عمالًا يشغلهم نفس الرمز
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SCAN_CONCURRENCY, thread_name_prefix="scan")
+        return _executor
+
+
+# ✅ تسخين مخزن الشموع لكل الرموز بتوازٍ محدود
+def prefetch_market_data(symbols):
+    jobs = [(symbol, interval) for symbol in symbols for interval in SCAN_INTERVALS]
+    list(_get_executor().map(lambda job: get_klines(job[0], job[1], limit=100), jobs))
+
+
+# ✅ توقعات النماذج لكل الرموز دفعة واحدة
+def batch_model_signals(symbols):
+    lstm_results = predict_lstm_signals_batch(symbols)
+    xgb_results = predict_xgb_signals_batch({symbol: get_klines(symbol, "1h", limit=100) for symbol in symbols})
+    return {
+        symbol: {
+            "lstm_signal": lstm_result_to_signal(lstm_results[symbol]),
+            "xgb_signal": xgb_prediction_to_signal(xgb_results[symbol])
+        }
+        for symbol in symbols
+    }
+
+
+# ✅ دورة مسح كاملة لقائمة الرموز
+def run_scan_once(symbols=None):
+    symbols = symbols or SUPPORTED_SYMBOLS
+    started_at = time.monotonic()
+    try:
+        prefetch_market_data(symbols)
+        precomputed = batch_model_signals(symbols)
+
+        # باقي الإشارات والقرار والتنفيذ لكل رمز، بتوازٍ محدود
+        list(_get_executor().map(lambda symbol: run_bot_once(symbol, precomputed[symbol]), symbols))
+
+        logging.info(f"🔎 [Scan] تم مسح {len(symbols)} رمز خلال {time.monotonic() - started_at:.1f} ثانية.")
+
+    except Exception as e:
+        logging.error(f"❌ [Scan Error] فشل مسح الرموز: {e}")
+
+
+if __name__ == "__main__":
+    run_scan_once()
@@ -0,0 +1,132 @@
+# model_registry.py
+
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from datetime import datetime
+from config import MODEL_RELOAD_CHECK_SECONDS, MODEL_VERSIONS_DIR, MODEL_KEEP_VERSIONS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# ✅ سجل النماذج المحمّلة في الذاكرة: name -> {"paths", "loader", "model", "stamp", "checked_at", "lock"}
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register_model(name, paths, loader):
+    """
+    تسجيل نموذج ليتم تحميله مرة واحدة وإبقاؤه في الذاكرة.
+    loader يستقبل المسارات بنفس الترتيب ويعيد الكائن الجاهز للاستخدام.
+    """
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = {
+                "paths": list(paths),
+                "loader": loader,
+                "model": None,
+                "stamp": None,
+                "checked_at": 0.0,
+                "lock": threading.Lock()
+            }
+
+
+def _file_stamp(paths):
+    return tuple(os.stat(path).st_mtime_ns for path in paths)
+
+
+def _pointer_path(name):
+    return os.path.join(MODEL_VERSIONS_DIR, name, "current")
+
+
+# ✅ مسارات ملفات النسخة الحالية: داخل مجلد النسخة المرقّاة إن وُجد مؤشر، وإلا المسارات الأصلية
+def current_model_paths(name, paths):
+    try:
+        with open(_pointer_path(name), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return list(paths)
+    directory = os.path.join(MODEL_VERSIONS_DIR, name, version)
+    return [os.path.join(directory, os.path.basename(path)) for path in paths]
+
+
+def replace_with_retry(src, dst, attempts=5):
+    # على ويندوز يفشل الاستبدال إن كانت عملية أخرى تقرأ الملف الهدف في نفس اللحظة
+    for attempt in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+
+# ✅ إرجاع النموذج الحالي مع إعادة التحميل التلقائي عند تغيّر الملفات
+def get_model(name):
+    entry = _registry[name]
+    if entry["model"] is not None and time.time() - entry["checked_at"] < MODEL_RELOAD_CHECK_SECONDS:
+        return entry["model"]
+
+    with entry["lock"]:
+        entry["checked_at"] = time.time()
+        try:
+            paths = current_model_paths(name, entry["paths"])
+            stamp = (tuple(paths), _file_stamp(paths))
+        except OSError:
+            if entry["model"] is None:
+                logging.warning(f"⚠️ [Model Registry] ملفات النموذج {name} غير موجودة.")
+            return entry["model"]
+
+        if stamp != entry["stamp"]:
+            try:
+                model = entry["loader"](*paths)
+                # استبدال ذري: المستدعون يرون إما النسخة القديمة أو الجديدة كاملة
+                entry["model"], entry["stamp"] = model, stamp
+                logging.info(f"🔄 [Model Registry] تم تحميل نسخة جديدة من النموذج: {name}")
+            except Exception as e:
+                logging.error(f"❌ [Model Registry] فشل تحميل النموذج {name} (سيتم الإبقاء على النسخة الحالية): {e}")
+
+        return entry["model"]
+
+
+# ✅ ترقية ملفات مرحلية كنسخة جديدة: تُنقل كلها إلى مجلد نسخة جديد لا يتغير بعدها،
+# ثم يُستبدل ملف المؤشر باستبدال ذري واحد، فأي عملية تقرأ المؤشر ترى النسخة القديمة أو الجديدة كاملة
+# (لا نموذج من نسخة و scaler من أخرى)
+def promote_model(name, staged_paths, target_paths):
+    version = f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+    directory = os.path.join(MODEL_VERSIONS_DIR, name, version)
+    os.makedirs(directory)
+    for staged, target in zip(staged_paths, target_paths):
+        os.replace(staged, os.path.join(directory, os.path.basename(target)))
+
+    pointer = _pointer_path(name)
+    tmp_pointer = f"{pointer}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    replace_with_retry(tmp_pointer, pointer)
+
+    invalidate_model(name)
+    _remove_old_versions(name, version)
+    logging.info(f"🚀 [Model Registry] تمت ترقية النموذج: {name} (النسخة {version})")
+
+
+def _remove_old_versions(name, current):
+    # أسماء النسخ تبدأ بالوقت فالترتيب الأبجدي ترتيب زمني؛ النسخ القديمة قد تكون مفتوحة لدى عملية أخرى
+    root = os.path.join(MODEL_VERSIONS_DIR, name)
+    versions = sorted(entry.name for entry in os.scandir(root) if entry.is_dir())
+    for version in versions[:-MODEL_KEEP_VERSIONS]:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+
+# ✅ فرض إعادة التحميل في الاستدعاء القادم
+def invalidate_model(name):
+    entry = _registry.get(name)
+    if entry is not None:
+        entry["stamp"] = None
+        entry["checked_at"] = 0.0
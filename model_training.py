@@ -1,12 +1,11 @@
 import os
 import json
-import pandas as pd
-import subprocess
 from notifier import send_telegram_message
+from training_orchestrator import train_models, format_results
+from decision_journal import count_decisions
 
 # عدد الصفقات المطلوبة قبل إعادة التدريب
 TRAINING_INTERVAL = 50
-DECISIONS_FILE = "bot_decisions.csv"
 STATUS_FILE = "training_status.json"
 
 # تحميل الحالة السابقة
@@ -21,21 +20,14 @@ def save_status(status):
     with open(STATUS_FILE, "w") as f:
         json.dump(status, f, indent=4)
 
-# تنفيذ سكربت تدريب
-def run_script(script_path):
-    result = subprocess.run(["python", script_path], capture_output=True, text=True)
-    return result.stdout + "\n" + result.stderr
-
 # الدالة الرئيسية
 def main():
-    if not os.path.exists(DECISIONS_FILE):
-        print("❌ لا يوجد ملف bot_decisions.csv")
+    # ✅ عدّ الصفقات المنفذة من سجل القرارات بدون تحميل الأعمدة
+    executed_count = count_decisions(executed=True)
+    if executed_count == 0:
+        print("❌ لا توجد قرارات منفذة في سجل القرارات")
         return
 
-    df = pd.read_csv(DECISIONS_FILE)
-    executed_df = df[df["executed"] == True]
-    executed_count = len(executed_df)
-
     status = load_status()
     last_trained = status.get("last_trained_count", 0)
 
@@ -43,12 +35,10 @@ def main():
     if executed_count - last_trained >= TRAINING_INTERVAL:
         send_telegram_message(f"🧠 بدأ تدريب النماذج بعد {executed_count} صفقة منفذة...")
 
-        # ✅ تدريب LSTM
-        lstm_output = run_script("train_lstm_model.py")
-        # ✅ تدريب XGB
-        xgb_output = run_script("train_xgb.py")
+        # ✅ تدريب LSTM و XGB بالتوازي مع ترقية الأفضل فقط
+        results = train_models()
 
-        send_telegram_message("✅ *تم الانتهاء من تدريب النماذج*\n📊 LSTM و XGBoost جاهزين!")
+        send_telegram_message("✅ *تم الانتهاء من تدريب النماذج*\n" + format_results(results))
 
         # حفظ الحالة الجديدة
         status["last_trained_count"] = executed_count
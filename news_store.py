@@ -0,0 +1,232 @@
+# news_store.py
+
+import os
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from sentiment_analysis import fetch_news_articles, article_text, aggregate_sentiment_batch
+from config import (NEWS_QUERIES, NEWS_STORE_FILE, NEWS_PAGE_SIZE, NEWS_HALF_LIFE_MINUTES,
+                    NEWS_PRIOR_WEIGHT, NEWS_RETENTION_DAYS)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# الحقول التي يحتاجها _record: سطر ينقصه أحدها يُتخطى مثل سطر JSON التالف
+ENTRY_FIELDS = ("symbol", "key", "published", "published_at", "score")
+
+
+class DecayedSentimentIndex:
+    """
+    متوسط مرجّح بوزن يتناقص أسيًا مع عمر الخبر (نصف عمر half_life_seconds).
+    نحتفظ بالمجموعين مرجعين لآخر وقت (reference)، فالإضافة والقراءة بزمن ثابت.
+    prior_weight وزن وهمي لمشاعر محايدة (0)، فيعود المؤشر تدريجيًا للحياد عند غياب الأخبار.
+    """
+
+    def __init__(self, half_life_seconds, prior_weight=1.0):
+        self.decay_rate = math.log(2) / half_life_seconds
+        self.prior_weight = prior_weight
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+        self.reference = None
+
+    def _factor(self, from_time, to_time):
+        return math.exp(-self.decay_rate * (to_time - from_time))
+
+    def add(self, score, timestamp):
+        if self.reference is None:
+            self.reference = timestamp
+        if timestamp > self.reference:
+            factor = self._factor(self.reference, timestamp)
+            self.weighted_sum *= factor
+            self.weight *= factor
+            self.reference = timestamp
+        # خبر أقدم من المرجع يدخل بوزنه المتناقص مباشرة
+        weight = self._factor(timestamp, self.reference)
+        self.weighted_sum += score * weight
+        self.weight += weight
+
+    def value(self, now=None):
+        if self.reference is None:
+            return 0.0
+        factor = self._factor(self.reference, max(now or time.time(), self.reference))
+        return round(self.weighted_sum * factor / (self.weight * factor + self.prior_weight), 3)
+
+
+def _published_at(article):
+    published = article.get("publishedAt")
+    if not published:
+        return time.time()
+    return datetime.fromisoformat(published.replace("Z", "+00:00")).timestamp()
+
+
+def _article_key(article):
+    # الرابط يميّز الخبر، وعند غيابه نستخدم بصمة النص
+    return article.get("url") or hashlib.sha256(article_text(article).encode("utf-8")).hexdigest()
+
+
+class NewsStore:
+    """
+    مخزن أخبار محلي: جلب تزايدي منذ آخر publishedAt لكل رمز، إزالة المكرر،
+    وحفظ الأخبار المقيّمة (سطر JSON لكل خبر) ليُعاد بناء المؤشرات عند إعادة التشغيل.
+    """
+
+    def __init__(self, path=NEWS_STORE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.last_published = {}
+        # أخبار فشل تقييمها لكل رمز: لا تُحفظ في المخزن، وتُعاد مع الجلب التالي (الجلب التزايدي لن يعيدها من NewsAPI).
+        # تُحفظ في ملف جانبي صغير حتى لا تضيع بين تشغيلات poll_news المنفصلة (run_full_automation.bat)
+        self.unscored_path = path + ".unscored.json"
+        self.unscored = {}
+        self.indexes = {}
+        self._load()
+        self._load_unscored()
+
+    def _index(self, symbol):
+        if symbol not in self.indexes:
+            self.indexes[symbol] = DecayedSentimentIndex(NEWS_HALF_LIFE_MINUTES * 60, NEWS_PRIOR_WEIGHT)
+        return self.indexes[symbol]
+
+    def _record(self, entry):
+        self.seen.add((entry["symbol"], entry["key"]))
+        self._index(entry["symbol"]).add(entry["score"], entry["published_at"])
+        previous = self.last_published.get(entry["symbol"])
+        if previous is None or entry["published"] > previous:
+            self.last_published[entry["symbol"]] = entry["published"]
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        cutoff = time.time() - NEWS_RETENTION_DAYS * 86400
+        kept = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(entry, dict) or any(field not in entry for field in ENTRY_FIELDS):
+                    continue
+                if not isinstance(entry["score"], (int, float)):
+                    continue
+                if isinstance(entry["published_at"], (int, float)) and entry["published_at"] >= cutoff:
+                    kept.append(entry)
+
+        for entry in sorted(kept, key=lambda e: e["published_at"]):
+            self._record(entry)
+
+        # إعادة كتابة الملف بدون الأخبار القديمة حتى لا يكبر بلا حد
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in kept:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _load_unscored(self):
+        try:
+            with open(self.unscored_path, "r", encoding="utf-8") as f:
+                unscored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(unscored, dict):
+            self.unscored = {symbol: articles for symbol, articles in unscored.items() if isinstance(articles, dict)}
+
+    def _save_unscored(self):
+        tmp_path = self.unscored_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.unscored, f, ensure_ascii=False)
+        os.replace(tmp_path, self.unscored_path)
+
+    # ✅ جلب الأخبار الجديدة لرمز وتقييمها وتحديث مؤشره
+    def poll(self, symbol):
+        query = NEWS_QUERIES.get(symbol, symbol)
+        articles = fetch_news_articles(
+            os.getenv("NEWS_API_KEY"), query, NEWS_PAGE_SIZE, since=self.last_published.get(symbol)
+        )
+
+        with self.lock:
+            fresh = dict(self.unscored.get(symbol, {}))
+            for article in articles:
+                key = _article_key(article)
+                if (symbol, key) not in self.seen and key not in fresh:
+                    fresh[key] = article
+
+        if fresh:
+            scores = aggregate_sentiment_batch([article_text(article) for article in fresh.values()])
+            entries = []
+            failed = {}
+            for (key, article), score in zip(fresh.items(), scores):
+                # خبر بلا درجة حقيقية لا يُحفظ: الحفظ مع إزالة المكرر يمنع إعادة تقييمه للأبد
+                if score is None:
+                    failed[key] = article
+                    continue
+                entries.append({
+                    "symbol": symbol,
+                    "key": key,
+                    "published": article.get("publishedAt") or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "published_at": _published_at(article),
+                    "title": article.get("title"),
+                    "score": score
+                })
+
+            with self.lock:
+                if failed or symbol in self.unscored:
+                    cutoff = time.time() - NEWS_RETENTION_DAYS * 86400
+                    self.unscored[symbol] = {key: article for key, article in failed.items()
+                                             if _published_at(article) >= cutoff}
+                    if not self.unscored[symbol]:
+                        del self.unscored[symbol]
+                    self._save_unscored()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for entry in entries:
+                        if (symbol, entry["key"]) in self.seen:
+                            continue
+                        self._record(entry)
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+            logging.info(f"📰 [News] {len(entries)} خبر جديد لـ {symbol} | المؤشر: {self.sentiment(symbol)}")
+            if failed:
+                logging.warning(f"⚠️ [News] فشل تقييم {len(failed)} خبر لـ {symbol}، ستُعاد في الجلب القادم.")
+
+        return len(fresh)
+
+    def sentiment(self, symbol, now=None):
+        with self.lock:
+            index = self.indexes.get(symbol)
+            return index.value(now) if index is not None else 0.0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_news_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NewsStore()
+        return _store
+
+
+# ✅ جلب دوري لكل الرموز (يُجدول في bot_scheduler)
+def poll_news(symbols=None):
+    store = get_news_store()
+    for symbol in symbols or NEWS_QUERIES.keys():
+        try:
+            store.poll(symbol)
+        except Exception as e:
+            logging.error(f"❌ [News] فشل جلب أخبار {symbol}: {e}")
+
+
+# ✅ مؤشر المشاعر الحالي لرمز: قراءة فقط من المؤشر المعاد بناؤه من news_store.jsonl،
+# بدون أي طلب NewsAPI أو GPT في دورة البوت. الجلب يتم فقط في poll_news (الجدولة أو run_full_automation.bat)
+def get_sentiment_index(symbol):
+    return get_news_store().sentiment(symbol)
+
+
+if __name__ == "__main__":
+    poll_news()
@@ -1,28 +1,183 @@
 import requests
 import os
+import time
+import queue
+import atexit
 import logging
+import threading
 from dotenv import load_dotenv
+from config import (TELEGRAM_API_URL, TELEGRAM_QUEUE_SIZE, TELEGRAM_MAX_RETRIES, TELEGRAM_REQUEST_TIMEOUT,
+                    TELEGRAM_CHAT_INTERVAL_SECONDS, TELEGRAM_GLOBAL_PER_SECOND, TELEGRAM_COALESCE_SECONDS)
 
 load_dotenv()
 
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN") or os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
-def send_telegram_message(message: str):
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
+# حد Telegram لطول الرسالة الواحدة، والمساحة المحجوزة لعنوان كل جزء من الملخص
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_HEADER_RESERVE = 64
+
+
+class TelegramDispatcher:
+    """
+    إرسال الإشعارات في خيط خلفي حتى لا ينتظر التداول واجهة Telegram:
+    طابور محدود، جلسة HTTP دائمة، إعادة محاولة مع تراجع أسي (واحترام retry_after عند 429)،
+    حد أدنى بين رسائل نفس المحادثة وحد عام للرسائل في الثانية.
+    الرسائل بنفس coalesce_key خلال TELEGRAM_COALESCE_SECONDS تُدمج في رسالة ملخص واحدة.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=TELEGRAM_QUEUE_SIZE)
+        self._session = requests.Session()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pending = {}          # (chat_id, key) -> {"messages", "due"}
+        self._next_allowed = {}     # chat_id -> أقرب وقت مسموح للإرسال
+        self._recent_sends = []     # أوقات الإرسال خلال آخر ثانية (الحد العام)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+                self._thread.start()
+
+    def submit(self, message, chat_id=None, coalesce_key=None):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((chat_id or TELEGRAM_CHAT_ID, message, coalesce_key))
+        except queue.Full:
+            logging.warning("⚠️ طابور إشعارات Telegram ممتلئ، تم تجاهل الرسالة.")
+
+    def flush(self, timeout=None):
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("__flush__", done, None))
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._pending:
+                timeout = max(min(group["due"] for group in self._pending.values()) - time.monotonic(), 0)
+            try:
+                chat_id, message, coalesce_key = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                chat_id = None
+
+            if chat_id == "__flush__":
+                self._send_due(force=True)
+                message.set()
+                continue
+            if chat_id is not None:
+                if coalesce_key is None:
+                    self._deliver(chat_id, message)
+                else:
+                    group = self._pending.setdefault((chat_id, coalesce_key), {
+                        "messages": [], "due": time.monotonic() + TELEGRAM_COALESCE_SECONDS
+                    })
+                    group["messages"].append(message)
+            self._send_due()
+
+    def _send_due(self, force=False):
+        now = time.monotonic()
+        for pending_key in [k for k, group in self._pending.items() if force or group["due"] <= now]:
+            chat_id, _ = pending_key
+            messages = self._pending.pop(pending_key)["messages"]
+            if len(messages) == 1:
+                self._deliver(chat_id, messages[0])
+            else:
+                for part in _digest_parts(messages):
+                    self._deliver(chat_id, part)
+
+    def _wait_for_rate_limit(self, chat_id):
+        now = time.monotonic()
+        self._recent_sends = [t for t in self._recent_sends if now - t < 1.0]
+        wait = self._next_allowed.get(chat_id, 0) - now
+        if len(self._recent_sends) >= TELEGRAM_GLOBAL_PER_SECOND:
+            wait = max(wait, 1.0 - (now - self._recent_sends[0]))
+        if wait > 0:
+            time.sleep(wait)
+
+    def _deliver(self, chat_id, message):
+        if len(message) > MAX_MESSAGE_LENGTH:
+            message = message[:MAX_MESSAGE_LENGTH - 1] + "…"
+        url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}/sendMessage"
         payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
+            "chat_id": chat_id,
             "text": message,
             "parse_mode": "Markdown"
         }
-        response = requests.post(url, data=payload)
-        if response.status_code == 200:
-            logging.info("📤 تم إرسال إشعار Telegram بنجاح.")
-        else:
-            logging.warning(f"⚠️ فشل إرسال Telegram: {response.text}")
-    except Exception as e:
-        logging.error(f"❌ [Telegram Error] {e}")
+
+        for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+            self._wait_for_rate_limit(chat_id)
+            retry_after = 2 ** attempt
+            try:
+                response = self._session.post(url, data=payload, timeout=TELEGRAM_REQUEST_TIMEOUT)
+                sent_at = time.monotonic()
+                self._recent_sends.append(sent_at)
+                self._next_allowed[chat_id] = sent_at + TELEGRAM_CHAT_INTERVAL_SECONDS
+
+                if response.status_code == 200:
+                    logging.info("📤 تم إرسال إشعار Telegram بنجاح.")
+                    return True
+                if response.status_code == 429:
+                    try:
+                        retry_after = response.json().get("parameters", {}).get("retry_after", retry_after)
+                    except ValueError:
+                        pass
+                elif response.status_code < 500:
+                    # خطأ في الطلب نفسه (تنسيق، محادثة خاطئة...) لا تفيده إعادة المحاولة
+                    logging.warning(f"⚠️ فشل إرسال Telegram: {response.text}")
+                    return False
+            except Exception as e:
+                logging.error(f"❌ [Telegram Error] {e}")
+
+            if attempt < TELEGRAM_MAX_RETRIES:
+                time.sleep(retry_after)
+
+        logging.warning("⚠️ فشل إرسال Telegram بعد كل المحاولات.")
+        return False
+
+
+def _digest_parts(messages):
+    """
+    تقسيم الملخص عند حدود الرسائل إلى أجزاء أقصر من MAX_MESSAGE_LENGTH: القص وسط الرسالة قد يكسر زوج
+    Markdown (*...*) فيرفض Telegram الملخص كله (400). الرسالة الأطول من الحد وحدها تأخذ جزءًا خاصًا بها.
+    """
+    limit = MAX_MESSAGE_LENGTH - DIGEST_HEADER_RESERVE
+    chunks, current = [], []
+    for message in (m.strip() for m in messages):
+        if current and len("\n\n".join(current + [message])) > limit:
+            chunks.append(current)
+            current = []
+        current.append(message)
+    if current:
+        chunks.append(current)
+
+    if len(chunks) == 1:
+        return [f"🗂️ *ملخص {len(messages)} تنبيهات*\n" + "\n\n".join(chunks[0])]
+    return [f"🗂️ *ملخص {len(messages)} تنبيهات ({index}/{len(chunks)})*\n" + "\n\n".join(chunk)
+            for index, chunk in enumerate(chunks, 1)]
+
+
+_dispatcher = TelegramDispatcher()
+
+
+def send_telegram_message(message: str, coalesce_key=None, chat_id=None):
+    """
+    إضافة الرسالة لطابور الإرسال والعودة فورًا.
+    coalesce_key: تنبيهات متشابهة متقاربة (مثل ضعف الثقة على عدة رموز) تُرسل كملخص واحد.
+    """
+    _dispatcher.submit(message, chat_id, coalesce_key)
+
+
+def flush_telegram_messages(timeout=None):
+    return _dispatcher.flush(timeout)
+
+
+atexit.register(flush_telegram_messages, 30)
 
 def notify_trade_decision(symbol, decision, confidence, executed):
     """
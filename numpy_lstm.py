@@ -0,0 +1,230 @@
+# numpy_lstm.py
+
+import json
+import logging
+import threading
+import numpy as np
+from config import LSTM_RESYNC_STEPS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# استدلال LSTM بـ NumPy فقط من ملف Keras (.h5) بدون تحميل TensorFlow في عملية التداول.
+# أوزان Keras للـ LSTM مرتبة كبوابات (i, f, c, o) في أعمدة kernel و recurrent_kernel و bias.
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x):
+    exp = np.exp(x - x.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "linear": lambda x: x,
+    "softmax": _softmax
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"دالة تفعيل غير مدعومة: {name}")
+    return ACTIVATIONS[name]
+
+
+# ✅ قراءة طبقات نموذج Keras من ملف h5: [(class_name, config, {اسم الوزن: مصفوفة})] بترتيب النموذج
+def read_keras_h5(path):
+    import h5py  # يُستورد عند تحميل النموذج فقط
+
+    with h5py.File(path, "r") as f:
+        config = json.loads(f.attrs["model_config"])
+        weights_group = f["model_weights"]
+        layers = []
+        for layer in config["config"]["layers"]:
+            name = layer["config"]["name"]
+            weights = {}
+            if name in weights_group:
+                group = weights_group[name]
+                for weight_name in group.attrs["weight_names"]:
+                    weight_name = weight_name.decode() if isinstance(weight_name, bytes) else weight_name
+                    short = weight_name.split("/")[-1].split(":")[0]
+                    weights[short] = np.asarray(group[weight_name], dtype=np.float32)
+            layers.append((layer["class_name"], layer["config"], weights))
+        return layers
+
+
+class LSTMLayer:
+    def __init__(self, config, weights):
+        if config.get("go_backwards"):
+            raise ValueError("LSTM بالاتجاه العكسي غير مدعوم")
+        self.units = int(config["units"])
+        self.kernel = weights["kernel"]
+        self.recurrent_kernel = weights["recurrent_kernel"]
+        self.bias = weights.get("bias", np.zeros(4 * self.units, dtype=np.float32))
+        self.activation = _activation(config.get("activation", "tanh"))
+        self.recurrent_activation = _activation(config.get("recurrent_activation", "sigmoid"))
+        self.return_sequences = bool(config.get("return_sequences", False))
+
+    def initial_state(self, batch):
+        zeros = np.zeros((batch, self.units), dtype=np.float32)
+        return zeros, zeros.copy()
+
+    def step(self, x, state):
+        return self.step_projected(x @ self.kernel + self.bias, state)
+
+    # خطوة من إسقاط مدخلات محسوب مسبقًا (x @ kernel + bias)، مثل جدول Embedding مدموج مع kernel
+    def step_projected(self, projected, state):
+        h, c = state
+        z = projected + h @ self.recurrent_kernel
+        u = self.units
+        i = self.recurrent_activation(z[:, :u])
+        f = self.recurrent_activation(z[:, u:2 * u])
+        g = self.activation(z[:, 2 * u:3 * u])
+        o = self.recurrent_activation(z[:, 3 * u:])
+        c = f * c + i * g
+        h = o * self.activation(c)
+        return h, (h, c)
+
+
+class DenseLayer:
+    def __init__(self, config, weights):
+        self.kernel = weights["kernel"]
+        self.bias = weights.get("bias", np.zeros(self.kernel.shape[1], dtype=np.float32))
+        self.activation = _activation(config.get("activation", "linear"))
+
+    def __call__(self, x):
+        return self.activation(x @ self.kernel + self.bias)
+
+
+class NumpyLSTM:
+    """
+    طبقات LSTM متتالية ثم طبقات Dense، من ملف Keras (Sequential). الـ Dropout يُتجاهل في الاستدلال.
+    predict(X) بنفس واجهة Keras لنوافذ (N, steps, features)، و step/run للاستخدام المتدفق.
+    """
+
+    def __init__(self, layers):
+        self.recurrent = []
+        self.head = []
+        for class_name, config, weights in layers:
+            if class_name == "LSTM":
+                if self.head:
+                    raise ValueError("طبقة LSTM بعد Dense غير مدعومة")
+                self.recurrent.append(LSTMLayer(config, weights))
+            elif class_name == "Dense":
+                self.head.append(DenseLayer(config, weights))
+            elif class_name not in ("InputLayer", "Dropout"):
+                raise ValueError(f"طبقة غير مدعومة في LSTM NumPy: {class_name}")
+        if not self.recurrent:
+            raise ValueError("لا توجد طبقة LSTM في النموذج")
+        # كل طبقة LSTM تمرر تسلسلها للتالية، والأخيرة تمرر آخر حالة فقط لطبقات Dense
+        if any(not layer.return_sequences for layer in self.recurrent[:-1]) or self.recurrent[-1].return_sequences:
+            raise ValueError("ترتيب return_sequences غير مدعوم")
+
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_keras_h5(path))
+
+    def initial_states(self, batch=1):
+        return [layer.initial_state(batch) for layer in self.recurrent]
+
+    # ✅ خطوة زمنية واحدة لكل الطبقات: x بشكل (batch, features)
+    def step(self, x, states):
+        new_states = []
+        for layer, state in zip(self.recurrent, states):
+            x, state = layer.step(x, state)
+            new_states.append(state)
+        return x, new_states
+
+    def run(self, X, states=None):
+        X = np.asarray(X, dtype=np.float32)
+        states = states or self.initial_states(len(X))
+        h = None
+        for t in range(X.shape[1]):
+            h, states = self.step(X[:, t, :], states)
+        return h, states
+
+    def output(self, h):
+        for layer in self.head:
+            h = layer(h)
+        return h
+
+    def predict(self, X, batch_size=1024, verbose=0):
+        X = np.asarray(X, dtype=np.float32)
+        outputs = [self.output(self.run(X[start:start + batch_size])[0]) for start in range(0, len(X), batch_size)]
+        return np.concatenate(outputs) if outputs else np.zeros((0, 1), dtype=np.float32)
+
+    # ✅ توقع متدفق لرمز: السلسلة كاملة مع توقيتها، وآخر صف هو الشمعة الجارية (لا تُضاف للحالة)
+    def predict_stream(self, symbol, timestamps, series, look_back):
+        return self.predict_streams([(symbol, timestamps, series)], look_back)[0]
+
+    # ✅ توقع متدفق لعدة رموز معًا: items قائمة (symbol, timestamps, series)، والنتيجة بنفس الترتيب
+    def predict_streams(self, items, look_back):
+        """
+        الحالة (h, c) لكل رمز تتقدم خطوة لكل صف مكتمل جديد، والصف الأخير يُقيَّم من الحالة بدون حفظها.
+        كل LSTM_RESYNC_STEPS خطوة (أو عند فجوة) تُعاد الحالة من الصفر على آخر نافذة، فتطابق النتيجة
+        حينها التمريرة الكاملة على آخر look_back صف وينحصر الانحراف بينهما.
+        الرموز تُجمَّع في مصفوفات (رموز، وحدات): كل إعادات المزامنة في run واحد، وتقدّم الحالات خطوة مشتركة
+        لكل الرموز التي ما زال لها صفوف جديدة، وتقييم الشموع الجارية في step واحد.
+        القفل يحمي قاموس الحالات فقط، فالحساب نفسه لا يُسلسِل الاستدعاءات المتزامنة.
+        """
+        items = [(symbol, np.asarray(timestamps), np.asarray(series, dtype=np.float32).reshape(len(series), -1))
+                 for symbol, timestamps, series in items]
+        if not items:
+            return []
+        with self.lock:
+            streams = [self.streams.get(symbol) for symbol, _, _ in items]
+
+        advancing, resyncing = [], []
+        for index, ((_, timestamps, series), stream) in enumerate(zip(items, streams)):
+            if stream is not None:
+                # موقع آخر صف أُضيف للحالة داخل السلسلة الحالية، والصفوف المكتملة بعده هي الجديدة
+                position = int(np.searchsorted(timestamps[:-1], stream["timestamp"]))
+                found = position < len(timestamps) - 1 and timestamps[position] == stream["timestamp"]
+                new_rows = series[position + 1:-1]
+                if found and stream["steps"] + len(new_rows) < LSTM_RESYNC_STEPS:
+                    advancing.append((index, new_rows))
+                    continue
+            resyncing.append(index)
+
+        states = [None] * len(items)
+        steps = [0] * len(items)
+        if resyncing:
+            # إعادة مزامنة: آخر look_back - 1 صف مكتمل من الصفر، لكل الرموز في تمريرة واحدة
+            windows = np.stack([items[index][2][-look_back:-1] for index in resyncing])
+            _, resynced = self.run(windows)
+            for row, index in enumerate(resyncing):
+                states[index] = [(h[row:row + 1], c[row:row + 1]) for h, c in resynced]
+
+        if advancing:
+            # ترتيب تنازلي حسب عدد الصفوف الجديدة، فالرموز التي ما زال لها صفوف هي دائمًا بادئة المصفوفة
+            advancing.sort(key=lambda item: len(item[1]), reverse=True)
+            stacked = [tuple(np.concatenate(parts) for parts in zip(*layer_states))
+                       for layer_states in zip(*(streams[index]["states"] for index, _ in advancing))]
+            counts = [len(rows) for _, rows in advancing]
+            for t in range(counts[0]):
+                active = sum(count > t for count in counts)
+                x = np.stack([rows[t] for _, rows in advancing[:active]])
+                _, new_states = self.step(x, [(h[:active], c[:active]) for h, c in stacked])
+                for (h, c), (new_h, new_c) in zip(stacked, new_states):
+                    h[:active], c[:active] = new_h, new_c
+            for row, (index, rows) in enumerate(advancing):
+                states[index] = [(h[row:row + 1], c[row:row + 1]) for h, c in stacked]
+                steps[index] = streams[index]["steps"] + len(rows)
+
+        with self.lock:
+            for (symbol, timestamps, _), symbol_states, symbol_steps in zip(items, states, steps):
+                current = self.streams.get(symbol)
+                # استدعاء متزامن أحدث قد يكون حفظ حالة لشمعة لاحقة، فلا يُستبدل بحالة أقدم
+                if current is None or current["timestamp"] <= timestamps[-2]:
+                    self.streams[symbol] = {"states": symbol_states, "timestamp": timestamps[-2], "steps": symbol_steps}
+
+        batch_states = [tuple(np.concatenate(parts) for parts in zip(*layer_states)) for layer_states in zip(*states)]
+        h, _ = self.step(np.stack([series[-1] for _, _, series in items]), batch_states)
+        return [float(value) for value in self.output(h)[:, 0]]
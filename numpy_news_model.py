@@ -0,0 +1,211 @@
+# numpy_news_model.py
+
+import os
+import json
+import logging
+import numpy as np
+from numpy_lstm import read_keras_h5, LSTMLayer, DenseLayer
+from config import NEWS_BATCH_SIZE
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# نموذج مشاعر الأخبار (Embedding -> LSTM -> Dense) مع مفردات Tokenizer في ملف npz واحد للاستدلال بـ NumPy.
+# طبقة Embedding تُدمج مع kernel أول LSTM وقت التصدير: جدول (المفردات، 4 * الوحدات) = embeddings @ kernel + bias،
+# فكل خطوة زمنية فهرسة صفوف + h @ recurrent_kernel فقط. الجدول هو أكبر مصفوفة، ويُخزَّن بالدقة المختارة
+# (float32 / float16 / int8 بمقياس لكل عمود) ويبقى بها في الذاكرة، ولا تُحوَّل لـ float32 إلا الصفوف المفهرسة.
+PRECISIONS = ("float32", "float16", "int8")
+
+
+def _quantize(table, precision):
+    if precision == "float32":
+        return {"input_table": table.astype(np.float32)}
+    if precision == "float16":
+        return {"input_table": table.astype(np.float16)}
+    if precision == "int8":
+        scale = np.abs(table).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        return {"input_table": np.round(table / scale).astype(np.int8), "input_table_scale": scale.astype(np.float32)}
+    raise ValueError(f"دقة غير مدعومة: {precision} (المتاح: {', '.join(PRECISIONS)})")
+
+
+# ✅ تصدير news_model.h5 و tokenizer.pkl إلى ملف npz (يحتاج Keras لقراءة التوكنيزر فقط)
+def export_news_model(model_path, tokenizer_path, output_path, maxlen, precision="float32"):
+    import joblib
+
+    tokenizer = joblib.load(tokenizer_path)
+    if tokenizer.char_level or tokenizer.analyzer is not None:
+        raise ValueError("التوكنيزر على مستوى الحروف أو بمحلل مخصص غير مدعوم")
+
+    layers = [layer for layer in read_keras_h5(model_path) if layer[0] not in ("InputLayer", "Dropout")]
+    if len(layers) < 3 or layers[0][0] != "Embedding" or layers[1][0] != "LSTM":
+        raise ValueError("البنية المدعومة: Embedding ثم LSTM ثم Dense")
+
+    _, embedding_config, embedding_weights = layers[0]
+    config = {
+        "maxlen": int(maxlen),
+        "precision": precision,
+        "mask_zero": bool(embedding_config.get("mask_zero", False)),
+        "tokenizer": {
+            "filters": tokenizer.filters,
+            "lower": bool(tokenizer.lower),
+            "split": tokenizer.split,
+            "oov_index": tokenizer.word_index.get(tokenizer.oov_token) if tokenizer.oov_token is not None else None
+        },
+        "lstm": [],
+        "dense": []
+    }
+    arrays = {}
+
+    for class_name, layer_config, weights in layers[1:]:
+        if class_name == "LSTM":
+            if config["dense"]:
+                raise ValueError("طبقة LSTM بعد Dense غير مدعومة")
+            index = len(config["lstm"])
+            config["lstm"].append({key: layer_config.get(key) for key in
+                                   ("units", "activation", "recurrent_activation", "return_sequences", "go_backwards")})
+            if index == 0:
+                table = embedding_weights["embeddings"] @ weights["kernel"] + weights.get("bias", 0.0)
+                arrays.update(_quantize(table, precision))
+            else:
+                arrays[f"lstm{index}_kernel"] = weights["kernel"]
+                arrays[f"lstm{index}_bias"] = weights.get("bias", np.zeros(weights["kernel"].shape[1], dtype=np.float32))
+            arrays[f"lstm{index}_recurrent_kernel"] = weights["recurrent_kernel"]
+        elif class_name == "Dense":
+            index = len(config["dense"])
+            config["dense"].append({"activation": layer_config.get("activation", "linear")})
+            arrays[f"dense{index}_kernel"] = weights["kernel"]
+            arrays[f"dense{index}_bias"] = weights.get("bias", np.zeros(weights["kernel"].shape[1], dtype=np.float32))
+        else:
+            raise ValueError(f"طبقة غير مدعومة في نموذج الأخبار: {class_name}")
+
+    # نفس texts_to_sequences: الكلمات بفهرس >= num_words تُعامل كغير معروفة
+    vocabulary = [(word, index) for word, index in tokenizer.word_index.items()
+                  if not tokenizer.num_words or index < tokenizer.num_words]
+    arrays["words"] = np.array([word for word, _ in vocabulary], dtype=str)
+    arrays["word_ids"] = np.array([index for _, index in vocabulary], dtype=np.int32)
+    arrays["config"] = np.array(json.dumps(config))
+
+    tmp_path = output_path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, output_path)
+    logging.info(f"📦 [News Model] تم تصدير النموذج إلى {output_path} ({precision}).")
+
+
+class NumpyNewsModel:
+    """
+    توكنيز وتقييم دفعات كبيرة من الأخبار بنفس قواعد Keras: Tokenizer ثم pad_sequences بالحشو والقص من البداية (pre).
+    predict_texts(texts) يعيد احتمالات التصنيفات (N, classes).
+    """
+
+    def __init__(self, arrays):
+        config = json.loads(str(arrays["config"]))
+        self.maxlen = config["maxlen"]
+        self.mask_zero = config["mask_zero"]
+        tokenizer = config["tokenizer"]
+        self.lower = tokenizer["lower"]
+        self.split = tokenizer["split"]
+        self.oov_index = tokenizer["oov_index"]
+        self.translate_map = str.maketrans({char: tokenizer["split"] for char in tokenizer["filters"]})
+        self.word_index = dict(zip(arrays["words"].tolist(), arrays["word_ids"].tolist()))
+
+        self.input_table = arrays["input_table"]
+        self.input_scale = arrays["input_table_scale"] if "input_table_scale" in arrays else None
+        self.recurrent = []
+        for index, layer_config in enumerate(config["lstm"]):
+            weights = {"recurrent_kernel": arrays[f"lstm{index}_recurrent_kernel"]}
+            # أول طبقة تأخذ مدخلاتها مسقطة من الجدول، فلا kernel لها
+            weights["kernel"] = arrays[f"lstm{index}_kernel"] if index else None
+            if index:
+                weights["bias"] = arrays[f"lstm{index}_bias"]
+            self.recurrent.append(LSTMLayer(layer_config, weights))
+        self.head = [DenseLayer(layer_config, {"kernel": arrays[f"dense{index}_kernel"], "bias": arrays[f"dense{index}_bias"]})
+                     for index, layer_config in enumerate(config["dense"])]
+
+        if any(not layer.return_sequences for layer in self.recurrent[:-1]) or self.recurrent[-1].return_sequences:
+            raise ValueError("ترتيب return_sequences غير مدعوم")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    def _words(self, text):
+        if self.lower:
+            text = text.lower()
+        return [word for word in text.translate(self.translate_map).split(self.split) if word]
+
+    # ✅ نفس texts_to_sequences ثم pad_sequences(maxlen) في Keras: مصفوفة (N, maxlen) من فهارس الكلمات
+    def texts_to_padded(self, texts):
+        padded = np.zeros((len(texts), self.maxlen), dtype=np.int32)
+        for row, text in enumerate(texts):
+            sequence = []
+            for word in self._words(text):
+                index = self.word_index.get(word, self.oov_index)
+                if index is not None:
+                    sequence.append(index)
+            sequence = sequence[-self.maxlen:]
+            if sequence:
+                padded[row, self.maxlen - len(sequence):] = sequence
+        return padded
+
+    def _project(self, ids):
+        rows = self.input_table[ids].astype(np.float32)
+        return rows * self.input_scale if self.input_scale is not None else rows
+
+    def predict(self, padded):
+        padded = np.asarray(padded, dtype=np.intp)
+        outputs = [self._predict_batch(padded[start:start + NEWS_BATCH_SIZE]) for start in range(0, len(padded), NEWS_BATCH_SIZE)]
+        return np.concatenate(outputs) if outputs else np.zeros((0, self.head[-1].kernel.shape[1]), dtype=np.float32)
+
+    def _step(self, ids, states):
+        h, state = self.recurrent[0].step_projected(self._project(ids), states[0])
+        new_states = [state]
+        for layer, state in zip(self.recurrent[1:], states[1:]):
+            h, state = layer.step(h, state)
+            new_states.append(state)
+        if self.mask_zero:
+            # مثل Keras مع mask_zero: خطوات الحشو لا تغيّر الحالة
+            keep = (ids == 0)[:, None]
+            new_states = [(np.where(keep, old[0], new[0]), np.where(keep, old[1], new[1]))
+                          for old, new in zip(states, new_states)]
+        return new_states
+
+    def _predict_batch(self, padded):
+        """
+        كل الصفوف تبدأ من حالة صفرية وتمر بنفس رمز الحشو، فمسار الحشو يُحسب مرة واحدة لصف واحد،
+        وكل صف يُقيَّم فقط من أول كلمة فيه (العناوين القصيرة لا تدفع ثمن maxlen خطوة).
+        الصفوف مرتبة حسب موقع أول كلمة فتكون الصفوف النشطة دائمًا بادئة المصفوفة.
+        """
+        steps = padded.shape[1]
+        starts = np.where(padded.any(axis=1), (padded != 0).argmax(axis=1), steps)
+        order = np.argsort(starts, kind="stable")
+        padded, starts = padded[order], starts[order]
+
+        states = [tuple(np.array(part) for part in layer.initial_state(len(padded))) for layer in self.recurrent]
+        pad_states = [layer.initial_state(1) for layer in self.recurrent]
+        active = 0
+        for t in range(steps):
+            entering = int(np.searchsorted(starts, t, side="right"))
+            for (h, c), (pad_h, pad_c) in zip(states, pad_states):
+                h[active:entering], c[active:entering] = pad_h, pad_c
+            active = entering
+
+            if active:
+                new_states = self._step(padded[:active, t], [(h[:active], c[:active]) for h, c in states])
+                for (h, c), (new_h, new_c) in zip(states, new_states):
+                    h[:active], c[:active] = new_h, new_c
+            if active < len(padded):
+                pad_states = self._step(np.zeros(1, dtype=np.intp), pad_states)
+
+        # الصفوف الفارغة (بدون أي كلمة معروفة) نتيجتها مسار الحشو كاملًا
+        h = states[-1][0]
+        h[active:] = pad_states[-1][0]
+        for layer in self.head:
+            h = layer(h)
+
+        output = np.empty_like(h)
+        output[order] = h
+        return output
+
+    def predict_texts(self, texts):
+        return self.predict(self.texts_to_padded(texts))
@@ -1,40 +1,34 @@
 # predict_lstm_signal.py (نسخة محسّنة)
 
-import os
 import numpy as np
 import pandas as pd
 import logging
 import joblib
-from tensorflow.keras.models import load_model
-from binance.client import Client
-from datetime import datetime
+from numpy_lstm import NumpyLSTM
+from kline_cache import get_klines
+from model_registry import register_model, get_model
 
 # إعداد السجلات
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# إعداد Binance API
-API_KEY = os.getenv("BINANCE_API_KEY")
-API_SECRET = os.getenv("BINANCE_API_SECRET")
-client = Client(API_KEY, API_SECRET)
-
 # مسارات النموذج والمحولات
 MODEL_PATH = "models/lstm_model.h5"
 SCALER_PATH = "models/lstm_scaler.pkl"
 LOOK_BACK = 50
 INTERVALS = ["5m", "15m", "1h", "4h"]
 
-# ✅ جلب البيانات الحية من Binance ودمجها عبر الفريمات الزمنية
+# ✅ تحميل النموذج والمحول مرة واحدة وإبقاؤهما في الذاكرة
+# الأوزان تُقرأ من ملف h5 إلى NumpyLSTM: لا حاجة لتحميل TensorFlow في عملية التداول
+def _load_lstm_artifacts(model_path, scaler_path):
+    return NumpyLSTM.load(model_path), joblib.load(scaler_path)
+
+register_model("lstm", [MODEL_PATH, SCALER_PATH], _load_lstm_artifacts)
+
+# ✅ جلب البيانات الحية من مخزن الشموع المشترك ودمجها عبر الفريمات الزمنية
 def fetch_recent_data(symbol="BTCUSDT"):
     try:
         def fetch(symbol, interval):
-            klines = client.get_klines(symbol=symbol, interval=interval, limit=100)
-            df = pd.DataFrame(klines, columns=[
-                "timestamp", "open", "high", "low", "close", "volume",
-                "close_time", "qav", "trades", "tbbav", "tbqav", "ignore"
-            ])
-            df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-            df.set_index("timestamp", inplace=True)
-            df = df[["close"]].astype(float)
+            df = get_klines(symbol, interval, limit=100)[["close"]]
             df.columns = [f"close_{interval}"]
             return df
 
@@ -54,39 +48,34 @@ def fetch_recent_data(symbol="BTCUSDT"):
         logging.error(f"❌ [Data Fetch Error] فشل في جلب البيانات من Binance: {e}")
         return pd.DataFrame()
 
+# ✅ النتيجة الافتراضية عند غياب النموذج أو البيانات
+def _fallback_result():
+    return {
+        "signal": 0,
+        "confidence": 0.5,
+        "prediction": 0.5,
+        "timestamp": None,
+        "volatility": 0.0
+    }
+
 # ✅ توقع إشارة LSTM من البيانات الحالية
-def predict_lstm_signal():
+def predict_lstm_signal(symbol="BTCUSDT"):
     try:
-        if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
+        artifacts = get_model("lstm")
+        if artifacts is None:
             logging.warning("⚠️ لم يتم العثور على ملفات النموذج أو المحول.")
-            return {
-                "signal": 0,
-                "confidence": 0.5,
-                "prediction": 0.5,
-                "timestamp": None,
-                "volatility": 0.0
-            }
+            return _fallback_result()
 
-        model = load_model(MODEL_PATH)
-        scaler = joblib.load(SCALER_PATH)
-        df = fetch_recent_data()
+        model, scaler = artifacts
+        df = fetch_recent_data(symbol)
 
         if df.empty or len(df) < LOOK_BACK:
             logging.warning("⚠️ بيانات غير كافية لإشارة LSTM.")
-            return {
-                "signal": 0,
-                "confidence": 0.5,
-                "prediction": 0.5,
-                "timestamp": None,
-                "volatility": 0.0
-            }
+            return _fallback_result()
 
-        data = df[["avg_close"]].values
-        data_scaled = scaler.transform(data)
-        last_seq = data_scaled[-LOOK_BACK:]
-        X = np.reshape(last_seq, (1, LOOK_BACK, 1))
-
-        prediction = model.predict(X)[0][0]
+        # الحالة تتقدم خطوة لكل شمعة مكتملة جديدة بدل إعادة حساب النافذة كاملة
+        data_scaled = scaler.transform(df[["avg_close"]].values)
+        prediction = model.predict_stream(symbol, df.index.values, data_scaled, LOOK_BACK)
         signal = 1 if prediction > 0.5 else 0
         confidence = float(prediction)
         volatility = float(np.std(df["avg_close"].pct_change().dropna()))
@@ -103,10 +92,51 @@ def predict_lstm_signal():
 
     except Exception as e:
         logging.error(f"❌ [LSTM Prediction Error] {e}")
-        return {
-            "signal": 0,
-            "confidence": 0.5,
-            "prediction": 0.5,
-            "timestamp": None,
-            "volatility": 0.0
-        }
\ No newline at end of file
+        return _fallback_result()
+
+# ✅ إشارة LSTM كـ BUY/SELL (أو None عند عدم توفر توقع حقيقي)
+def get_lstm_signal(symbol="BTCUSDT"):
+    return lstm_result_to_signal(predict_lstm_signal(symbol))
+
+# ✅ توقع LSTM لعدة رموز: كل الرموز الجاهزة في استدعاء متدفق واحد مجمّع (حالة محفوظة لكل رمز)
+def predict_lstm_signals_batch(symbols):
+    results = {symbol: _fallback_result() for symbol in symbols}
+    try:
+        artifacts = get_model("lstm")
+        if artifacts is None:
+            logging.warning("⚠️ لم يتم العثور على ملفات النموذج أو المحول.")
+            return results
+        model, scaler = artifacts
+
+        ready = {}
+        for symbol in symbols:
+            df = fetch_recent_data(symbol)
+            if df.empty or len(df) < LOOK_BACK:
+                logging.warning(f"⚠️ بيانات غير كافية لإشارة LSTM: {symbol}")
+                continue
+            ready[symbol] = df
+
+        predictions = model.predict_streams(
+            [(symbol, df.index.values, scaler.transform(df[["avg_close"]].values)) for symbol, df in ready.items()], LOOK_BACK
+        )
+        for (symbol, df), prediction in zip(ready.items(), predictions):
+            results[symbol] = {
+                "signal": 1 if prediction > 0.5 else 0,
+                "confidence": float(prediction),
+                "prediction": prediction,
+                "timestamp": df.index[-1],
+                "volatility": float(np.std(df["avg_close"].pct_change().dropna()))
+            }
+
+        logging.info(f"📈 إشارات LSTM لعدد {len(ready)} رمز.")
+        return results
+
+    except Exception as e:
+        logging.error(f"❌ [LSTM Batch Prediction Error] {e}")
+        return results
+
+# ✅ تحويل نتيجة LSTM إلى BUY/SELL (أو None عند عدم توفر توقع حقيقي)
+def lstm_result_to_signal(result):
+    if result["timestamp"] is None:
+        return None
+    return "BUY" if result["signal"] == 1 else "SELL"
@@ -0,0 +1,67 @@
+# price_replay_server.py
+
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import websockets
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# ✅ تحميل تسجيل الرسائل (سطر JSON لكل رسالة: {"t": وقت الاستلام, "msg": الرسالة الخام})
+def load_recording(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _requested_streams(path):
+    if "streams=" not in path:
+        return None
+    return set(path.split("streams=", 1)[1].split("&")[0].split("/"))
+
+
+def make_handler(records, speed):
+    async def handler(websocket, path=None):
+        path = path or websocket.request.path
+        streams = _requested_streams(path)
+        logging.info(f"🎞️ [Replay] عميل جديد: {path}")
+
+        previous = None
+        for record in records:
+            stream = json.loads(record["msg"]).get("stream")
+            if streams is not None and stream is not None and stream not in streams:
+                continue
+            # إعادة الفواصل الزمنية الأصلية بين الرسائل (مقسومة على معامل السرعة)
+            if previous is not None and speed > 0:
+                await asyncio.sleep(max(record["t"] - previous, 0) / speed)
+            previous = record["t"]
+            await websocket.send(record["msg"])
+
+        logging.info("✅ [Replay] انتهى تشغيل التسجيل.")
+        await websocket.close()
+
+    return handler
+
+
+async def serve(records, host, port, speed):
+    async with websockets.serve(make_handler(records, speed), host, port):
+        logging.info(f"🎞️ [Replay] خادم إعادة التشغيل يعمل على ws://{host}:{port} ({len(records)} رسالة)")
+        await asyncio.Future()
+
+
+# ✅ بديل محلي لبث Binance: شغّل هذا الخادم ثم اضبط BINANCE_STREAM_URL=ws://localhost:8765
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="إعادة تشغيل أسعار مسجّلة كبث WebSocket محلي")
+    parser.add_argument("recording", help="ملف التسجيل الناتج عن PriceStream(record_path=...)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speed", type=float, default=1.0, help="معامل السرعة (0 = بدون انتظار)")
+    args = parser.parse_args(argv)
+
+    asyncio.run(serve(load_recording(args.recording), args.host, args.port, args.speed))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# price_stream.py
+
+import json
+import time
+import logging
+import threading
+import websocket
+from config import STREAM_BASE_URL, STREAM_PRICE_SOURCE, STREAM_RECONNECT_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class PriceStream:
+    """
+    اشتراك لحظي في أسعار Binance Futures (bookTicker أو markPrice) وإغلاق الشموع.
+    on_price(price) يُستدعى مع كل تحديث سعر، و on_candle_close(candle) عند إغلاق كل شمعة.
+    record_path (اختياري) يحفظ الرسائل الخام لإعادة تشغيلها لاحقًا عبر price_replay_server.py
+    """
+
+    def __init__(self, symbol, interval="5m", on_price=None, on_candle_close=None,
+                 base_url=STREAM_BASE_URL, price_source=STREAM_PRICE_SOURCE, record_path=None):
+        self.symbol = symbol
+        self.interval = interval
+        self.on_price = on_price
+        self.on_candle_close = on_candle_close
+        self.price_source = price_source
+        self.record_path = record_path
+        self.last_price = None
+        self.connected = threading.Event()
+
+        streams = [f"{symbol.lower()}@{price_source}", f"{symbol.lower()}@kline_{interval}"]
+        self.url = f"{base_url}/stream?streams={'/'.join(streams)}"
+
+        self._ws = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._record_file = None
+
+    # ✅ استخراج السعر من رسالة bookTicker (منتصف أفضل عرض وطلب) أو markPrice
+    def _extract_price(self, data):
+        if data.get("e") == "markPriceUpdate":
+            return float(data["p"])
+        if "b" in data and "a" in data:
+            return (float(data["b"]) + float(data["a"])) / 2
+        return None
+
+    def _handle_message(self, ws, message):
+        if self._record_file is not None:
+            self._record_file.write(json.dumps({"t": time.time(), "msg": message}) + "\n")
+
+        try:
+            payload = json.loads(message)
+            data = payload.get("data", payload)
+
+            if data.get("e") == "kline":
+                candle = data["k"]
+                if candle.get("x") and self.on_candle_close:
+                    self.on_candle_close(candle)
+                return
+
+            price = self._extract_price(data)
+            if price is not None:
+                self.last_price = price
+                if self.on_price:
+                    self.on_price(price)
+
+        except Exception as e:
+            logging.error(f"❌ [Price Stream] فشل معالجة رسالة {self.symbol}: {e}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=lambda ws: self.connected.set(),
+                on_message=self._handle_message,
+                on_error=lambda ws, error: logging.warning(f"⚠️ [Price Stream] خطأ في الاتصال: {error}"),
+                on_close=lambda ws, code, msg: self.connected.clear()
+            )
+            self._ws.run_forever(ping_interval=30, ping_timeout=10)
+
+            if not self._stopped.is_set():
+                logging.warning(f"🔌 [Price Stream] انقطع البث لـ {self.symbol}، إعادة الاتصال...")
+                time.sleep(STREAM_RECONNECT_SECONDS)
+
+    def start(self):
+        if self.record_path:
+            self._record_file = open(self.record_path, "a", encoding="utf-8", buffering=1)
+        self._thread = threading.Thread(target=self._run, name=f"stream-{self.symbol}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._ws is not None:
+            self._ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._record_file is not None:
+            self._record_file.close()
+            self._record_file = None
@@ -2,103 +2,203 @@ import numpy as np
 import pandas as pd
 import logging
 import os
+import time
+import glob
 import joblib
+from model_registry import register_model, get_model, invalidate_model, replace_with_retry
+from decision_journal import read_decisions
+from config import RL_SENTIMENT_BUCKETS
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-Q_TABLE_PATH = "q_table.pkl"
+# كل حفظ يكتب نسخة جديدة q_tables/q_table-<ns>.npy ثم يستبدل ملف المؤشر ذريًا:
+# النسخة الحالية تبقى مفتوحة كـ memmap عند البوت، وويندوز يرفض استبدال ملف مربوط بالذاكرة
+Q_TABLE_DIR = "q_tables"
+Q_TABLE_POINTER = "q_table.current"
+Q_TABLE_KEEP_VERSIONS = 3
+Q_TABLE_PATH = "q_table.npy"  # الصيغة السابقة (ملف واحد) وتُنقل للنسخ عند أول تحميل
+LEGACY_Q_TABLE_PATH = "q_table.pkl"
 ACTIONS = ["BUY", "SELL", "HOLD"]
+TECHNICAL_STATES = ["BUY", "SELL", "HOLD"]
+
+class StateEncoder:
+    """
+    ترقيم الحالات كأعداد صحيحة: (الإشارة الفنية، شريحة المشاعر) -> صف في Q-Table.
+    شريحة المشاعر = int(sentiment * sentiment_buckets) بين -sentiment_buckets و +sentiment_buckets،
+    والصف الأخير حالة افتراضية للبيانات الناقصة.
+    """
+
+    def __init__(self, sentiment_buckets=RL_SENTIMENT_BUCKETS):
+        self.sentiment_buckets = sentiment_buckets
+        self.buckets_per_signal = 2 * sentiment_buckets + 1
+        self.default_state = len(TECHNICAL_STATES) * self.buckets_per_signal
+        self.n_states = self.default_state + 1
+
+    def encode_many(self, technical_signals, sentiment_scores):
+        technical = np.asarray(technical_signals, dtype=object)
+        technical_index = np.full(len(technical), -1)
+        for i, signal in enumerate(TECHNICAL_STATES):
+            technical_index[technical == signal] = i
+
+        sentiment = pd.to_numeric(pd.Series(sentiment_scores), errors="coerce").to_numpy(dtype=float)
+        bucket = np.trunc(np.clip(np.nan_to_num(sentiment), -1, 1) * self.sentiment_buckets).astype(np.int64)
+        states = technical_index * self.buckets_per_signal + bucket + self.sentiment_buckets
+
+        invalid = (technical_index < 0) | np.isnan(sentiment)
+        return np.where(invalid, self.default_state, states)
+
+    def encode(self, technical_signal, sentiment_score):
+        return int(self.encode_many([technical_signal], [sentiment_score])[0])
+
+    def empty_table(self):
+        # NaN = حالة لم تُزر بعد (يُتنبأ لها بـ HOLD)
+        return np.full((self.n_states, len(ACTIONS)), np.nan)
+
+# ✅ تحويل Q-Table القديم (dict بمفاتيح "BUY_3") إلى مصفوفة
+def _convert_legacy_q_table(encoder):
+    legacy = joblib.load(LEGACY_Q_TABLE_PATH)
+    q_table = encoder.empty_table()
+    for key, values in legacy.items():
+        technical_signal, _, bucket = key.rpartition("_")
+        if technical_signal not in TECHNICAL_STATES or not bucket.lstrip("-").isdigit():
+            continue
+        bucket = int(bucket)
+        if abs(bucket) > encoder.sentiment_buckets:
+            continue
+        state = TECHNICAL_STATES.index(technical_signal) * encoder.buckets_per_signal + bucket + encoder.sentiment_buckets
+        q_table[state] = [values.get(action, 0) for action in ACTIONS]
+    return q_table
+
+def _remove_old_versions(current):
+    versions = sorted(glob.glob(os.path.join(Q_TABLE_DIR, "q_table-*.npy")))
+    for path in versions[:-Q_TABLE_KEEP_VERSIONS]:
+        if os.path.abspath(path) == os.path.abspath(current):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # نسخة ما زالت مربوطة بالذاكرة في عملية أخرى: تُحذف في حفظ لاحق
+
+def _save_array(q_table):
+    # نسخة جديدة كاملة أولًا ثم تبديل المؤشر ذريًا، فلا يُستبدل ملف مفتوح ولا يُقرأ ملف نصف مكتوب
+    os.makedirs(Q_TABLE_DIR, exist_ok=True)
+    path = os.path.join(Q_TABLE_DIR, f"q_table-{time.time_ns()}.npy")
+    with open(path, "wb") as f:
+        np.save(f, q_table)
+
+    tmp_pointer = Q_TABLE_POINTER + ".tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(path)
+    replace_with_retry(tmp_pointer, Q_TABLE_POINTER)
+    invalidate_model("rl_q_table")
+    _remove_old_versions(path)
+
+def _load_q_table_version(pointer_path):
+    with open(pointer_path, "r", encoding="utf-8") as f:
+        path = f.read().strip()
+    return np.load(path, mmap_mode="r")
+
+# ✅ النسخة الحالية تُفتح كـ memmap للقراءة فقط وتبقى في سجل النماذج (لا إعادة تحميل في كل استدعاء)،
+# والسجل يراقب ملف المؤشر فيحمّل النسخة الجديدة بعد كل حفظ
+register_model("rl_q_table", [Q_TABLE_POINTER], _load_q_table_version)
 
 class ReinforcementLearningTrader:
-    def __init__(self, learning_rate=0.1, discount_factor=0.95, exploration_rate=0.2):
+    def __init__(self, learning_rate=0.1, discount_factor=0.95, exploration_rate=0.2, encoder=None):
+        self.encoder = encoder or StateEncoder()
         self.q_table = self.load_q_table()
         self.alpha = learning_rate
         self.gamma = discount_factor
         self.epsilon = exploration_rate
 
     def load_q_table(self):
-        if os.path.exists(Q_TABLE_PATH):
+        expected_shape = (self.encoder.n_states, len(ACTIONS))
+        q_table = get_model("rl_q_table")
+        legacy = Q_TABLE_PATH if os.path.exists(Q_TABLE_PATH) else LEGACY_Q_TABLE_PATH
+        if q_table is None and os.path.exists(legacy):
             try:
-                return joblib.load(Q_TABLE_PATH)
+                _save_array(np.load(legacy) if legacy == Q_TABLE_PATH else _convert_legacy_q_table(self.encoder))
+                logging.info("✅ تم تحويل Q-Table القديم إلى الصيغة الجديدة.")
+                q_table = get_model("rl_q_table")
             except Exception as e:
-                logging.warning(f"⚠️ فشل تحميل Q-Table: {e}")
-        return {}
+                logging.warning(f"⚠️ فشل تحويل Q-Table القديم: {e}")
+
+        if q_table is not None and q_table.shape == expected_shape:
+            return q_table
+        if q_table is not None:
+            logging.warning(f"⚠️ أبعاد Q-Table المحفوظ {q_table.shape} لا تطابق الترميز الحالي {expected_shape}، البدء بجدول جديد.")
+        return self.encoder.empty_table()
 
     def save_q_table(self):
         try:
-            joblib.dump(self.q_table, Q_TABLE_PATH)
+            _save_array(np.asarray(self.q_table))
             logging.info("✅ تم حفظ Q-Table بنجاح.")
         except Exception as e:
             logging.error(f"❌ فشل حفظ Q-Table: {e}")
 
     def get_state(self, row):
         """
-        توليد حالة Q-State من بيانات السوق
+        توليد رقم الحالة من بيانات السوق
         """
-        try:
-            if "technical_signal" in row and "sentiment_score" in row:
-                return f"{row['technical_signal']}_{int(row['sentiment_score'] * 10)}"
-            return "default_state"
-        except Exception as e:
-            logging.warning(f"⚠️ فشل توليد الحالة: {e}")
-            return "default_state"
-
-    def choose_action(self, state):
-        if state not in self.q_table:
-            self.q_table[state] = {a: 0 for a in ACTIONS}
-        if np.random.rand() < self.epsilon:
-            return np.random.choice(ACTIONS)
-        return max(self.q_table[state], key=self.q_table[state].get)
-
-    def update_q_value(self, state, action, reward, next_state):
-        if state not in self.q_table:
-            self.q_table[state] = {a: 0 for a in ACTIONS}
-        if next_state not in self.q_table:
-            self.q_table[next_state] = {a: 0 for a in ACTIONS}
-        max_future_q = max(self.q_table[next_state].values())
-        old_value = self.q_table[state][action]
-        new_value = (1 - self.alpha) * old_value + self.alpha * (reward + self.gamma * max_future_q)
-        self.q_table[state][action] = new_value
+        if "technical_signal" in row and "sentiment_score" in row:
+            return self.encoder.encode(row["technical_signal"], row["sentiment_score"])
+        return self.encoder.default_state
 
     def train(self, df):
+        if len(df) < 2:
+            return
+
+        # الترميز والمكافآت والاستكشاف العشوائي تُحسب للجدول كاملًا مرة واحدة؛
+        # تحديثات Q-Learning نفسها تتابعية بطبيعتها فتبقى حلقة على أعداد صحيحة
+        q_table = np.array(self.q_table, dtype=float)
+        states = self.encoder.encode_many(df["technical_signal"], df["sentiment_score"])
+        rewards = pd.to_numeric(df["pnl"], errors="coerce").fillna(0).to_numpy() if "pnl" in df else np.zeros(len(df))
+        explore = np.random.rand(len(df) - 1) < self.epsilon
+        random_actions = np.random.randint(len(ACTIONS), size=len(df) - 1)
+
         for i in range(len(df) - 1):
-            row = df.iloc[i]
-            next_row = df.iloc[i + 1]
-            state = self.get_state(row)
-            next_state = self.get_state(next_row)
-            action = self.choose_action(state)
+            state, next_state = states[i], states[i + 1]
+            if np.isnan(q_table[state, 0]):
+                q_table[state] = 0.0
+            if np.isnan(q_table[next_state, 0]):
+                q_table[next_state] = 0.0
 
-            reward = row.get("pnl", 0)
-            self.update_q_value(state, action, reward, next_state)
+            action = random_actions[i] if explore[i] else np.argmax(q_table[state])
+            q_table[state, action] = (1 - self.alpha) * q_table[state, action] + \
+                self.alpha * (rewards[i] + self.gamma * q_table[next_state].max())
 
+        self.q_table = q_table
         self.save_q_table()
 
-    def predict_rl_decision(self, row):
-        state = self.get_state(row if row is not None else {})
-        if state in self.q_table:
-            return max(self.q_table[state], key=self.q_table[state].get)
-        return "HOLD"
-
-# ✅ تدريب النموذج من CSV
-def train_rl_model(file_path="bot_decisions.csv"):
-    if not os.path.exists(file_path):
-        logging.warning("⚠️ ملف التدريب غير موجود.")
-        return
+    # ✅ قرارات لمصفوفات كاملة (الحالات غير المزارة -> HOLD)
+    def predict_rl_decisions(self, technical_signals, sentiment_scores):
+        values = np.asarray(self.q_table)[self.encoder.encode_many(technical_signals, sentiment_scores)]
+        unvisited = np.isnan(values).all(axis=1)
+        best = np.argmax(np.nan_to_num(values, nan=-np.inf), axis=1)
+        return np.where(unvisited, "HOLD", np.array(ACTIONS, dtype=object)[best])
 
-    df = pd.read_csv(file_path)
-    if "technical_signal" not in df or "sentiment_score" not in df:
-        logging.warning("⚠️ تنسيق البيانات غير كافٍ للتدريب.")
+    def predict_rl_decision(self, row):
+        row = row if row is not None else {}
+        values = np.asarray(self.q_table)[self.get_state(row)]
+        if np.isnan(values).all():
+            return "HOLD"
+        return ACTIONS[int(np.argmax(values))]
+
+# ✅ تدريب النموذج من سجل القرارات (عمودا الإشارة الفنية والمشاعر فقط)
+def train_rl_model():
+    df = read_decisions(columns=["technical_signal", "sentiment_score"])
+    if df.empty:
+        logging.warning("⚠️ لا توجد قرارات كافية للتدريب.")
         return
 
     rl = ReinforcementLearningTrader()
     rl.train(df)
 
 # ✅ دالة جاهزة لـ bot.py
-def get_rl_decision(symbol="BTCUSDT"):
+def get_rl_decision(technical_signal="HOLD", sentiment_score=0.0):
     try:
         rl_trader = ReinforcementLearningTrader()
-        dummy_df = {"technical_signal": "BUY", "sentiment_score": 0.2}
-        return rl_trader.predict_rl_decision(dummy_df)
+        row = {"technical_signal": technical_signal, "sentiment_score": sentiment_score or 0.0}
+        return rl_trader.predict_rl_decision(row)
     except Exception as e:
         logging.error(f"❌ [RL] خطأ في get_rl_decision: {e}")
         return "HOLD"
@@ -106,12 +206,3 @@ def get_rl_decision(symbol="BTCUSDT"):
 # ✅ تدريب يدوي
 if __name__ == "__main__":
     train_rl_model()
-    
-def get_rl_decision(symbol="BTCUSDT"):
-    try:
-        rl_trader = ReinforcementLearningTrader()
-        dummy_df = {"technical_signal": "BUY", "sentiment_score": 0.2}
-        return rl_trader.predict_rl_decision(dummy_df)
-    except Exception as e:
-        logging.error(f"❌ [RL] خطأ في get_rl_decision: {e}")
-        return "HOLD"
@@ -1,6 +1,10 @@
 import numpy as np
 import pandas as pd
-from utils import get_price_data, get_current_price
+from utils import get_current_price
+from kline_cache import get_klines
+
+# الكمية الأساسية قبل تعديلها بالثقة والمشاعر والسيولة
+BASE_QTY = 0.01
 
 # سجل الأداء للتعلم الذاتي
 trade_history = {
@@ -25,7 +29,7 @@ def update_trade_history(pnl):
 # ✅ حساب التذبذب الحالي للسوق
 def measure_volatility(symbol, window=20):
     try:
-        df = get_price_data(symbol, interval="1h", limit=window + 1)
+        df = get_klines(symbol, "1h", limit=window + 1)
         df["returns"] = df["close"].pct_change()
         return round(df["returns"].std(), 4)
     except:
@@ -40,39 +44,44 @@ def detect_manipulation(symbol):
 def improve_stop_loss(base_sl, direction, sentiment_score=0.0, volatility=0.01):
     adjustment = (sentiment_score * 0.5) + (volatility * 1.5)
     if direction == "BUY":
-        return round(base_sl - adjustment, 2)
+        return np.round(base_sl - adjustment, 2)
     else:
-        return round(base_sl + adjustment, 2)
+        return np.round(base_sl + adjustment, 2)
 
 # ✅ حساب حجم الصفقة الذكي
 def calculate_position_size(base_qty, confidence_score=0.5, sentiment_score=0.0, liquidity_score=1.0):
     multiplier = 1.0 + (confidence_score * 0.5) + (sentiment_score * 0.2) + ((liquidity_score - 1) * 0.3)
-    return round(base_qty * multiplier, 4)
+    return np.round(base_qty * multiplier, 4)
+
+# ✅ مستويات وقف الخسارة وجني الأرباح (تعمل على قيم مفردة أو مصفوفات NumPy للباك تست)
+def compute_exit_levels(price, is_buy, volatility, confidence_score=0.5, sentiment_score=0.0):
+    stop_loss_distance = np.round(volatility * 2, 4)
+    take_profit_distance = np.round(stop_loss_distance * (1.5 + confidence_score), 4)
+
+    stop_loss = np.where(
+        is_buy,
+        improve_stop_loss(price - stop_loss_distance, "BUY", sentiment_score, volatility),
+        improve_stop_loss(price + stop_loss_distance, "SELL", sentiment_score, volatility)
+    )
+    take_profit = np.where(is_buy, np.round(price + take_profit_distance, 2), np.round(price - take_profit_distance, 2))
+    return stop_loss, take_profit
 
 # ✅ الدالة الأساسية لإدارة المخاطر
 def apply_risk_management(symbol, decision, confidence_score=0.5, sentiment_score=0.0, liquidity_score=1.0):
     try:
-        base_qty = 0.01
         price = get_current_price(symbol)
         volatility = measure_volatility(symbol)
-        position_size = calculate_position_size(base_qty, confidence_score, sentiment_score, liquidity_score)
+        position_size = calculate_position_size(BASE_QTY, confidence_score, sentiment_score, liquidity_score)
 
-        stop_loss_distance = round(volatility * 2, 4)
-        take_profit_distance = round(stop_loss_distance * (1.5 + confidence_score), 4)
-
-        if decision == "BUY":
-            stop_loss = improve_stop_loss(price - stop_loss_distance, "BUY", sentiment_score, volatility)
-            take_profit = round(price + take_profit_distance, 2)
-        elif decision == "SELL":
-            stop_loss = improve_stop_loss(price + stop_loss_distance, "SELL", sentiment_score, volatility)
-            take_profit = round(price - take_profit_distance, 2)
-        else:
+        if decision not in ("BUY", "SELL"):
             return None
 
+        stop_loss, take_profit = compute_exit_levels(price, decision == "BUY", volatility, confidence_score, sentiment_score)
+
         return {
-            "quantity": position_size,
-            "stop_loss": round(stop_loss, 2),
-            "take_profit": round(take_profit, 2)
+            "quantity": float(position_size),
+            "stop_loss": round(float(stop_loss), 2),
+            "take_profit": round(float(take_profit), 2)
         }
 
     except Exception as e:
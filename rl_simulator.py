@@ -0,0 +1,180 @@
+# rl_simulator.py
+
+import time
+import logging
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from candle_archive import load_history
+from technical_analysis import compute_indicators, technical_vote_series
+from reinforcement_learning import ReinforcementLearningTrader, StateEncoder, ACTIONS
+from config import (RL_SIM_ENVS, RL_SIM_EPISODES, RL_SIM_EPISODE_LENGTH, RL_SIM_HORIZON,
+                    RL_SIM_EVAL_FRACTION, RL_SWEEP_WORKERS)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BUY, SELL, HOLD = (ACTIONS.index(action) for action in ["BUY", "SELL", "HOLD"])
+
+
+# ✅ الحالات والمكافآت لكل شمعة تاريخية
+# لا توجد مشاعر تاريخية، فتُستخدم sentiment إن مُرّرت وإلا تُعتبر محايدة (0)
+def build_dataset(symbol, interval="5m", days=90, horizon=RL_SIM_HORIZON, sentiment=None, encoder=None):
+    encoder = encoder or StateEncoder()
+    df = load_history(symbol, interval, days)
+    technical = technical_vote_series(compute_indicators(df))
+    sentiment = np.zeros(len(df)) if sentiment is None else np.asarray(sentiment, dtype=float)
+
+    states = encoder.encode_many(technical, sentiment)
+    rewards = action_rewards(df["close"].to_numpy(), horizon)
+    # آخر horizon شمعة لا تملك عائدًا مستقبليًا
+    return states[:-horizon], rewards[:-horizon]
+
+
+def action_rewards(close, horizon):
+    """
+    مكافأة كل فعل (بنسبة مئوية): BUY = عائد horizon شمعة قادمة، SELL = عكسه، HOLD = 0
+    """
+    forward = np.full(len(close), np.nan)
+    forward[:-horizon] = (close[horizon:] / close[:-horizon] - 1) * 100
+    rewards = np.zeros((len(close), len(ACTIONS)))
+    rewards[:, BUY] = forward
+    rewards[:, SELL] = -forward
+    return rewards
+
+
+class VectorizedTradingEnv:
+    """
+    n_envs حلقة تداول مستقلة على نفس السلسلة التاريخية، كل منها تبدأ من موضع عشوائي
+    وتتقدم شمعة في كل خطوة. reset/step تعمل على مصفوفات لكل البيئات معًا.
+    """
+
+    def __init__(self, states, rewards, n_envs=RL_SIM_ENVS, episode_length=RL_SIM_EPISODE_LENGTH, rng=None):
+        if len(states) <= episode_length + 1:
+            raise ValueError("السلسلة التاريخية أقصر من طول الحلقة.")
+        self.states = states
+        self.rewards = rewards
+        self.n_envs = n_envs
+        self.episode_length = episode_length
+        self.rng = rng or np.random.default_rng()
+        self.positions = None
+        self.steps = 0
+
+    def reset(self):
+        self.positions = self.rng.integers(0, len(self.states) - self.episode_length - 1, self.n_envs)
+        self.steps = 0
+        return self.states[self.positions]
+
+    def step(self, actions):
+        rewards = self.rewards[self.positions, actions]
+        self.positions = self.positions + 1
+        self.steps += 1
+        return self.states[self.positions], rewards, self.steps >= self.episode_length
+
+
+def train_q_table(states, rewards, n_states, alpha=0.1, gamma=0.95, epsilon=0.2,
+                  episodes=RL_SIM_EPISODES, n_envs=RL_SIM_ENVS, episode_length=RL_SIM_EPISODE_LENGTH, seed=None):
+    rng = np.random.default_rng(seed)
+    env = VectorizedTradingEnv(states, rewards, n_envs, episode_length, rng)
+    q_table = np.zeros((n_states, len(ACTIONS)))
+    visited = np.zeros(n_states, dtype=bool)
+    size = q_table.size
+
+    for _ in range(episodes):
+        state = env.reset()
+        done = False
+        while not done:
+            greedy = q_table[state].argmax(axis=1)
+            explore = rng.random(n_envs) < epsilon
+            action = np.where(explore, rng.integers(len(ACTIONS), size=n_envs), greedy)
+
+            next_state, reward, done = env.step(action)
+            td_error = reward + gamma * q_table[next_state].max(axis=1) - q_table[state, action]
+
+            # بيئات كثيرة تزور نفس (الحالة، الفعل) في نفس الخطوة: نطبّق متوسط أخطائها مرة واحدة
+            flat = state * len(ACTIONS) + action
+            counts = np.bincount(flat, minlength=size)
+            td_sum = np.bincount(flat, weights=td_error, minlength=size)
+            q_table.flat += alpha * np.divide(td_sum, counts, out=np.zeros(size), where=counts > 0)
+
+            visited[state] = True
+            state = next_state
+
+    # نفس اصطلاح ReinforcementLearningTrader: الحالات غير المزارة NaN (-> HOLD)
+    q_table[~visited] = np.nan
+    return q_table
+
+
+# ✅ متوسط مكافأة السياسة الجشعة على بيانات لم يُتدرّب عليها
+def evaluate_policy(q_table, states, rewards):
+    values = q_table[states]
+    actions = np.where(np.isnan(values).all(axis=1), HOLD, np.argmax(np.nan_to_num(values, nan=-np.inf), axis=1))
+    return float(rewards[np.arange(len(states)), actions].mean())
+
+
+def _run_trial(args):
+    train_states, train_rewards, eval_states, eval_rewards, n_states, params, seed = args
+    q_table = train_q_table(train_states, train_rewards, n_states, seed=seed, **params)
+    return {"params": params, "score": evaluate_policy(q_table, eval_states, eval_rewards), "q_table": q_table}
+
+
+# ✅ بحث شبكي عن alpha/gamma/epsilon موزع على أنوية المعالج
+def sweep(states, rewards, grid, n_states, workers=RL_SWEEP_WORKERS, eval_fraction=RL_SIM_EVAL_FRACTION, seed=0, **train_kwargs):
+    split = int(len(states) * (1 - eval_fraction))
+    keys = list(grid.keys())
+    trials = [
+        (states[:split], rewards[:split], states[split:], rewards[split:], n_states,
+         dict(zip(keys, values), **train_kwargs), seed)
+        for values in itertools.product(*(grid[key] for key in keys))
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run_trial, trials))
+    return sorted(results, key=lambda result: result["score"], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="تدريب التعلم المعزز على الشموع التاريخية")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", default="5m")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--episodes", type=int, default=RL_SIM_EPISODES)
+    parser.add_argument("--envs", type=int, default=RL_SIM_ENVS)
+    parser.add_argument("--alphas", type=float, nargs="+", default=[0.05, 0.1, 0.2])
+    parser.add_argument("--gammas", type=float, nargs="+", default=[0.9, 0.95, 0.99])
+    parser.add_argument("--epsilons", type=float, nargs="+", default=[0.1, 0.2, 0.3])
+    parser.add_argument("--workers", type=int, default=RL_SWEEP_WORKERS)
+    parser.add_argument("--save", action="store_true", help="دمج الحالات المزارة من أفضل Q-Table في جدول البوت")
+    args = parser.parse_args(argv)
+
+    started_at = time.monotonic()
+    encoder = StateEncoder()
+    states, rewards = build_dataset(args.symbol, args.interval, args.days, encoder=encoder)
+    grid = {"alpha": args.alphas, "gamma": args.gammas, "epsilon": args.epsilons}
+    results = sweep(states, rewards, grid, encoder.n_states, workers=args.workers,
+                    episodes=args.episodes, n_envs=args.envs)
+
+    for result in results[:5]:
+        logging.info(f"🎯 [RL Sim] {result['params']} -> متوسط المكافأة: {result['score']:.4f}%")
+    logging.info(f"⏱️ [RL Sim] {len(results)} تجربة خلال {time.monotonic() - started_at:.1f} ثانية.")
+
+    if args.save:
+        best = results[0]
+        trader = ReinforcementLearningTrader(
+            learning_rate=best["params"]["alpha"],
+            discount_factor=best["params"]["gamma"],
+            exploration_rate=best["params"]["epsilon"],
+            encoder=encoder
+        )
+        # بدون مشاعر تاريخية كل الحالات المزارة في شريحة المشاعر المحايدة: استبدال جدول البوت كاملًا
+        # يجعل باقي الشرائح NaN (-> HOLD دائمًا)، فتُدمج الصفوف المزارة فقط ويبقى الباقي كما في الجدول الحالي
+        visited = ~np.isnan(best["q_table"]).all(axis=1)
+        merged = np.array(trader.q_table, dtype=float)
+        merged[visited] = best["q_table"][visited]
+        trader.q_table = merged
+        trader.save_q_table()
+        logging.info(f"💾 [RL Sim] تم دمج {int(visited.sum())} حالة مزارة من أصل {encoder.n_states} في جدول البوت.")
+
+
+if __name__ == "__main__":
+    main()
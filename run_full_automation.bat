@@ -5,6 +5,9 @@ call venv\Scripts\activate.bat
 :: ✅ تشغيل البوت مرة واحدة
 python -c "from bot import run_bot_once; run_bot_once()"
 
+:: ✅ جلب الأخبار الجديدة وتحديث news_store.jsonl خارج دورة البوت (يقرأ البوت المؤشر المحفوظ فقط)
+python news_store.py
+
 :: ✅ تحسين الأوزان بعد كل تشغيل
 python weights_optimizer.py
 
@@ -1,65 +1,123 @@
 import logging
-from textblob import TextBlob
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from gpt_utils import analyze_news_with_gpt
-from train_news_model import predict_news_sentiment_lstm
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from lexicon_sentiment import score_texts
+from gpt_utils import analyze_news_with_gpt, analyze_news_batch_with_gpt
+from train_news_model import predict_news_sentiment_lstm, predict_news_sentiment_lstm_batch
+from config import SENTIMENT_PROCESS_WORKERS, SENTIMENT_MEMO_SIZE
 import requests
 import os
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-vader_analyzer = SentimentIntensityAnalyzer()
-
-def analyze_sentiment_textblob(text: str) -> float:
-    try:
-        blob = TextBlob(text)
-        return blob.sentiment.polarity
-    except Exception as e:
-        logging.error(f"❌ [TextBlob] فشل تحليل المشاعر: {e}")
-        return 0
-
-def analyze_sentiment_vader(text: str) -> float:
-    try:
-        return vader_analyzer.polarity_scores(text)['compound']
-    except Exception as e:
-        logging.error(f"❌ [VADER] فشل تحليل المشاعر: {e}")
-        return 0
-
 def analyze_sentiment_lstm(text: str) -> float:
     try:
         return predict_news_sentiment_lstm(text)
     except Exception as e:
         logging.error(f"❌ [LSTM] فشل تحليل المشاعر: {e}")
-        return 0
+        return None
 
 def analyze_sentiment_gpt_only(text: str) -> float:
     try:
         return analyze_news_with_gpt(text)
     except Exception as e:
         logging.error(f"❌ [GPT] فشل تحليل المشاعر عبر GPT: {e}")
-        return 0
+        return None
 
-def aggregate_sentiment_analysis(text: str) -> float:
+# ✅ مجمع عمليات لتحليل TextBlob/VADER (عمل CPU لا يستفيد من الخيوط بسبب GIL)
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=SENTIMENT_PROCESS_WORKERS)
+        return _process_pool
+
+def _discard_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+# يُرسل العمل للمجمع فورًا ويعيد دالة تجمع النتائج لاحقًا (بعد انتهاء LSTM و GPT في هذا الخيط)
+def _submit_lexicon_scores(texts):
+    futures = []
     try:
-        scores = [
-            analyze_sentiment_textblob(text),
-            analyze_sentiment_vader(text),
-            analyze_sentiment_lstm(text),
-            analyze_sentiment_gpt_only(text)
-        ]
-        average = sum(scores) / len(scores)
-        logging.info(f"🧠 [Sentiment] متوسط المشاعر: {average:.2f}")
-        return round(average, 3)
+        pool = _get_process_pool()
+        chunk = -(-len(texts) // SENTIMENT_PROCESS_WORKERS)
+        futures = [pool.submit(score_texts, texts[i:i + chunk]) for i in range(0, len(texts), chunk)]
     except Exception as e:
-        logging.error(f"❌ [Sentiment] فشل دمج تحليلات المشاعر: {e}")
-        return 0
+        logging.warning(f"⚠️ [Sentiment] مجمع العمليات غير متاح: {e}")
+        _discard_process_pool()
+
+    def collect():
+        try:
+            if futures:
+                return [pair for future in futures for pair in future.result()]
+        except Exception as e:
+            logging.warning(f"⚠️ [Sentiment] فشل التحليل في مجمع العمليات، التحليل داخل العملية: {e}")
+            _discard_process_pool()
+        return score_texts(texts)
+
+    return collect
+
+# ✅ ذاكرة النتائج حسب بصمة المحتوى: نفس الخبر لا يُعاد تحليله في كل دورة
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def _content_key(text):
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+# ✅ تحليل مجموعة أخبار دفعة واحدة: LSTM كدفعة واحدة، TextBlob/VADER في مجمع العمليات، و GPT بطلبات مجمّعة
+# الخبر الذي فشل أحد محلليه نتيجته None ولا يُحفظ في الذاكرة، فيُعاد تحليله في الاستدعاء القادم
+def aggregate_sentiment_batch(texts: list) -> list:
+    keys = [_content_key(text) for text in texts]
+    with _memo_lock:
+        pending = {key: text for key, text in zip(keys, texts) if key not in _memo}
+
+    if pending:
+        try:
+            new_texts = list(pending.values())
+            lexicon = _submit_lexicon_scores(new_texts)
+            lstm_scores = predict_news_sentiment_lstm_batch(new_texts)
+            gpt_scores = analyze_news_batch_with_gpt(new_texts)
+            lexicon_scores = lexicon()
+
+            failed = 0
+            with _memo_lock:
+                for key, (textblob_score, vader_score), lstm_score, gpt_score in zip(pending, lexicon_scores, lstm_scores, gpt_scores):
+                    scores = (textblob_score, vader_score, lstm_score, gpt_score)
+                    if any(score is None for score in scores):
+                        failed += 1
+                        continue
+                    _memo[key] = round(sum(scores) / 4, 3)
+                while len(_memo) > SENTIMENT_MEMO_SIZE:
+                    _memo.popitem(last=False)
+
+            logging.info(f"🧠 [Sentiment] تم تحليل {len(pending) - failed} خبر جديد من أصل {len(texts)}.")
+            if failed:
+                logging.warning(f"⚠️ [Sentiment] فشل تحليل {failed} خبر، سيُعاد تحليلها لاحقًا.")
+
+        except Exception as e:
+            logging.error(f"❌ [Sentiment] فشل دمج تحليلات المشاعر: {e}")
+
+    with _memo_lock:
+        return [_memo.get(key) for key in keys]
+
+def aggregate_sentiment_analysis(text: str) -> float:
+    return aggregate_sentiment_batch([text])[0]
 
 # ✅ للاستخدام في bot.py
 def analyze_sentiment_gpt(text="Bitcoin is rising fast today!") -> float:
     return aggregate_sentiment_analysis(text)
 
 # ✅ جلب الأخبار من NewsAPI
-def fetch_bitcoin_news(api_key: str, query="bitcoin", page_size=5) -> list:
+def fetch_news_articles(api_key: str, query="bitcoin", page_size=5, since=None) -> list:
     url = "https://newsapi.org/v2/everything"
     params = {
         "q": query,
@@ -68,15 +126,34 @@ def fetch_bitcoin_news(api_key: str, query="bitcoin", page_size=5) -> list:
         "sortBy": "publishedAt",
         "apiKey": api_key,
     }
+    # جلب تزايدي: فقط ما نُشر منذ آخر خبر معروف (publishedAt بصيغة ISO 8601)
+    if since:
+        params["from"] = since
 
     try:
-        response = requests.get(url, params=params)
+        response = requests.get(url, params=params, timeout=10)
         data = response.json()
         if data["status"] == "ok":
-            return [article["title"] + ". " + article.get("description", "") for article in data["articles"]]
+            return data["articles"]
         else:
             print("❌ [NewsAPI] فشل في جلب الأخبار:", data)
             return []
     except Exception as e:
         print(f"❌ [NewsAPI ERROR] {e}")
         return []
+
+def article_text(article: dict) -> str:
+    return (article.get("title") or "") + ". " + (article.get("description") or "")
+
+def fetch_bitcoin_news(api_key: str, query="bitcoin", page_size=5) -> list:
+    return [article_text(article) for article in fetch_news_articles(api_key, query, page_size)]
+
+# ✅ مؤشر المشاعر لرمز معيّن (متوسط الأخبار الأخيرة)
+def analyze_sentiment(symbol="BTCUSDT") -> float:
+    headlines = fetch_bitcoin_news(os.getenv("NEWS_API_KEY"))
+    if not headlines:
+        return 0.0
+    scores = [score for score in aggregate_sentiment_batch(headlines) if score is not None]
+    if not scores:
+        return 0.0
+    return round(sum(scores) / len(scores), 3)
@@ -0,0 +1,82 @@
+# signal_pool.py
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import SIGNAL_WORKERS, DEFAULT_SIGNAL_TIMEOUT, SIGNAL_STUCK_WORKERS_LIMIT
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_executor = None
+_executor_lock = threading.Lock()
+# مهام تجاوزت مهلتها وما زالت تشغل عاملًا في المجمع الحالي (cancel لا يوقف مهمة بدأت)
+_stuck = set()
+
+
+# ✅ مجمع عمال مشترك لكل مولدات الإشارات (معظم وقتها انتظار شبكة)
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SIGNAL_WORKERS, thread_name_prefix="signal")
+        return _executor
+
+
+def _register_stuck(name, future):
+    """
+    مهمة عالقة تحجز عاملها حتى تنتهي، فتراكمها يجعل كل الإشارات اللاحقة تتجاوز مهلتها.
+    عند بلوغ SIGNAL_STUCK_WORKERS_LIMIT يُستبدل المجمع بمجمع جديد بكامل سعته، ويُترك القديم ينهي ما لديه.
+    """
+    global _executor
+    with _executor_lock:
+        _stuck.add(future)
+        stuck = len(_stuck)
+        old_executor = None
+        if stuck >= SIGNAL_STUCK_WORKERS_LIMIT:
+            old_executor, _executor = _executor, None
+            _stuck.clear()
+    future.add_done_callback(_discard_stuck)
+
+    logging.warning(f"⚠️ [Signals] الإشارة {name} ما زالت تعمل بعد مهلتها وتحجز عاملًا ({stuck}/{SIGNAL_WORKERS} عالق).")
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+        logging.warning(f"♻️ [Signals] {stuck} عامل عالق: تم استبدال مجمع الإشارات بمجمع جديد.")
+
+
+def _discard_stuck(future):
+    with _executor_lock:
+        _stuck.discard(future)
+
+
+def run_with_deadlines(tasks, timeouts=None, budget=None):
+    """
+    تشغيل المهام بالتوازي مع مهلة لكل مهمة وميزانية زمنية كلية.
+    tasks: {name: callable}
+    يعيد (results, missing) حيث missing أسماء المهام التي فشلت أو تجاوزت مهلتها.
+    """
+    timeouts = timeouts or {}
+    start = time.monotonic()
+    deadline = start + budget if budget is not None else None
+
+    executor = get_executor()
+    futures = {name: executor.submit(fn) for name, fn in tasks.items()}
+
+    results, missing = {}, []
+    for name, future in futures.items():
+        # كل مهمة لها موعد نهائي مطلق محسوب من لحظة الإطلاق، فالانتظار المتسلسل لا يراكم التأخير
+        task_deadline = start + timeouts.get(name, DEFAULT_SIGNAL_TIMEOUT)
+        if deadline is not None:
+            task_deadline = min(task_deadline, deadline)
+        try:
+            results[name] = future.result(timeout=max(task_deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            if not future.cancel():
+                _register_stuck(name, future)
+            missing.append(name)
+            logging.warning(f"⏱️ [Signals] تجاوزت الإشارة {name} مهلتها وسيتم تجاهلها.")
+        except Exception as e:
+            missing.append(name)
+            logging.error(f"❌ [Signals] فشل حساب الإشارة {name}: {e}")
+
+    return results, missing
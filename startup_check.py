@@ -0,0 +1,81 @@
+# startup_check.py
+
+import os
+import sys
+import json
+import logging
+import argparse
+import subprocess
+from collections import defaultdict
+from config import STARTUP_IMPORT_BUDGET_SECONDS, STARTUP_FORBIDDEN_MODULES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# فحص تراجع زمن البدء: استيراد الوحدة (bot افتراضيًا) في مفسر جديد كما في run_once.bat،
+# وقياس الزمن والمكتبات المحمّلة. يفشل (رمز خروج 1) إن تجاوز الزمن الميزانية أو حُمّلت مكتبة ثقيلة ممنوعة.
+PROBE = """
+import sys, json, time, importlib
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - started, "packages": sorted({name.split(".")[0] for name in sys.modules})}))
+"""
+
+
+def _parse_importtime(stderr):
+    # مجموع الزمن الذاتي (ميكروثانية) لكل حزمة من مخرجات -X importtime
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us)
+    return totals
+
+
+def measure(module, runs=3):
+    root = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE, module],
+                                cwd=root, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"فشل استيراد {module}:\n{result.stderr[-2000:]}")
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None or sample["seconds"] < best["seconds"]:
+            best = {**sample, "packages_time": _parse_importtime(result.stderr)}
+    return best
+
+
+def check_startup(module="bot", budget=STARTUP_IMPORT_BUDGET_SECONDS, runs=3, top=10):
+    sample = measure(module, runs)
+    forbidden = sorted(set(sample["packages"]) & set(STARTUP_FORBIDDEN_MODULES))
+
+    slowest = sorted(sample["packages_time"].items(), key=lambda item: item[1], reverse=True)[:top]
+    logging.info(f"⏱️ [Startup] استيراد {module}: {sample['seconds']:.3f} ثانية (الميزانية {budget:.2f})")
+    logging.info("📦 [Startup] أبطأ الحزم: " + ", ".join(f"{name}={us / 1000:.0f}ms" for name, us in slowest))
+
+    ok = True
+    if sample["seconds"] > budget:
+        logging.error(f"❌ [Startup] تجاوز زمن الاستيراد الميزانية: {sample['seconds']:.3f} > {budget:.2f}")
+        ok = False
+    if forbidden:
+        logging.error(f"❌ [Startup] مكتبات ثقيلة حُمّلت عند الاستيراد: {', '.join(forbidden)}")
+        ok = False
+    if ok:
+        logging.info("✅ [Startup] زمن البدء ضمن الميزانية.")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="فحص زمن بدء البوت والمكتبات المحمّلة عند الاستيراد")
+    parser.add_argument("--modules", nargs="+", default=["bot"])
+    parser.add_argument("--budget", type=float, default=STARTUP_IMPORT_BUDGET_SECONDS)
+    parser.add_argument("--runs", type=int, default=3, help="أفضل زمن من عدة تشغيلات لتقليل التذبذب")
+    args = parser.parse_args(argv)
+
+    results = [check_startup(module, args.budget, args.runs) for module in args.modules]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
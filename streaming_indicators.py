@@ -0,0 +1,284 @@
+# streaming_indicators.py
+
+import copy
+import time
+import logging
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+from kline_cache import get_klines
+from config import INDICATOR_SEED_CANDLES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+NAN = float("nan")
+
+# مؤشرات تُحدَّث بزمن ثابت لكل شمعة مغلقة، وتطابق مخرجات مكتبة ta على نفس السلسلة:
+# نفس معادلات ewm(adjust=False) في pandas ونفس طريقة ta في تهيئة ADX.
+
+
+class EWM:
+    """
+    نفس خوارزمية pandas ewm(adjust=False).mean() بما فيها تجاهل القيم الفارغة في البداية
+    """
+
+    def __init__(self, com, min_periods):
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt_factor = 1.0 - self.alpha
+        self.min_periods = min_periods
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    @classmethod
+    def from_span(cls, span, min_periods):
+        return cls((span - 1) / 2.0, min_periods)
+
+    @classmethod
+    def from_alpha(cls, alpha, min_periods):
+        return cls((1.0 - alpha) / alpha, min_periods)
+
+    def update(self, x):
+        is_observation = x == x
+        self.nobs += is_observation
+        if self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                if self.weighted != x:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * x) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = x
+        return self.value
+
+    @property
+    def value(self):
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+
+class RSI:
+    def __init__(self, window=14):
+        self.prev_close = None
+        self.up = EWM.from_alpha(1.0 / window, window)
+        self.down = EWM.from_alpha(1.0 / window, window)
+        self.value = NAN
+
+    def update(self, close):
+        diff = NAN if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        emaup = self.up.update(diff if diff > 0 else 0.0)
+        emadn = self.down.update(-diff if diff < 0 else 0.0)
+        if emadn == 0:
+            self.value = 100.0
+        elif emadn != emadn:
+            self.value = NAN
+        else:
+            self.value = 100 - (100 / (1 + emaup / emadn))
+        return self.value
+
+
+class MACD:
+    def __init__(self, window_fast=12, window_slow=26, window_sign=9):
+        self.fast = EWM.from_span(window_fast, window_fast)
+        self.slow = EWM.from_span(window_slow, window_slow)
+        self.signal_ema = EWM.from_span(window_sign, window_sign)
+        self.macd = NAN
+        self.signal = NAN
+
+    def update(self, close):
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_ema.update(self.macd)
+        return self.macd, self.signal
+
+
+class ADX:
+    """
+    نفس تسلسل ta.trend.ADXIndicator: مجاميع أولية لأول window صف ثم تنعيم Wilder،
+    و ADX يساوي 0 حتى تكتمل 2 * window - 1 شمعة.
+    """
+
+    def __init__(self, window=14):
+        self.window = window
+        self.row = -1
+        self.prev = None
+        self.trs = self.dip = self.din = 0.0
+        self.initial = []
+        self.dx_seed = []
+        self.value = 0.0
+
+    def update(self, high, low, close):
+        prev = self.prev
+        self.prev = (high, low, close)
+        self.row += 1
+        if prev is None:
+            return self.value
+
+        prev_high, prev_low, prev_close = prev
+        tr = max(high, prev_close) - min(low, prev_close)
+        diff_up = high - prev_high
+        diff_down = prev_low - low
+        pos = abs(diff_up) if (diff_up > diff_down and diff_up > 0) else 0.0
+        neg = abs(diff_down) if (diff_down > diff_up and diff_down > 0) else 0.0
+
+        w = self.window
+        if self.row <= w:
+            # الصفوف 1..window تُجمع كقيمة أولية (الصف 0 لا يملك إغلاقًا سابقًا)
+            self.initial.append((tr, pos, neg))
+            if self.row < w:
+                return self.value
+            values = np.array(self.initial)
+            self.trs, self.dip, self.din = np.sum(values[:, 0]), np.sum(values[:, 1]), np.sum(values[:, 2])
+            self.initial = []
+        else:
+            self.trs = self.trs - (self.trs / float(w)) + tr
+            self.dip = self.dip - (self.dip / float(w)) + pos
+            self.din = self.din - (self.din / float(w)) + neg
+
+        dip = 100 * (self.dip / self.trs) if self.trs != 0 else 0
+        din = 100 * (self.din / self.trs) if self.trs != 0 else 0
+        dx = 100 * abs((dip - din) / (dip + din)) if (dip + din) != 0 else NAN
+
+        if len(self.dx_seed) < w:
+            self.dx_seed.append(dx)
+            if len(self.dx_seed) == w:
+                self.value = float(np.mean(self.dx_seed))
+        else:
+            self.value = ((self.value * (w - 1)) + dx) / float(w)
+        return self.value
+
+
+class _MonotonicWindow:
+    # أدنى/أعلى قيمة في نافذة متحركة بزمن ثابت (مستهلك) لكل إضافة
+    def __init__(self, window, use_max):
+        self.window = window
+        self.use_max = use_max
+        self.index = 0
+        self.items = deque()
+
+    def update(self, x):
+        better = (lambda a, b: a >= b) if self.use_max else (lambda a, b: a <= b)
+        while self.items and better(x, self.items[-1][1]):
+            self.items.pop()
+        self.items.append((self.index, x))
+        if self.items[0][0] <= self.index - self.window:
+            self.items.popleft()
+        self.index += 1
+        return self.items[0][1] if self.index >= self.window else NAN
+
+
+class Stochastic:
+    def __init__(self, window=14, smooth_window=3):
+        self.lowest = _MonotonicWindow(window, use_max=False)
+        self.highest = _MonotonicWindow(window, use_max=True)
+        self.recent_k = deque(maxlen=smooth_window)
+        self.k = NAN
+        self.d = NAN
+
+    def update(self, high, low, close):
+        smin = self.lowest.update(low)
+        smax = self.highest.update(high)
+        if smin != smin or smax != smax or smax == smin:
+            self.k = NAN
+        else:
+            self.k = 100 * (close - smin) / (smax - smin)
+        self.recent_k.append(self.k)
+        full = len(self.recent_k) == self.recent_k.maxlen
+        self.d = sum(self.recent_k) / len(self.recent_k) if full and all(k == k for k in self.recent_k) else NAN
+        return self.k, self.d
+
+
+class TechnicalState:
+    """
+    حالة المؤشرات الفنية لرمز وفريم واحد، تُحدَّث شمعة بشمعة.
+    update() للشموع المغلقة، و peek() لتقييم شمعة لم تُغلق بعد دون تعديل الحالة.
+    """
+
+    def __init__(self):
+        self.ema10 = EWM.from_span(10, 10)
+        self.ema50 = EWM.from_span(50, 50)
+        self.rsi = RSI(14)
+        self.macd = MACD(12, 26, 9)
+        self.adx = ADX(14)
+        self.stoch = Stochastic(14, 3)
+        self.last_timestamp = None
+        self.values = None
+
+    def update(self, high, low, close, timestamp=None):
+        macd, macd_signal = self.macd.update(close)
+        stoch_k, stoch_d = self.stoch.update(high, low, close)
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        self.values = {
+            "ema10": self.ema10.update(close),
+            "ema50": self.ema50.update(close),
+            "rsi": self.rsi.update(close),
+            "macd": macd,
+            "macd_signal": macd_signal,
+            "adx": self.adx.update(high, low, close),
+            "stoch_k": stoch_k,
+            "stoch_d": stoch_d
+        }
+        return self.values
+
+    def peek(self, high, low, close):
+        return copy.deepcopy(self).update(high, low, close)
+
+    def seed(self, df):
+        for timestamp, high, low, close in zip(df.index, df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy()):
+            self.update(float(high), float(low), float(close), timestamp)
+        return self
+
+
+# ✅ سجل الحالات: (symbol, interval) -> TechnicalState
+_states = {}
+_states_lock = threading.Lock()
+_state_locks = {}
+
+
+def _lock_for(key):
+    with _states_lock:
+        if key not in _state_locks:
+            _state_locks[key] = threading.Lock()
+        return _state_locks[key]
+
+
+def _closed_candles(df):
+    return df[df["close_time"] < time.time() * 1000]
+
+
+# ✅ قيم المؤشرات الحالية: الشموع المغلقة الجديدة تُضاف للحالة، والشمعة المفتوحة تُقيَّم بـ peek
+def get_live_indicators(symbol, interval="5m"):
+    key = (symbol, interval)
+    with _lock_for(key):
+        state = _states.get(key)
+        latest = get_klines(symbol, interval, limit=100)
+        if latest.empty:
+            return None
+
+        closed = _closed_candles(latest)
+        new = closed if state is None else closed[closed.index > state.last_timestamp]
+        if state is None or (len(closed) > 0 and len(new) == len(closed)):
+            # أول استخدام أو فجوة أطول من النافذة المتاحة: التهيئة من التاريخ
+            state = TechnicalState().seed(_closed_candles(get_klines(symbol, interval, limit=INDICATOR_SEED_CANDLES)))
+            _states[key] = state
+        else:
+            state.seed(new)
+
+        forming = latest.iloc[-1]
+        if forming["close_time"] < time.time() * 1000:
+            return state.values
+        return state.peek(float(forming["high"]), float(forming["low"]), float(forming["close"]))
+
+
+# ✅ تحديث الحالة مباشرة من شمعة مغلقة قادمة من البث اللحظي (بدون طلبات REST)
+def update_from_stream_candle(symbol, interval, candle):
+    key = (symbol, interval)
+    with _lock_for(key):
+        state = _states.get(key)
+        if state is None:
+            return
+        timestamp = pd.Timestamp(int(candle["t"]), unit="ms")
+        if state.last_timestamp is not None and timestamp <= state.last_timestamp:
+            return
+        state.update(float(candle["h"]), float(candle["l"]), float(candle["c"]), timestamp)
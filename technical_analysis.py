@@ -1,8 +1,11 @@
 # technical_analysis.py
 
+import numpy as np
 import pandas as pd
 import ta
 import logging
+from kline_cache import get_klines
+from streaming_indicators import get_live_indicators
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -15,37 +18,76 @@ def perform_technical_analysis(df: pd.DataFrame) -> dict:
             logging.warning("❌ [TA] بيانات غير صالحة للتحليل الفني.")
             return {"trading_signal": "HOLD"}
 
-        df = df.copy()
+        df = compute_indicators(df)
+        return {"trading_signal": technical_vote(df.iloc[-1])}
 
-        # تحويل الأعمدة إلى أرقام
-        for col in ['close', 'high', 'low', 'volume']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    except Exception as e:
+        logging.error(f"❌ [TA ERROR] فشل التحليل الفني: {e}")
+        return {"trading_signal": "HOLD"}
+
+def compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    حساب المؤشرات الفنية على السلسلة كاملة (نسخة جديدة من df مع أعمدة المؤشرات)
+    """
+    df = df.copy()
+
+    # تحويل الأعمدة إلى أرقام
+    for col in ['close', 'high', 'low', 'volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
 
-        # ✅ مؤشرات فنية
-        df["ema10"] = ta.trend.ema_indicator(df["close"], window=10)
-        df["ema50"] = ta.trend.ema_indicator(df["close"], window=50)
-        df["rsi"] = ta.momentum.rsi(df["close"], window=14)
-        df["macd"] = ta.trend.macd(df["close"])
-        df["macd_signal"] = ta.trend.macd_signal(df["close"])
-        df["adx"] = ta.trend.adx(df["high"], df["low"], df["close"])
-        df["stoch_k"] = ta.momentum.stoch(df["high"], df["low"], df["close"])
-        df["stoch_d"] = ta.momentum.stoch_signal(df["high"], df["low"], df["close"])
+    # ✅ مؤشرات فنية
+    df["ema10"] = ta.trend.ema_indicator(df["close"], window=10)
+    df["ema50"] = ta.trend.ema_indicator(df["close"], window=50)
+    df["rsi"] = ta.momentum.rsi(df["close"], window=14)
+    df["macd"] = ta.trend.macd(df["close"])
+    df["macd_signal"] = ta.trend.macd_signal(df["close"])
+    df["adx"] = ta.trend.adx(df["high"], df["low"], df["close"])
+    df["stoch_k"] = ta.momentum.stoch(df["high"], df["low"], df["close"])
+    df["stoch_d"] = ta.momentum.stoch_signal(df["high"], df["low"], df["close"])
+    return df
 
-        # ✅ إشارات مبنية على التقاطع والتحركات
-        last = df.iloc[-1]
+def technical_vote_series(df: pd.DataFrame) -> np.ndarray:
+    """
+    نفس تصويت technical_vote على كل الشموع دفعة واحدة (df ناتج compute_indicators).
+    التعادل 2-2 بين BUY و SELL يُحسم هنا كـ HOLD ليكون الباك تست حتميًا.
+    """
+    ema_cross = np.where(df["ema10"] > df["ema50"], 1, -1)
+    macd_cross = np.where(df["macd"] > df["macd_signal"], 1, -1)
+    rsi_signal = np.where(df["rsi"] < 30, 1, np.where(df["rsi"] > 70, -1, 0))
+    stoch_signal = np.where(df["stoch_k"] > df["stoch_d"], 1, -1)
 
-        ema_cross = "BUY" if last["ema10"] > last["ema50"] else "SELL"
-        macd_cross = "BUY" if last["macd"] > last["macd_signal"] else "SELL"
-        rsi_signal = "BUY" if last["rsi"] < 30 else "SELL" if last["rsi"] > 70 else "HOLD"
-        stoch_signal = "BUY" if last["stoch_k"] > last["stoch_d"] else "SELL"
+    votes = np.stack([ema_cross, macd_cross, rsi_signal, stoch_signal])
+    buy = (votes == 1).sum(axis=0)
+    sell = (votes == -1).sum(axis=0)
+    hold = (votes == 0).sum(axis=0)
+    return np.select(
+        [(buy > sell) & (buy > hold), (sell > buy) & (sell > hold)],
+        ["BUY", "SELL"],
+        default="HOLD"
+    ).astype(object)
 
-        # ✅ نظام تصويت بسيط من المؤشرات
-        signals = [ema_cross, macd_cross, rsi_signal, stoch_signal]
-        signal_counts = {s: signals.count(s) for s in set(signals)}
-        final = max(signal_counts, key=signal_counts.get)
+def technical_vote(last) -> str:
+    """
+    تصويت المؤشرات على آخر شمعة (last: صف DataFrame أو dict بنفس أسماء المؤشرات)
+    """
+    # ✅ إشارات مبنية على التقاطع والتحركات
+    ema_cross = "BUY" if last["ema10"] > last["ema50"] else "SELL"
+    macd_cross = "BUY" if last["macd"] > last["macd_signal"] else "SELL"
+    rsi_signal = "BUY" if last["rsi"] < 30 else "SELL" if last["rsi"] > 70 else "HOLD"
+    stoch_signal = "BUY" if last["stoch_k"] > last["stoch_d"] else "SELL"
 
-        return {"trading_signal": final}
+    # ✅ نظام تصويت بسيط من المؤشرات
+    signals = [ema_cross, macd_cross, rsi_signal, stoch_signal]
+    signal_counts = {s: signals.count(s) for s in set(signals)}
+    return max(signal_counts, key=signal_counts.get)
 
+# ✅ الإشارة الفنية لرمز معيّن على فريم 5 دقائق (مؤشرات تزايدية بدل إعادة الحساب الكامل)
+def get_technical_signal(symbol, interval="5m"):
+    try:
+        values = get_live_indicators(symbol, interval)
+        if values is None:
+            return "HOLD"
+        return technical_vote(values)
     except Exception as e:
-        logging.error(f"❌ [TA ERROR] فشل التحليل الفني: {e}")
-        return {"trading_signal": "HOLD"}
+        logging.error(f"❌ [TA ERROR] فشل حساب المؤشرات التزايدية: {e}")
+        return perform_technical_analysis(get_klines(symbol, interval, limit=100))["trading_signal"]
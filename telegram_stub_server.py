@@ -0,0 +1,71 @@
+# telegram_stub_server.py
+
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+from urllib.parse import parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def make_handler(fail_rate, min_interval):
+    last_sent = {}
+
+    class TelegramStubHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            fields = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+            if not self.path.endswith("/sendMessage"):
+                return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+            chat_id = fields.get("chat_id")
+            now = time.monotonic()
+            # محاكاة حد Telegram لكل محادثة
+            if min_interval and now - last_sent.get(chat_id, 0) < min_interval:
+                return self._reply(429, {"ok": False, "error_code": 429,
+                                         "description": "Too Many Requests", "parameters": {"retry_after": 1}})
+            if random.random() < fail_rate:
+                return self._reply(502, {"ok": False, "error_code": 502, "description": "Bad Gateway"})
+
+            last_sent[chat_id] = now
+            logging.info(f"📨 [Telegram Stub] chat={chat_id}\n{fields.get('text', '')}")
+            self._reply(200, {"ok": True, "result": {"message_id": int(now * 1000), "chat": {"id": chat_id},
+                                                     "text": fields.get("text")}})
+
+        def log_message(self, format, *args):
+            pass
+
+    return TelegramStubHandler
+
+
+# ✅ بديل محلي لواجهة Telegram: شغّل الخادم ثم اضبط TELEGRAM_API_URL=http://localhost:8081
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="خادم Telegram وهمي لاختبار الإشعارات")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="نسبة الطلبات التي تفشل بخطأ 502")
+    parser.add_argument("--min-interval", type=float, default=1.0, help="أقل فاصل بين رسائل المحادثة قبل الرد بـ 429")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.fail_rate, args.min_interval))
+    logging.info(f"🤖 [Telegram Stub] يعمل على http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,59 +1,91 @@
-import time
+import threading
 from datetime import datetime
-from utils import get_current_price
 from predict_lstm_signal import get_lstm_signal
 from utils import get_xgb_signal
 from notifier import send_telegram_message
 from database import log_closed_trade_to_db
 from risk_management import update_trade_history
+from price_stream import PriceStream
+from signal_pool import get_executor
+from streaming_indicators import update_from_stream_candle
+from config import MONITOR_INTERVAL
 
-def monitor_and_close_trade(symbol, entry_price, quantity, direction, stop_loss, take_profit):
+# ✅ تحقق من وقف الخسارة أو جني الأرباح لسعر معيّن
+def check_exit_levels(direction, price, stop_loss, take_profit):
+    if direction == "BUY":
+        if price >= take_profit:
+            return "Take Profit"
+        if price <= stop_loss:
+            return "Stop Loss"
+    elif direction == "SELL":
+        if price <= take_profit:
+            return "Take Profit"
+        if price >= stop_loss:
+            return "Stop Loss"
+    return None
+
+# ✅ تحقق من انعكاس الإشارات (LSTM/XGB)
+def check_signal_reversal(symbol, direction):
+    lstm_signal = get_lstm_signal(symbol)
+    xgb_signal = get_xgb_signal(symbol)
+
+    if direction == "BUY" and (lstm_signal == "SELL" or xgb_signal == "SELL"):
+        return "Signal Reversal"
+    if direction == "SELL" and (lstm_signal == "BUY" or xgb_signal == "BUY"):
+        return "Signal Reversal"
+    return None
+
+def monitor_and_close_trade(symbol, entry_price, quantity, direction, stop_loss, take_profit, stream_url=None):
     """
     مراقبة الصفقة المفتوحة والخروج الذكي بناءً على تحقق الهدف أو الإشارة العكسية.
+    الهدف/الوقف يُفحص مع كل تحديث سعر من البث اللحظي، والانعكاس يُفحص عند إغلاق كل شمعة فقط.
     """
     start_time = datetime.utcnow()
-    trade_closed = False
-    exit_reason = ""
+    closed = threading.Event()
+    state = {"exit_reason": "", "exit_price": entry_price}
+    state_lock = threading.Lock()
     pnl = 0
 
-    while not trade_closed:
-        try:
-            time.sleep(5)
-            current_price = get_current_price(symbol)
-
-            # 1️⃣ تحقق من وقف الخسارة أو جني الأرباح
-            if direction == "BUY":
-                if current_price >= take_profit:
-                    exit_reason = "Take Profit"
-                    trade_closed = True
-                elif current_price <= stop_loss:
-                    exit_reason = "Stop Loss"
-                    trade_closed = True
-            elif direction == "SELL":
-                if current_price <= take_profit:
-                    exit_reason = "Take Profit"
-                    trade_closed = True
-                elif current_price >= stop_loss:
-                    exit_reason = "Stop Loss"
-                    trade_closed = True
-
-            # 2️⃣ تحقق من انعكاس الإشارات (LSTM/XGB)
-            lstm_signal = get_lstm_signal(symbol)
-            xgb_signal = get_xgb_signal(symbol)
+    def close_trade(reason, price):
+        with state_lock:
+            if closed.is_set():
+                return
+            state["exit_reason"] = reason
+            state["exit_price"] = price
+            closed.set()
 
-            if direction == "BUY" and (lstm_signal == "SELL" or xgb_signal == "SELL"):
-                exit_reason = "Signal Reversal"
-                trade_closed = True
-            elif direction == "SELL" and (lstm_signal == "BUY" or xgb_signal == "BUY"):
-                exit_reason = "Signal Reversal"
-                trade_closed = True
+    # 1️⃣ كل تحديث سعر: تحقق فوري من وقف الخسارة أو جني الأرباح
+    def on_price(price):
+        reason = check_exit_levels(direction, price, stop_loss, take_profit)
+        if reason:
+            close_trade(reason, price)
 
+    # 2️⃣ عند إغلاق الشمعة: إعادة تقييم الانعكاس خارج خيط البث حتى لا يتأخر فحص الأسعار
+    def evaluate_reversal(close_price):
+        try:
+            reason = check_signal_reversal(symbol, direction)
+            if reason:
+                close_trade(reason, stream.last_price or close_price)
         except Exception as e:
             send_telegram_message(f"❌ [Monitoring Error] {e}")
-            break
+
+    def on_candle_close(candle):
+        update_from_stream_candle(symbol, MONITOR_INTERVAL, candle)
+        if not closed.is_set():
+            get_executor().submit(evaluate_reversal, float(candle["c"]))
+
+    stream_kwargs = {"base_url": stream_url} if stream_url else {}
+    stream = PriceStream(symbol, MONITOR_INTERVAL, on_price=on_price, on_candle_close=on_candle_close, **stream_kwargs)
+    stream.start()
+    try:
+        closed.wait()
+    finally:
+        stream.stop()
+
+    exit_reason = state["exit_reason"]
 
     # 📉 حساب الربح/الخسارة
-    exit_price = get_current_price(symbol)
+    exit_price = state["exit_price"]
     if direction == "BUY":
         pnl = (exit_price - entry_price) * quantity
     elif direction == "SELL":
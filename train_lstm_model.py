@@ -6,140 +6,185 @@ sys.stdout.reconfigure(encoding='utf-8')
 import pandas as pd
 import numpy as np
 import os
+import uuid
+import shutil
 import joblib
-from binance.client import Client
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
+from tensorflow.keras.utils import timeseries_dataset_from_array
+from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 from notifier import send_telegram_message
+from candle_archive import load_history
+from model_registry import current_model_paths, promote_model
+from config import TRAINING_HISTORY_DAYS, TRAINING_STAGING_DIR
 
 # ✅ الإعدادات
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-API_KEY = os.getenv("BINANCE_API_KEY", "")
-API_SECRET = os.getenv("BINANCE_API_SECRET", "")
-client = Client(API_KEY, API_SECRET)
-
 symbol = "BTCUSDT"
 intervals = ["5m", "15m", "1h", "4h"]
 look_back = 50
+batch_size = 32
+validation_fraction = 0.1
 
 model_output = "models/lstm_model.h5"
 scaler_output = "models/lstm_scaler.pkl"
 performance_log = "lstm_training_log.csv"
 
-def fetch_data(symbol, interval, lookback_days=10):
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=lookback_days)
-    klines = client.get_historical_klines(
-        symbol=symbol,
-        interval=interval,
-        start_str=start_time.strftime("%d %b %Y %H:%M:%S"),
-        end_str=end_time.strftime("%d %b %Y %H:%M:%S")
-    )
-    if not klines:
-        return pd.DataFrame()
-    
-    df = pd.DataFrame(klines, columns=[
-        "timestamp", "open", "high", "low", "close", "volume",
-        "close_time", "quote_asset_volume", "number_of_trades",
-        "taker_buy_base", "taker_buy_quote", "ignore"
-    ])
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit='ms')
-    df.set_index("timestamp", inplace=True)
-    df = df[["close"]].astype(float)
-    df.columns = [f"close_{interval}"]
-    return df
+def fetch_data(symbol, interval, lookback_days=TRAINING_HISTORY_DAYS):
+    return load_history(symbol, interval, lookback_days, columns=["close"])
 
-def merge_timeframes(symbol, intervals):
+# ✅ دمج أسعار الإغلاق لعدة فريمات ({interval: df}) في إطار واحد
+def merge_closes(frames):
     merged = None
-    for interval in intervals:
-        df = fetch_data(symbol, interval)
+    for interval, df in frames.items():
         if df.empty:
             continue
+        df = df[["close"]].rename(columns={"close": f"close_{interval}"})
         if merged is None:
             merged = df
         else:
             merged = merged.join(df, how='outer')
-    return merged.dropna()
+    return merged.dropna() if merged is not None else pd.DataFrame()
+
+def merge_timeframes(symbol, intervals):
+    return merge_closes({interval: fetch_data(symbol, interval) for interval in intervals})
 
 def create_dataset(data, look_back=50, threshold=0.002):
+    """
+    يعيد (series, y, scaler): السلسلة المقيّسة والتصنيف لكل نافذة. النافذة j هي series[j:j + look_back]
+    وتصنيفها تغيّر الشمعة التالية لها، بدون نسخ النوافذ (الذاكرة بحجم السلسلة لا look_back ضعفًا).
+    """
     scaler = MinMaxScaler()
-    scaled = scaler.fit_transform(data)
+    scaled = scaler.fit_transform(data)[:, 0].astype(np.float32)
+
+    # نفس الحلقة السابقة: change عند i = (scaled[i] - scaled[i-1]) / scaled[i-1] لكل i >= look_back
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.diff(scaled)[look_back - 1:] / scaled[look_back - 1:-1]
+    y = (change > threshold).astype(np.int8)
+    return scaled[:-1], y, scaler
+
+
+def make_window_datasets(series, y, look_back=50, batch_size=32, validation_fraction=0.1):
+    """
+    خط tf.data يقتطع النوافذ أثناء التدريب. آخر validation_fraction من النوافذ للتحقق
+    (مثل validation_split)، وترتيب نوافذ التدريب يُخلط في كل حقبة.
+    """
+    split = len(y) - int(len(y) * validation_fraction)
+    train = timeseries_dataset_from_array(
+        series[:split + look_back - 1, None], y[:split], sequence_length=look_back,
+        batch_size=batch_size, shuffle=True
+    )
+    validation = timeseries_dataset_from_array(
+        series[split:, None], y[split:], sequence_length=look_back, batch_size=batch_size
+    )
+    return train, validation, split
+
+def build_model():
+    model = Sequential()
+    model.add(LSTM(64, return_sequences=True, input_shape=(look_back, 1)))
+    model.add(Dropout(0.25))
+    model.add(LSTM(64))
+    model.add(Dropout(0.25))
+    model.add(Dense(1, activation="sigmoid"))
+
+    model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
+    return model
+
+# ✅ تقييم نموذج محفوظ على نفس نوافذ التحقق (بمحوّله الخاص) للمقارنة مع المرشح
+def evaluate_lstm(model_path, scaler_path, avg_close, y, split):
+    model = load_model(model_path, compile=False)
+    model.compile(loss="binary_crossentropy", metrics=["accuracy"])
+    series = joblib.load(scaler_path).transform(avg_close)[:-1, 0].astype(np.float32)
+    validation = timeseries_dataset_from_array(
+        series[split:, None], y[split:], sequence_length=look_back, batch_size=batch_size
+    )
+    loss, accuracy = model.evaluate(validation, verbose=0)
+    return float(loss), float(accuracy)
+
+def fit_lstm_model(merged=None, model_path=model_output, scaler_path=scaler_output):
+    """
+    تدريب LSTM على إطار الإغلاقات المدمج (أو تحميله من الأرشيف) وحفظه في model_path و scaler_path.
+    يعيد المقاييس على نوافذ التحقق، ومعها مقاييس النموذج الحالي إن كان الحفظ في مسار مرحلي.
+    """
+    df = merge_timeframes(symbol, intervals) if merged is None else merged.copy()
+    if df.empty or len(df) <= look_back:
+        raise ValueError("❌ البيانات غير كافية.")
+
+    logging.info("✅ تم دمج البيانات بنجاح.")
+    df["avg_close"] = df.mean(axis=1)
+
+    series, y, scaler = create_dataset(df[["avg_close"]], look_back=look_back)
+    train_ds, val_ds, split = make_window_datasets(series, y, look_back, batch_size, validation_fraction)
+
+    model = build_model()
+    checkpoint = ModelCheckpoint(model_path, monitor="val_loss", save_best_only=True, verbose=1)
+    early_stop = EarlyStopping(monitor="val_loss", patience=5)
+
+    history = model.fit(
+        train_ds,
+        epochs=25,
+        validation_data=val_ds,
+        callbacks=[checkpoint, early_stop],
+        verbose=1
+    )
 
-    X, y = [], []
-    for i in range(look_back, len(scaled)):
-        X.append(scaled[i - look_back:i, 0])
-        change = (scaled[i, 0] - scaled[i - 1, 0]) / scaled[i - 1, 0]
-        y.append(1 if change > threshold else 0)
+    joblib.dump(scaler, scaler_path)
+
+    logging.info(f"✅ النموذج محفوظ في: {model_path}")
+    logging.info(f"✅ Scaler محفوظ في: {scaler_path}")
+
+    # الملف المحفوظ هو أفضل حقبة (save_best_only)، فمقاييسه هي مقاييس تلك الحقبة
+    best = int(np.argmin(history.history["val_loss"]))
+    metrics = {
+        "samples": len(y),
+        "val_loss": float(history.history["val_loss"][best]),
+        "val_acc": float(history.history["val_accuracy"][best])
+    }
+    current_paths = current_model_paths("lstm", [model_output, scaler_output])
+    if model_path not in current_paths and all(os.path.exists(path) for path in current_paths):
+        metrics["current_val_loss"], metrics["current_val_acc"] = evaluate_lstm(
+            *current_paths, df[["avg_close"]], y, split
+        )
 
-    X = np.array(X)
-    y = np.array(y)
-    X = np.reshape(X, (X.shape[0], X.shape[1], 1))
-    return X, y, scaler
+    # سجل الأداء
+    log_entry = {
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "samples": len(y),
+        "train_acc": history.history["accuracy"][-1],
+        "val_acc": history.history["val_accuracy"][-1],
+        "train_loss": history.history["loss"][-1],
+        "val_loss": history.history["val_loss"][-1],
+    }
+    log_df = pd.DataFrame([log_entry])
+    if os.path.exists(performance_log):
+        log_df.to_csv(performance_log, mode='a', header=False, index=False)
+    else:
+        log_df.to_csv(performance_log, index=False)
+
+    logging.info("📊 تقرير الأداء محفوظ.")
+    return metrics
 
 def train_lstm_model():
     try:
-        logging.info("🚀 تحميل البيانات من Binance...")
-        df = merge_timeframes(symbol, intervals)
-
-        if df.empty or len(df) <= look_back:
-            raise ValueError("❌ البيانات غير كافية.")
-
-        logging.info("✅ تم دمج البيانات بنجاح.")
-        df["avg_close"] = df.mean(axis=1)
-
-        X, y, scaler = create_dataset(df[["avg_close"]], look_back=look_back)
-
-        model = Sequential()
-        model.add(LSTM(64, return_sequences=True, input_shape=(X.shape[1], 1)))
-        model.add(Dropout(0.25))
-        model.add(LSTM(64))
-        model.add(Dropout(0.25))
-        model.add(Dense(1, activation="sigmoid"))
-
-        model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
-
-        checkpoint = ModelCheckpoint(model_output, monitor="val_loss", save_best_only=True, verbose=1)
-        early_stop = EarlyStopping(monitor="val_loss", patience=5)
-
-        history = model.fit(
-            X, y,
-            epochs=25,
-            batch_size=32,
-            validation_split=0.1,
-            callbacks=[checkpoint, early_stop],
-            verbose=1
-        )
-
-        joblib.dump(scaler, scaler_output)
-
-        logging.info(f"✅ النموذج محفوظ في: {model_output}")
-        logging.info(f"✅ Scaler محفوظ في: {scaler_output}")
-
-        # سجل الأداء
-        log_entry = {
-            "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-            "samples": len(X),
-            "train_acc": history.history["accuracy"][-1],
-            "val_acc": history.history["val_accuracy"][-1],
-            "train_loss": history.history["loss"][-1],
-            "val_loss": history.history["val_loss"][-1],
-        }
-        log_df = pd.DataFrame([log_entry])
-        if os.path.exists(performance_log):
-            log_df.to_csv(performance_log, mode='a', header=False, index=False)
-        else:
-            log_df.to_csv(performance_log, index=False)
-
-        logging.info("📊 تقرير الأداء محفوظ.")
-        send_telegram_message(f"🤖 تم تدريب LSTM بنجاح - Val Acc: {log_entry['val_acc']:.2f}")
+        logging.info("🚀 تحميل البيانات من أرشيف الشموع...")
+        # التدريب في مجلد مرحلي ثم الترقية كنسخة جديدة، فالبوت لا يقرأ ملفات نصف مكتوبة
+        staging_dir = os.path.join(TRAINING_STAGING_DIR, f"lstm-{uuid.uuid4().hex[:6]}")
+        os.makedirs(staging_dir, exist_ok=True)
+        try:
+            staged = [os.path.join(staging_dir, os.path.basename(path)) for path in (model_output, scaler_output)]
+            metrics = fit_lstm_model(None, *staged)
+            promote_model("lstm", staged, [model_output, scaler_output])
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        send_telegram_message(f"🤖 تم تدريب LSTM بنجاح - Val Acc: {metrics['val_acc']:.2f}")
 
     except Exception as e:
         logging.error(f"❌ فشل تدريب LSTM: {e}")
         send_telegram_message(f"❌ خطأ في تدريب LSTM: {e}")
 
-train_lstm_model()
+if __name__ == "__main__":
+    train_lstm_model()
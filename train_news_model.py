@@ -1,13 +1,11 @@
 import os
+import argparse
 import pandas as pd
-import numpy as np
 import logging
 import joblib
-from tensorflow.keras.models import Sequential, load_model
-from tensorflow.keras.layers import Embedding, LSTM, Dense, Dropout
-from tensorflow.keras.preprocessing.text import Tokenizer
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from sklearn.model_selection import train_test_split
+from model_registry import register_model, get_model
+from numpy_news_model import NumpyNewsModel, export_news_model, PRECISIONS
+from config import NEWS_NUMPY_MODEL_PATH, NEWS_MODEL_PRECISION
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -17,6 +15,9 @@ TOKENIZER_PATH = "tokenizer.pkl"
 MAX_SEQUENCE_LENGTH = 100
 VOCAB_SIZE = 5000
 
+# ✅ تحميل النموذج المصدَّر (الأوزان + المفردات) مرة واحدة وإبقاؤه في الذاكرة: لا TensorFlow في عملية البوت
+register_model("news", [NEWS_NUMPY_MODEL_PATH], NumpyNewsModel.load)
+
 def load_news_dataset(filepath="news_dataset.csv"):
     if not os.path.exists(filepath):
         logging.error("❌ [DATA] ملف الأخبار غير موجود.")
@@ -27,7 +28,14 @@ def load_news_dataset(filepath="news_dataset.csv"):
         return None
     return df
 
-def train_news_sentiment_model():
+def train_news_sentiment_model(precision=NEWS_MODEL_PRECISION):
+    # TensorFlow يُستورد للتدريب فقط
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Embedding, LSTM, Dense, Dropout
+    from tensorflow.keras.preprocessing.text import Tokenizer
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    from sklearn.model_selection import train_test_split
+
     df = load_news_dataset()
     if df is None:
         return
@@ -55,31 +63,45 @@ def train_news_sentiment_model():
 
     model.save(MODEL_PATH)
     joblib.dump(tokenizer, TOKENIZER_PATH)
+    export_news_model(MODEL_PATH, TOKENIZER_PATH, NEWS_NUMPY_MODEL_PATH, MAX_SEQUENCE_LENGTH, precision)
 
     logging.info("✅ تم حفظ النموذج والتوكنيزر بنجاح.")
 
-# ✅ دالة التنبؤ باستخدام النموذج المدرّب
-def predict_news_sentiment_lstm(text: str) -> float:
+# ✅ التنبؤ لمجموعة نصوص (آلاف الأخبار) بتوكنيز وتمريرة NumPy على دفعات
+def predict_news_sentiment_lstm_batch(texts: list) -> list:
+    if not texts:
+        return []
     try:
-        if not os.path.exists(MODEL_PATH) or not os.path.exists(TOKENIZER_PATH):
+        model = get_model("news")
+        if model is None:
             logging.error("❌ النموذج أو التوكنيزر غير موجود.")
-            return 0.0
-
-        tokenizer = joblib.load(TOKENIZER_PATH)
-        model = load_model(MODEL_PATH)
+            return [None] * len(texts)
 
-        sequence = tokenizer.texts_to_sequences([text])
-        padded = pad_sequences(sequence, maxlen=MAX_SEQUENCE_LENGTH)
-        prediction = model.predict(padded)[0]
+        predictions = model.predict_texts(texts)
 
         # نعيد الفارق بين الإيجابي والسلبي كمؤشر مشاعر
-        sentiment_score = prediction[2] - prediction[0]  # pos - neg
-        return round(float(sentiment_score), 3)
+        sentiment_scores = predictions[:, 2] - predictions[:, 0]  # pos - neg
+        return [round(float(score), 3) for score in sentiment_scores]
 
     except Exception as e:
         logging.error(f"❌ [PREDICT] فشل في تحليل المشاعر بالنموذج: {e}")
-        return 0.0
+        return [None] * len(texts)
+
+# ✅ دالة التنبؤ باستخدام النموذج المدرّب
+def predict_news_sentiment_lstm(text: str) -> float:
+    return predict_news_sentiment_lstm_batch([text])[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="تدريب نموذج مشاعر الأخبار وتصديره لاستدلال NumPy")
+    parser.add_argument("--export-only", action="store_true", help="تصدير النموذج الحالي بدون تدريب")
+    parser.add_argument("--precision", default=NEWS_MODEL_PRECISION, choices=PRECISIONS)
+    args = parser.parse_args(argv)
+
+    if args.export_only:
+        export_news_model(MODEL_PATH, TOKENIZER_PATH, NEWS_NUMPY_MODEL_PATH, MAX_SEQUENCE_LENGTH, args.precision)
+    else:
+        train_news_sentiment_model(args.precision)
 
 # ✅ تدريب مباشر إذا تم تشغيل السكربت
 if __name__ == "__main__":
-    train_news_sentiment_model()
+    main()
@@ -1,35 +1,67 @@
 import os
+import uuid
+import shutil
 import numpy as np
 import pandas as pd
 import joblib
-from binance.client import Client
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from xgboost import XGBClassifier
-from sklearn.metrics import accuracy_score
 from datetime import datetime
 import logging
+from candle_archive import load_history
+from xgb_forest import ForestEvaluator, check_agreement
+from config import (
+    TRAINING_HISTORY_DAYS, XGB_TUNING_ENABLED, XGB_TUNING_TRIALS, XGB_CV_FOLDS,
+    XGB_MAX_ROUNDS, XGB_EARLY_STOPPING_ROUNDS, XGB_TEST_FRACTION, XGB_PROBA_ULP_TOLERANCE, TRAINING_STAGING_DIR
+)
+from model_registry import register_model, get_model, current_model_paths, promote_model
 
 # ✅ إعداد السجلات
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # ✅ تحميل المفاتيح
 load_dotenv()
-API_KEY = os.getenv("BINANCE_API_KEY")
-API_SECRET = os.getenv("BINANCE_API_SECRET")
-client = Client(API_KEY, API_SECRET)
-
-# ✅ تحميل البيانات من Binance
-def get_klines(symbol="BTCUSDT", interval="1h", limit=1000):
-    raw = client.get_klines(symbol=symbol, interval=interval, limit=limit)
-    df = pd.DataFrame(raw, columns=[
-        "timestamp", "open", "high", "low", "close", "volume",
-        "close_time", "quote_asset_volume", "number_of_trades",
-        "taker_buy_base", "taker_buy_quote", "ignore"
-    ])
-    df[["open", "high", "low", "close", "volume"]] = df[["open", "high", "low", "close", "volume"]].astype(float)
-    return df
+
+MODEL_PATH = "xgb_model.json"
+SCALER_PATH = "xgb_scaler.pkl"
+FEATURE_COLS = ["open", "high", "low", "close", "volume",
+                "sma_10", "ema_10", "volatility", "price_vs_sma",
+                "high_low_range", "body_size"]
+TRAINING_LOG = "xgb_training_log.csv"
+
+# مساحة البحث العشوائي للمعاملات (التجارب تُسحب منها بدون تكرار)
+PARAM_GRID = {
+    "max_depth": [3, 4, 6, 8],
+    "learning_rate": [0.03, 0.1, 0.3],
+    "subsample": [0.7, 1.0],
+    "colsample_bytree": [0.7, 1.0],
+    "min_child_weight": [1, 5, 20],
+    "reg_lambda": [1.0, 5.0]
+}
+# نسبة نهاية كل طية تدريب تُستخدم للتوقف المبكر
+EARLY_STOPPING_FRACTION = 0.15
+
+# ✅ تحميل النموذج والمحول مرة واحدة وإبقاؤهما في الذاكرة
+# الأشجار تُجمَّع لمقيّم NumPy (xgb_forest) بدل XGBClassifier، مع الرجوع لـ XGBoost لأي نموذج غير مدعوم
+# xgboost و sklearn يُستوردان داخل دوال التدريب والرجوع فقط، فاستيراد هذه الوحدة في البوت لا يحمّلهما
+def _load_xgb_artifacts(model_path, scaler_path):
+    try:
+        model = ForestEvaluator.load(model_path)
+    except (ValueError, KeyError) as e:
+        logging.warning(f"⚠️ [XGB] تعذر تجميع الأشجار ({e})، سيتم استخدام XGBoost مباشرة.")
+        from xgboost import XGBClassifier
+        model = XGBClassifier()
+        model.load_model(model_path)
+    return model, joblib.load(scaler_path)
+
+register_model("xgb", [MODEL_PATH, SCALER_PATH], _load_xgb_artifacts)
+
+def get_xgb_artifacts():
+    return get_model("xgb")
+
+# ✅ تحميل بيانات التدريب من أرشيف الشموع المحلي
+def get_klines(symbol="BTCUSDT", interval="1h", days=TRAINING_HISTORY_DAYS):
+    return load_history(symbol, interval, days).reset_index()
 
 # ✅ توليد الميزات
 def add_features(df):
@@ -46,42 +78,155 @@ def add_features(df):
     df.dropna(inplace=True)
     return df
 
-# ✅ تدريب النموذج
-def train_xgb_model():
+# ✅ إضافة صفوف لسجل التدريب مع توحيد الأعمدة (السجل القديم يحتوي timestamp, samples, accuracy فقط)
+def _append_training_log(rows):
+    new = pd.DataFrame(rows)
+    if os.path.exists(TRAINING_LOG):
+        new = pd.concat([pd.read_csv(TRAINING_LOG), new], ignore_index=True)
+    tmp_path = TRAINING_LOG + ".tmp"
+    new.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, TRAINING_LOG)
+
+def sample_params(trials, seed=None):
+    rng = np.random.default_rng(seed)
+    keys = list(PARAM_GRID)
+    grid_size = int(np.prod([len(PARAM_GRID[k]) for k in keys]))
+    picks = rng.choice(grid_size, size=min(trials, grid_size), replace=False)
+    params = []
+    for pick in picks:
+        combo = {}
+        for key in keys:
+            pick, index = divmod(int(pick), len(PARAM_GRID[key]))
+            combo[key] = PARAM_GRID[key][index]
+        params.append(combo)
+    return params
+
+def _new_classifier(params, n_jobs=1, n_estimators=XGB_MAX_ROUNDS, early_stopping=True):
+    from xgboost import XGBClassifier
+
+    return XGBClassifier(
+        tree_method="hist",
+        n_estimators=n_estimators,
+        early_stopping_rounds=XGB_EARLY_STOPPING_ROUNDS if early_stopping else None,
+        eval_metric="logloss",
+        n_jobs=n_jobs,
+        **params
+    )
+
+def _fit_fold(params, X, y, train_index, valid_index):
+    from sklearn.metrics import accuracy_score, log_loss
+
+    # نهاية طية التدريب للتوقف المبكر، وطية التحقق (المستقبل) للتقييم فقط
+    stop = len(train_index) - max(1, int(len(train_index) * EARLY_STOPPING_FRACTION))
+    fit_index, stop_index = train_index[:stop], train_index[stop:]
+    model = _new_classifier(params)
+    model.fit(X[fit_index], y[fit_index], eval_set=[(X[stop_index], y[stop_index])], verbose=False)
+    proba = model.predict_proba(X[valid_index])[:, 1]
+    return log_loss(y[valid_index], proba, labels=[0, 1]), accuracy_score(y[valid_index], proba > 0.5), model.best_iteration
+
+def _evaluate_trial(params, X, y, folds):
     try:
-        logging.info("🚀 بدء تحميل البيانات وتوليد الميزات...")
-        df = get_klines()
-        df = add_features(df)
+        scores = np.array([_fit_fold(params, X, y, train_index, valid_index) for train_index, valid_index in folds])
+        return {"cv_logloss": float(scores[:, 0].mean()), "cv_accuracy": float(scores[:, 1].mean()),
+                "best_iteration": int(scores[:, 2].mean())}
+    except Exception as e:
+        logging.warning(f"⚠️ [XGB Tuning] فشلت التجربة {params}: {e}")
+        return {"cv_logloss": float("inf"), "cv_accuracy": float("nan"), "best_iteration": 0}
 
-        feature_cols = ["open", "high", "low", "close", "volume",
-                        "sma_10", "ema_10", "volatility", "price_vs_sma",
-                        "high_low_range", "body_size"]
-        X = df[feature_cols]
-        y = df["target"]
+# ✅ بحث عشوائي بطيات زمنية متقدمة (walk-forward): كل تجربة وطية في خيط، و XGBoost بخيط واحد لكل نموذج
+def tune_xgb_params(X, y, trials=XGB_TUNING_TRIALS, folds=XGB_CV_FOLDS, n_jobs=None, run_id=None):
+    from sklearn.model_selection import TimeSeriesSplit
 
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+    splits = list(TimeSeriesSplit(n_splits=folds).split(X))
+    candidates = sample_params(trials)
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1, thread_name_prefix="xgb-tune") as pool:
+        results = list(pool.map(lambda params: _evaluate_trial(params, X, y, splits), candidates))
 
-        X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
+    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    _append_training_log([
+        {"timestamp": timestamp, "run_id": run_id, "kind": "trial", "samples": len(X), **params, **result}
+        for params, result in zip(candidates, results)
+    ])
 
-        model = XGBClassifier()
-        model.fit(X_train, y_train)
+    best = int(np.argmin([result["cv_logloss"] for result in results]))
+    logging.info(f"🔎 [XGB Tuning] أفضل تجربة من {len(candidates)}: {candidates[best]} | {results[best]}")
+    return candidates[best], results[best]
+
+# ✅ تدريب النموذج على شموع الساعة (أو تحميلها من الأرشيف) وحفظه في model_path و scaler_path
+# آخر XGB_TEST_FRACTION زمنيًا للاختبار، وتُعاد الدقة عليه ومعها دقة النموذج الحالي إن كان الحفظ في مسار مرحلي
+def fit_xgb_model(hourly=None, model_path=MODEL_PATH, scaler_path=SCALER_PATH, n_jobs=None, tune=XGB_TUNING_ENABLED):
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.metrics import accuracy_score
 
-        model.save_model("xgb_model.json")
-        joblib.dump(scaler, "xgb_scaler.pkl")
+    df = get_klines() if hourly is None else hourly.reset_index()
+    df = add_features(df)
 
-        y_pred = model.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
+    X = df[FEATURE_COLS]
+    y = df["target"].to_numpy()
 
-        logging.info(f"✅ تم حفظ نموذج XGBoost بنجاح.")
-        logging.info(f"📊 دقة النموذج: {accuracy:.4f} | عينات: {len(X)}")
+    split = len(X) - int(len(X) * XGB_TEST_FRACTION)
+    X_train, X_test, y_train, y_test = X.iloc[:split], X.iloc[split:], y[:split], y[split:]
 
-        log_entry = {
-            "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-            "samples": len(X),
-            "accuracy": accuracy
-        }
-        pd.DataFrame([log_entry]).to_csv("xgb_training_log.csv", mode="a", header=not os.path.exists("xgb_training_log.csv"), index=False)
+    scaler = StandardScaler()
+    train_scaled = scaler.fit_transform(X_train)
+    run_id = uuid.uuid4().hex[:8]
+
+    if tune:
+        params, best = tune_xgb_params(train_scaled, y_train, n_jobs=n_jobs, run_id=run_id)
+        # النموذج النهائي على كامل بيانات التدريب بعدد الأشجار الذي اختاره التوقف المبكر في الطيات
+        model = _new_classifier(params, n_jobs=n_jobs, n_estimators=max(best["best_iteration"] + 1, 1), early_stopping=False)
+    else:
+        params = {}
+        model = _new_classifier(params, n_jobs=n_jobs, n_estimators=100, early_stopping=False)
+    model.fit(train_scaled, y_train)
+
+    model.save_model(model_path)
+    joblib.dump(scaler, scaler_path)
+
+    y_pred = model.predict(scaler.transform(X_test))
+    accuracy = accuracy_score(y_test, y_pred)
+
+    # المقيّم المجمّع هو ما يستخدمه البوت، فلا يُعتمد نموذج لا يطابقه: الهامش بت ببت والاحتمال ضمن حد ulp.
+    # انقلاب تصنيف ضمن هذا الحد (احتمال على بعد وحدة دقة من 0.5) ضجيج تقريب يُسجَّل ولا يوقف التدريب
+    agreement = check_agreement(ForestEvaluator.load(model_path), model, scaler.transform(X_test))
+    logging.info(f"🌲 [XGB] مطابقة المقيّم المجمّع: {agreement}")
+    max_ulp = max(agreement["max_proba_ulp"], agreement["max_exact_proba_ulp"])
+    if not agreement["margin_exact"] or max_ulp > XGB_PROBA_ULP_TOLERANCE:
+        raise ValueError(f"المقيّم المجمّع لا يطابق XGBoost: {agreement}")
+    if agreement["label_flips"]:
+        logging.warning(f"⚠️ [XGB] {agreement['label_flips']} تصنيف انقلب ضمن حد {XGB_PROBA_ULP_TOLERANCE} ulp (ضجيج تقريب).")
+
+    logging.info(f"✅ تم حفظ نموذج XGBoost بنجاح.")
+    logging.info(f"📊 دقة النموذج: {accuracy:.4f} | عينات: {len(X)}")
+
+    metrics = {"samples": len(X), "accuracy": float(accuracy)}
+    current_paths = current_model_paths("xgb", [MODEL_PATH, SCALER_PATH])
+    if model_path not in current_paths and all(os.path.exists(path) for path in current_paths):
+        current_model, current_scaler = _load_xgb_artifacts(*current_paths)
+        metrics["current_accuracy"] = float(accuracy_score(y_test, current_model.predict(current_scaler.transform(X_test))))
+
+    _append_training_log([{
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "run_id": run_id,
+        "kind": "final",
+        "samples": len(X),
+        "accuracy": accuracy,
+        **params
+    }])
+    return metrics
+
+def train_xgb_model():
+    try:
+        logging.info("🚀 بدء تحميل البيانات وتوليد الميزات...")
+        # التدريب في مجلد مرحلي ثم الترقية كنسخة جديدة، فالبوت لا يقرأ ملفات نصف مكتوبة
+        staging_dir = os.path.join(TRAINING_STAGING_DIR, f"xgb-{uuid.uuid4().hex[:6]}")
+        os.makedirs(staging_dir, exist_ok=True)
+        try:
+            staged = [os.path.join(staging_dir, os.path.basename(path)) for path in (MODEL_PATH, SCALER_PATH)]
+            fit_xgb_model(None, *staged)
+            promote_model("xgb", staged, [MODEL_PATH, SCALER_PATH])
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
 
     except Exception as e:
         logging.error(f"❌ خطأ أثناء تدريب النموذج: {e}")
@@ -93,15 +238,13 @@ def predict_xgb_signal(df_latest):
             logging.warning("⚠️ بيانات غير كافية لتوقع XGB.")
             return None
 
-        model = XGBClassifier()
-        model.load_model("xgb_model.json")
-        scaler = joblib.load("xgb_scaler.pkl")
-
-        df_latest = add_features(df_latest)
-        feature_cols = ["open", "high", "low", "close", "volume",
-                        "sma_10", "ema_10", "volatility", "price_vs_sma",
-                        "high_low_range", "body_size"]
-        X = df_latest[feature_cols].tail(1)
+        artifacts = get_xgb_artifacts()
+        if artifacts is None:
+            return None
+        model, scaler = artifacts
+
+        df_latest = add_features(df_latest.copy())
+        X = df_latest[FEATURE_COLS].tail(1)
         X_scaled = scaler.transform(X)
 
         prediction = model.predict(X_scaled)[0]
@@ -112,5 +255,40 @@ def predict_xgb_signal(df_latest):
         logging.error(f"❌ فشل في توقع إشارة XGB: {e}")
         return None
 
+# ✅ توقع XGBoost لعدة رموز دفعة واحدة: صف ميزات لكل رمز ثم predict واحد
+def predict_xgb_signals_batch(frames):
+    results = {symbol: None for symbol in frames}
+    try:
+        artifacts = get_xgb_artifacts()
+        if artifacts is None:
+            return results
+        model, scaler = artifacts
+
+        ready, rows = [], []
+        for symbol, df in frames.items():
+            if df is None or df.empty or len(df) < 10:
+                logging.warning(f"⚠️ بيانات غير كافية لتوقع XGB: {symbol}")
+                continue
+            features = add_features(df.copy())
+            if features.empty:
+                continue
+            ready.append(symbol)
+            rows.append(features[FEATURE_COLS].tail(1))
+
+        if not ready:
+            return results
+
+        X_scaled = scaler.transform(pd.concat(rows))
+        predictions = model.predict(X_scaled)
+        for symbol, prediction in zip(ready, predictions):
+            results[symbol] = int(prediction)
+
+        logging.info(f"🤖 توقعات XGB لعدد {len(ready)} رمز في استدعاء واحد.")
+        return results
+
+    except Exception as e:
+        logging.error(f"❌ فشل في توقع إشارات XGB المجمّعة: {e}")
+        return results
+
 if __name__ == "__main__":
     train_xgb_model()
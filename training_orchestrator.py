@@ -0,0 +1,178 @@
+# training_orchestrator.py
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow.parquet as pq
+from candle_archive import load_history
+from model_registry import promote_model
+from notifier import send_telegram_message
+from config import (
+    TRAINING_HISTORY_DAYS, TRAINING_WORKERS, TRAINING_THREADS_PER_JOB, TRAINING_NICE,
+    TRAINING_STAGING_DIR, MODEL_METRICS_FILE
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SYMBOL = "BTCUSDT"
+LSTM_INTERVALS = ["5m", "15m", "1h", "4h"]
+XGB_INTERVAL = "1h"
+DATASET_INTERVALS = sorted(set(LSTM_INTERVALS) | {XGB_INTERVAL})
+
+# مقياس المقارنة لكل نموذج: (اسم المقياس، هل الأعلى أفضل)
+JOB_METRICS = {
+    "lstm": ("val_loss", False),
+    "xgb": ("accuracy", True)
+}
+
+# متغيرات تحدد عدد خيوط مكتبات الحساب في كل عامل تدريب
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"
+]
+
+
+# ✅ بناء بيانات السوق مرة واحدة لكل المهام: ملف Parquet لكل فريم في مجلد التشغيل
+def build_market_dataset(run_dir, symbol=SYMBOL, days=TRAINING_HISTORY_DAYS):
+    os.makedirs(run_dir, exist_ok=True)
+    for interval in DATASET_INTERVALS:
+        df = load_history(symbol, interval, days)
+        if df.empty:
+            raise ValueError(f"لا توجد شموع {symbol} {interval} في الأرشيف")
+        df.to_parquet(os.path.join(run_dir, f"candles_{interval}.parquet"))
+
+
+def load_market_frame(run_dir, interval):
+    return pq.read_table(os.path.join(run_dir, f"candles_{interval}.parquet"), memory_map=True).to_pandas()
+
+
+def _init_worker(threads):
+    # يُنفَّذ قبل استيراد TensorFlow/XGBoost في العامل حتى تُحترم حدود الخيوط
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    if hasattr(os, "nice"):
+        os.nice(TRAINING_NICE)
+
+
+def _train_lstm(run_dir, staging_dir):
+    import train_lstm_model as lstm  # استيراد داخل العامل بعد ضبط حدود الخيوط
+
+    merged = lstm.merge_closes({interval: load_market_frame(run_dir, interval) for interval in LSTM_INTERVALS})
+    staged = [os.path.join(staging_dir, os.path.basename(path)) for path in (lstm.model_output, lstm.scaler_output)]
+    metrics = lstm.fit_lstm_model(merged, *staged)
+    return {"metrics": metrics, "staged": staged, "targets": [lstm.model_output, lstm.scaler_output]}
+
+
+def _train_xgb(run_dir, staging_dir, threads):
+    import train_xgb as xgb
+
+    staged = [os.path.join(staging_dir, os.path.basename(path)) for path in (xgb.MODEL_PATH, xgb.SCALER_PATH)]
+    metrics = xgb.fit_xgb_model(load_market_frame(run_dir, XGB_INTERVAL), *staged, n_jobs=threads)
+    return {"metrics": metrics, "staged": staged, "targets": [xgb.MODEL_PATH, xgb.SCALER_PATH]}
+
+
+def run_job(name, run_dir, threads):
+    staging_dir = os.path.join(run_dir, name)
+    os.makedirs(staging_dir, exist_ok=True)
+    if name == "lstm":
+        return _train_lstm(run_dir, staging_dir)
+    if name == "xgb":
+        return _train_xgb(run_dir, staging_dir, threads)
+    raise ValueError(f"مهمة تدريب غير معروفة: {name}")
+
+
+def _beats_current(name, metrics):
+    metric, higher_is_better = JOB_METRICS[name]
+    current = metrics.get(f"current_{metric}")
+    if current is None:
+        return True
+    return metrics[metric] > current if higher_is_better else metrics[metric] < current
+
+
+def _save_metrics(results):
+    try:
+        with open(MODEL_METRICS_FILE, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    except (FileNotFoundError, ValueError):
+        history = {}
+    history.update(results)
+
+    os.makedirs(os.path.dirname(MODEL_METRICS_FILE) or ".", exist_ok=True)
+    tmp_path = MODEL_METRICS_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=4)
+    os.replace(tmp_path, MODEL_METRICS_FILE)
+
+
+# ✅ تدريب النماذج بالتوازي في عمليات منفصلة، وترقية كل مرشح فقط إن تفوق على النموذج الحالي
+def train_models(jobs=("lstm", "xgb"), symbol=SYMBOL, days=TRAINING_HISTORY_DAYS, on_waiting=None):
+    started_at = time.monotonic()
+    run_dir = os.path.join(TRAINING_STAGING_DIR, f"{datetime.utcnow():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}")
+    results = {}
+    try:
+        build_market_dataset(run_dir, symbol, days)
+
+        # spawn: العمليات لا ترث TensorFlow أو خيوط البوت من العملية الأم
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(TRAINING_WORKERS, len(jobs)), mp_context=context,
+                                 initializer=_init_worker, initargs=(TRAINING_THREADS_PER_JOB,)) as pool:
+            futures = {name: pool.submit(run_job, name, run_dir, TRAINING_THREADS_PER_JOB) for name in jobs}
+            if on_waiting is not None:
+                on_waiting()
+
+            for name, future in futures.items():
+                try:
+                    job = future.result()
+                except Exception as e:
+                    logging.error(f"❌ [Training] فشل تدريب {name}: {e}")
+                    results[name] = {"error": str(e), "promoted": False}
+                    continue
+
+                metrics = job["metrics"]
+                promoted = _beats_current(name, metrics)
+                if promoted:
+                    promote_model(name, job["staged"], job["targets"])
+                else:
+                    logging.info(f"⏸️ [Training] المرشح {name} لم يتفوق على النموذج الحالي: {metrics}")
+                results[name] = {**metrics, "promoted": promoted,
+                                 "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")}
+
+        _save_metrics(results)
+        logging.info(f"🏁 [Training] انتهى التدريب خلال {time.monotonic() - started_at:.1f} ثانية: {results}")
+        return results
+
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def format_results(results):
+    lines = []
+    for name, result in results.items():
+        if "error" in result:
+            lines.append(f"▪️ {name.upper()}: ❌ {result['error']}")
+            continue
+        metric, _ = JOB_METRICS[name]
+        status = "✅ تمت الترقية" if result["promoted"] else "⏸️ أُبقي الحالي"
+        lines.append(f"▪️ {name.upper()}: {metric}={result[metric]:.4f} | {status}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="تدريب النماذج بالتوازي مع ترقية ذرية للأفضل فقط")
+    parser.add_argument("--jobs", nargs="+", default=list(JOB_METRICS), choices=list(JOB_METRICS))
+    parser.add_argument("--days", type=int, default=TRAINING_HISTORY_DAYS)
+    args = parser.parse_args(argv)
+
+    results = train_models(args.jobs, days=args.days)
+    send_telegram_message("🧠 *نتائج التدريب*\n" + format_results(results))
+
+
+if __name__ == "__main__":
+    main()
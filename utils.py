@@ -1,69 +1,29 @@
-import csv
 import logging
-from datetime import datetime
 import pandas as pd
 from predict_lstm_signal import predict_lstm_signal  # ✅ تم تصحيح الاستيراد
-from binance.client import Client
+from kline_cache import get_klines
+from train_xgb import predict_xgb_signal
+from decision_journal import append_decision
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-BOT_DECISIONS_FILE = "bot_decisions.csv"
-
-def log_bot_decision(symbol, decision, lstm_signal, xgb_signal, technical_signal,
-                     sentiment_score, liquidity_score, rl_decision, confidence_score=1.0,
-                     executed=False, log_file=BOT_DECISIONS_FILE):
+# ✅ تسجيل قرار البوت في سجل القرارات العمودي (decision_journal)
+def log_bot_decision(data: dict):
     try:
-        file_exists = False
-        try:
-            with open(log_file, "r", encoding="utf-8") as f:
-                file_exists = True
-        except FileNotFoundError:
-            pass
-
-        with open(log_file, "a", newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=[
-                "timestamp", "symbol", "decision", "lstm_signal", "xgb_signal",
-                "technical_signal", "sentiment_score", "liquidity_score",
-                "rl_decision", "confidence_score", "executed"
-            ])
-
-            if not file_exists:
-                writer.writeheader()
-
-            writer.writerow({
-                "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-                "symbol": symbol,
-                "decision": decision,
-                "lstm_signal": lstm_signal,
-                "xgb_signal": xgb_signal,
-                "technical_signal": technical_signal,
-                "sentiment_score": sentiment_score,
-                "liquidity_score": liquidity_score,
-                "rl_decision": rl_decision,
-                "confidence_score": confidence_score,
-                "executed": executed
-            })
-
-        logging.info(f"🧠 [LOGGED] Decision logged successfully: {decision} (Executed: {executed})")
+        append_decision(data)
+        logging.info(f"🧠 [LOGGED] Decision logged successfully: {data.get('decision')} (Executed: {data.get('executed')})")
 
     except Exception as e:
         logging.error(f"❌ [ERROR] Failed to log bot decision: {e}")
 
-# ✅ دالة ذكية لجلب البيانات الموحدة من Binance
+# ✅ دالة ذكية لجلب البيانات الموحدة (من مخزن الشموع المشترك)
+# client لم يعد مستخدمًا ويبقى للتوافق مع الاستدعاءات القديمة
 def fetch_combined_market_data(client, symbol, intervals=["5m", "15m", "1h", "4h"]):
     try:
         all_data = []
 
         for interval in intervals:
-            candles = client.futures_klines(symbol=symbol, interval=interval, limit=100)
-            df = pd.DataFrame(candles, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume', 'number_of_trades',
-                'taker_buy_base', 'taker_buy_quote', 'ignore'
-            ])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-            df = df.astype(float)
+            df = get_klines(symbol, interval, limit=100)
             df.columns = [f"{col}_{interval}" for col in df.columns]
             all_data.append(df)
 
@@ -75,6 +35,23 @@ def fetch_combined_market_data(client, symbol, intervals=["5m", "15m", "1h", "4h
         logging.error(f"❌ [ERROR] في دمج البيانات: {e}")
         return pd.DataFrame()
 
+# ✅ بيانات سعرية لفريم واحد (تستخدمها إدارة المخاطر)
+def get_price_data(symbol, interval="1h", limit=100):
+    return get_klines(symbol, interval, limit=limit)
+
+# ✅ آخر سعر معروف (إغلاق الشمعة الحالية على فريم الدقيقة)
+def get_current_price(symbol):
+    return float(get_klines(symbol, "1m", limit=1)["close"].iloc[-1])
+
+# ✅ إشارة XGBoost كـ BUY/SELL على فريم الساعة (نفس فريم التدريب)
+def get_xgb_signal(symbol):
+    return xgb_prediction_to_signal(predict_xgb_signal(get_klines(symbol, "1h", limit=100)))
+
+def xgb_prediction_to_signal(prediction):
+    if prediction is None:
+        return None
+    return "BUY" if prediction == 1 else "SELL"
+
 # ✅ مثال لاستخراج الإشارات
 def extract_all_signals():
     try:
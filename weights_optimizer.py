@@ -1,30 +1,82 @@
 import pandas as pd
 import numpy as np
 import json
-from sklearn.linear_model import LinearRegression
+import os
+import threading
 from notifier import send_telegram_message
+from decision_journal import read_decisions
 
-# 🔁 تحميل البيانات
-def load_data():
-    decisions = pd.read_csv("bot_decisions.csv")
-    trades = pd.read_csv("closed_trades.csv")
+TRADES_FILE = "closed_trades.csv"
+# مجموعة التدريب المدمجة (قرار + نتيجة صفقته) تُحفظ وتُضاف لها الصفقات الجديدة فقط
+TRAINING_SET_FILE = "weights_training_set.csv"
+TRAINING_STATE_FILE = "weights_training_state.json"
+# مهمة الجدولة والمدرّب التلقائي قد يستدعيان update_weights معًا: قفل حتى لا تُضاف نفس الصفقات مرتين
+_update_lock = threading.Lock()
 
-    # دمج القرارات مع الصفقات بناءً على الرمز والتاريخ الأقرب
-    decisions['timestamp'] = pd.to_datetime(decisions['timestamp'])
-    trades['timestamp'] = pd.to_datetime(trades['timestamp'])
+# 🔗 ربط كل صفقة بآخر قرار قبلها لنفس الرمز (merge_asof للخلف)
+def join_trades_to_decisions(trades, decisions):
+    decisions = decisions.sort_values("timestamp")
+    columns = list(decisions.columns) + ["pnl"]
+    decisions = decisions.assign(decision_time=decisions["timestamp"])
 
-    merged = []
-    for _, trade in trades.iterrows():
-        symbol = trade['symbol']
-        trade_time = trade['timestamp']
-        decision = decisions[(decisions['symbol'] == symbol) &
-                             (decisions['timestamp'] <= trade_time)].sort_values(by='timestamp', ascending=False).head(1)
-        if not decision.empty:
-            row = decision.iloc[0].to_dict()
-            row['pnl'] = trade['pnl']
-            merged.append(row)
+    merged = pd.merge_asof(
+        trades[["timestamp", "symbol", "pnl"]].sort_values("timestamp"),
+        decisions,
+        on="timestamp",
+        by="symbol",
+        direction="backward"
+    )
+    merged = merged.dropna(subset=["decision_time"])
+    merged["timestamp"] = merged["decision_time"]
+    return merged[columns].reset_index(drop=True)
 
-    return pd.DataFrame(merged)
+def _load_state():
+    try:
+        with open(TRAINING_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_state(state):
+    with open(TRAINING_STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+# يعيد (الصفوف بتوقيت صالح، عدد الصفوف المقروءة فعليًا) حتى يتقدم العداد بالصفوف الخام لا المحتفظ بها
+def _read_timestamped(path, skip_rows=0):
+    df = pd.read_csv(path, skiprows=range(1, skip_rows + 1))
+    raw_rows = len(df)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.dropna(subset=['timestamp']), raw_rows
+
+# 🔁 تحميل البيانات: الصفقات الجديدة فقط تُربط وتُضاف لمجموعة التدريب المحفوظة
+def load_data(trades_file=TRADES_FILE):
+    if not os.path.exists(trades_file):
+        return pd.DataFrame()
+
+    state = _load_state()
+    trades_size = os.path.getsize(trades_file)
+
+    # ملف صفقات أصغر من آخر مرة (أو لا توجد مجموعة محفوظة) يعني إعادة البناء من البداية
+    consumed = state.get("trades_consumed", 0)
+    if trades_size < state.get("trades_bytes", 0) or not os.path.exists(TRAINING_SET_FILE):
+        consumed = 0
+    cached = pd.read_csv(TRAINING_SET_FILE) if consumed else None
+
+    trades, raw_rows = _read_timestamped(trades_file, consumed)
+    if trades.empty:
+        if raw_rows:
+            _save_state({"trades_consumed": consumed + raw_rows, "trades_bytes": trades_size})
+        return cached if cached is not None else pd.DataFrame()
+
+    # من سجل القرارات: فقط رموز الصفقات الجديدة وحتى آخر صفقة فيها
+    decisions = read_decisions(end=trades["timestamp"].max(), symbols=trades["symbol"].unique().tolist())
+    new_rows = join_trades_to_decisions(trades, decisions)
+    if cached is not None:
+        new_rows = new_rows.reindex(columns=cached.columns)
+    new_rows.to_csv(TRAINING_SET_FILE, mode="a" if consumed else "w", header=not consumed, index=False)
+
+    _save_state({"trades_consumed": consumed + raw_rows, "trades_bytes": trades_size})
+    return pd.concat([cached, new_rows], ignore_index=True) if cached is not None else new_rows
 
 # 🧠 تحويل الإشارات إلى أرقام
 def encode_signals(df):
@@ -37,6 +89,8 @@ def encode_signals(df):
 
 # ⚖️ تحسين الأوزان
 def optimize_weights(df):
+    from sklearn.linear_model import LinearRegression  # يُستورد عند التحسين فقط
+
     features = df[["lstm_encoded", "xgb_encoded", "ta_encoded", "sentiment_score", "liquidity_score", "rl_encoded"]]
     target = df["pnl"]
 
@@ -69,18 +123,34 @@ def notify_weights(weights):
             msg += f"▪️ {name}: `{v}`\n"
     send_telegram_message(msg)
 
-# 🚀 التشغيل
-def main():
+# 🔄 تحميل البيانات وتحسين الأوزان وحفظها (الإشعار فقط عند تغيّر الأوزان)
+def update_weights(path="weights_config.json"):
+    with _update_lock:
+        return _update_weights(path)
+
+def _update_weights(path):
     df = load_data()
     if df.empty:
         print("❌ لا توجد بيانات كافية لتحسين الأوزان.")
-        return
+        return None
 
     df = encode_signals(df)
     weights = optimize_weights(df)
-    save_weights(weights)
-    notify_weights(weights)
-    print("✅ تم تحسين الأوزان وتحديث weights_config.json بنجاح.")
+
+    previous = None
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+
+    if weights != previous:
+        save_weights(weights, path)
+        notify_weights(weights)
+    return weights
+
+# 🚀 التشغيل
+def main():
+    if update_weights() is not None:
+        print("✅ تم تحسين الأوزان وتحديث weights_config.json بنجاح.")
 
 if __name__ == "__main__":
     main()
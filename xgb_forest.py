@@ -0,0 +1,196 @@
+# xgb_forest.py
+
+import sys
+import json
+import ctypes
+import ctypes.util
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# أشجار xgb_model.json مجمّعة في مصفوفات مسطحة (ميزة، عتبة، ابن أيسر/أيمن، قيمة الورقة)
+# وتقييم متجه لصف واحد أو دفعة كاملة. نفس حساب XGBoost: الميزات float32، يسار عند x < العتبة،
+# والقيم الفارغة تتبع default_left، وجمع الأوراق بالتسلسل بدقة float32، فالهامش (margin) مطابق بت ببت.
+# الهامش الأولي واحتمال الصف الواحد يمران بـ logf/expf من مكتبة C للنظام كما في XGBoost. الدفعات تستخدم
+# exp متجهًا من NumPy بدقة float64 ثم التقريب لـ float32 (قد يختلف الاحتمال بوحدة دقة float32 واحدة نادرًا،
+# و check_agreement يقيس هذا الفرق)، و exact=True يفرض expf لكل صف.
+SUPPORTED_OBJECTIVES = ("binary:logistic",)
+# الدفعات الكبيرة تُقيَّم على أجزاء حتى تبقى مصفوفة العقد (صفوف × أشجار) محدودة الحجم
+BATCH_ROWS = 65536
+
+
+def _load_libm_function(name):
+    try:
+        library = "ucrtbase" if sys.platform == "win32" else ctypes.util.find_library("m")
+        function = getattr(ctypes.CDLL(library), name)
+        function.restype = ctypes.c_float
+        function.argtypes = [ctypes.c_float]
+        return function
+    except (OSError, AttributeError, TypeError):
+        logging.warning(f"⚠️ [XGB Forest] تعذر تحميل {name} من مكتبة C، سيتم استخدام NumPy.")
+        return None
+
+
+_logf = _load_libm_function("logf")
+_expf = _load_libm_function("expf")
+
+
+def _log32(x):
+    if _logf is not None:
+        return np.float32(_logf(float(x)))
+    return np.float32(np.log(np.float64(x)))
+
+
+def _exp32(x, exact=False):
+    # استدعاء ctypes لكل صف مكلف في الدفعات، فلا يُستخدم expf إلا لصف واحد أو عند طلب المطابقة التامة
+    if _expf is not None and (exact or len(x) == 1):
+        return np.fromiter((_expf(value) for value in x.tolist()), dtype=np.float32, count=len(x))
+    return np.exp(x.astype(np.float64)).astype(np.float32)
+
+
+def _parse_float(value):
+    # XGBoost 2+ يحفظ base_score كمصفوفة نصية مثل "[5E-1]"
+    return np.float32(str(value).strip("[]").split(",")[0])
+
+
+class ForestEvaluator:
+    """
+    بديل لـ XGBClassifier في الاستدلال: predict_proba و predict بنفس الواجهة.
+    كل شجرة تُعاد ترقيم عقدها داخل مصفوفة واحدة، والأوراق تشير لنفسها حتى يكفي
+    عدد ثابت (أقصى عمق) من الخطوات المتجهة لكل الصفوف والأشجار معًا.
+    """
+
+    def __init__(self, model_json):
+        learner = model_json["learner"]
+        objective = learner["objective"]["name"]
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree" or objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"نموذج غير مدعوم: {booster['name']} / {objective}")
+
+        trees = booster["model"]["trees"]
+        # مثل predict في XGBClassifier: الاكتفاء بالأشجار حتى best_iteration إن وُجد
+        best_iteration = learner.get("attributes", {}).get("best_iteration")
+        if best_iteration is not None:
+            per_round = int(booster["model"]["gbtree_model_param"].get("num_parallel_tree", 1))
+            trees = trees[:(int(best_iteration) + 1) * per_round]
+        if any(tree.get("categories_nodes") for tree in trees):
+            raise ValueError("الميزات الفئوية غير مدعومة")
+
+        self.n_features = int(learner["learner_model_param"]["num_feature"])
+        base_score = _parse_float(learner["learner_model_param"]["base_score"])
+        # نفس ProbToMargin في XGBoost: -logf(1 / base_score - 1)
+        self.base_margin = -_log32(np.float32(1.0) / base_score - np.float32(1.0))
+
+        features, thresholds, lefts, rights, default_left, leaf_values, roots = [], [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for tree in trees:
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            right = np.asarray(tree["right_children"], dtype=np.int64)
+            nodes = np.arange(len(left))
+            is_leaf = left == -1
+
+            features.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.intp))
+            # العتبة في الأوراق NaN حتى تبقى المقارنة False، والورقة تشير لنفسها في الاتجاهين
+            thresholds.append(np.where(is_leaf, np.nan, np.asarray(tree["split_conditions"], dtype=np.float32)).astype(np.float32))
+            lefts.append(np.where(is_leaf, nodes, left) + offset)
+            rights.append(np.where(is_leaf, nodes, right) + offset)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            leaf_values.append(np.where(is_leaf, np.asarray(tree["split_conditions"], dtype=np.float32), np.float32(0)))
+            roots.append(offset)
+            depth = max(depth, self._tree_depth(left, right))
+            offset += len(left)
+
+        self.feature = np.concatenate(features) if trees else np.zeros(0, dtype=np.intp)
+        self.threshold = np.concatenate(thresholds) if trees else np.zeros(0, dtype=np.float32)
+        # children[2 * node + 1] = الابن الأيسر و children[2 * node] = الأيمن: خطوة النزول فهرسة واحدة
+        self.children = np.stack([np.concatenate(rights), np.concatenate(lefts)], axis=1).astype(np.intp).ravel() if trees \
+            else np.zeros(0, dtype=np.intp)
+        self.default_left = np.concatenate(default_left) if trees else np.zeros(0, dtype=bool)
+        self.leaf_value = np.concatenate(leaf_values) if trees else np.zeros(0, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.depth = depth
+
+    @staticmethod
+    def _tree_depth(left, right):
+        depth = np.zeros(len(left), dtype=np.int64)
+        for node in range(len(left)):
+            if left[node] != -1:
+                depth[left[node]] = depth[right[node]] = depth[node] + 1
+        return int(depth.max()) if len(depth) else 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def predict_margin(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if len(X) > BATCH_ROWS:
+            return np.concatenate([self._margin(X[start:start + BATCH_ROWS]) for start in range(0, len(X), BATCH_ROWS)])
+        return self._margin(X)
+
+    def _margin(self, X):
+        flat = X.ravel()
+        has_missing = bool(np.isnan(flat).any())
+        row_offset = None if len(X) == 1 else np.arange(len(X), dtype=np.intp)[:, None] * X.shape[1]
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+
+        for _ in range(self.depth):
+            index = self.feature[node]
+            if row_offset is not None:
+                index += row_offset
+            value = flat[index]
+            go_left = value < self.threshold[node]
+            if has_missing:
+                go_left |= np.isnan(value) & self.default_left[node]
+            node = self.children[2 * node + go_left]
+
+        # جمع تسلسلي (cumsum) وليس جمعًا زوجيًا حتى يطابق ترتيب XGBoost بت ببت
+        leaves = np.empty((len(X), len(self.roots) + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_margin
+        leaves[:, 1:] = self.leaf_value[node]
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba(self, X, exact=False):
+        # نفس Sigmoid في XGBoost: expf(min(-x, 88.7)) ثم القسمة بدقة float32
+        margin = self.predict_margin(X)
+        exp = _exp32(np.minimum(-margin, np.float32(88.7)), exact)
+        positive = np.float32(1.0) / (exp + np.float32(1.0))
+        return np.stack([np.float32(1.0) - positive, positive], axis=1)
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(np.int64)
+
+
+def _ulp(a, b):
+    return np.abs(a.view(np.int32).astype(np.int64) - b.view(np.int32).astype(np.int64))
+
+
+# ✅ مقارنة المقيّم مع XGBClassifier على نفس الصفوف: الهامش بت ببت، والاحتمال بوحدات ulp
+# لمسار الدفعات المتجه ولمسار expf (المستخدم للصف الواحد)، مع الفرق بين المسارين
+def check_agreement(evaluator, model, X):
+    X = np.asarray(X, dtype=np.float32)
+    if len(X) == 0:
+        return {"rows": 0, "margin_exact": True, "proba_exact_fraction": 1.0, "max_proba_ulp": 0,
+                "max_exact_proba_ulp": 0, "max_vectorized_vs_exact_ulp": 0, "label_agreement": 1.0, "label_flips": 0}
+
+    expected_margin = model.predict(X, output_margin=True).astype(np.float32)
+    expected = model.predict_proba(X)[:, 1].astype(np.float32)
+    actual = evaluator.predict_proba(X)[:, 1]
+    exact = evaluator.predict_proba(X, exact=True)[:, 1]
+    ulp = _ulp(expected, actual)
+    return {
+        "rows": len(X),
+        "margin_exact": bool(np.array_equal(expected_margin.view(np.int32), evaluator.predict_margin(X).view(np.int32))),
+        "proba_exact_fraction": float(np.mean(ulp == 0)),
+        "max_proba_ulp": int(ulp.max()),
+        "max_exact_proba_ulp": int(_ulp(expected, exact).max()),
+        "max_vectorized_vs_exact_ulp": int(_ulp(actual, exact).max()),
+        # أضعف المسارين، والانقلابات صفوف احتمالها على بعد وحدات ulp من 0.5 في أحد المسارين
+        "label_agreement": float(min(np.mean((expected > 0.5) == (actual > 0.5)), np.mean((expected > 0.5) == (exact > 0.5)))),
+        "label_flips": int(np.sum(((expected > 0.5) != (actual > 0.5)) | ((expected > 0.5) != (exact > 0.5))))
+    }